@@ -0,0 +1,365 @@
+"""
+Bulk classification of OSM extracts for LocatorisLLM.
+
+/classify handles one place per HTTP call. Phase 1 ingestion produces
+multi-GB dumps, so this module classifies whole files instead:
+
+• Streams places from newline-delimited JSON, .osm XML or .osm.pbf
+• Classifies fixed-size chunks on a process pool
+• Writes classified POIs as NDJSON, in input order
+• Keeps only a bounded number of chunks in memory at any time
+• Skips (and counts) malformed lines instead of aborting the run
+• Reports throughput and unknown-tag rates
+
+Usage (offline, from the repository root):
+    python -m app.intelligence.bulk_classifier samples/places_sample.ndjson out.ndjson
+
+Input formats
+-------------
+NDJSON : one object per line, either
+         {"id": ..., "lat": ..., "lon": ..., "tags": {...}}
+         or a bare tag dict {"amenity": "cafe", ...}
+.osm   : OSM XML; tagged <node> elements are classified
+.pbf   : OSM PBF; requires the optional `osmium` package (pyosmium)
+
+Only nodes are read from OSM files. Tagged ways and relations (e.g.
+shops mapped as building outlines) carry no coordinates of their own,
+and resolving them would mean holding every node location in memory;
+convert them to nodes first (e.g. `osmium export` with centroids to
+NDJSON) to include them.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from app.intelligence.industry_classifier import classify_business, INDEXED_TAG_KEYS
+
+# Places per chunk sent to a worker
+DEFAULT_CHUNK_SIZE = 5_000
+
+# How many unknown tag values to report
+TOP_UNKNOWN_TAGS = 20
+
+
+# ==================================================
+# READERS (each yields {"id", "lat", "lon", "tags"})
+# ==================================================
+
+def read_ndjson_lines(path):
+    """
+    Stream raw (line_number, line) pairs from an NDJSON file.
+
+    Lines are decoded later (see parse_ndjson_line) so the bulk pipeline
+    can push JSON decoding into its worker processes.
+    """
+    with open(path, "r", encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def parse_ndjson_line(line_number, line):
+    """
+    Decode one NDJSON line into a place.
+
+    Raises
+    ------
+    ValueError
+        Invalid JSON, or a line that is not a JSON object
+    """
+    record = json.loads(line)
+
+    if not isinstance(record, dict):
+        raise ValueError(f"line {line_number}: expected a JSON object")
+
+    if isinstance(record.get("tags"), dict):
+        return {
+            "id": record.get("id", line_number),
+            "lat": record.get("lat"),
+            "lon": record.get("lon"),
+            "tags": record["tags"],
+        }
+
+    # Bare tag dict
+    return {"id": line_number, "lat": None, "lon": None, "tags": record}
+
+
+def read_ndjson(path):
+    """
+    Stream places from a newline-delimited JSON file.
+    """
+    for line_number, line in read_ndjson_lines(path):
+        yield parse_ndjson_line(line_number, line)
+
+
+def read_osm_xml(path):
+    """
+    Stream tagged nodes from an OSM XML file.
+
+    Ways and relations are skipped (see the module docstring). Elements
+    are cleared as soon as they are read, so memory stays flat
+    regardless of file size.
+    """
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+
+    for event, element in context:
+        if event != "end":
+            continue
+
+        if element.tag == "node":
+            tags = {
+                child.get("k"): child.get("v")
+                for child in element
+                if child.tag == "tag"
+            }
+
+            if tags:
+                yield {
+                    "id": int(element.get("id")),
+                    "lat": float(element.get("lat")),
+                    "lon": float(element.get("lon")),
+                    "tags": tags,
+                }
+
+        if element.tag in ("node", "way", "relation"):
+            # Drop processed elements from the tree
+            root.clear()
+
+
+def read_osm_pbf(path):
+    """
+    Stream tagged nodes from an OSM PBF file (ways and relations are
+    skipped, as in read_osm_xml).
+
+    Requires pyosmium (`pip install osmium`). It is imported lazily so
+    the rest of the pipeline works without it.
+    """
+    try:
+        import osmium
+    except ImportError as exc:
+        raise ImportError(
+            "Reading .osm.pbf files requires the optional 'osmium' package"
+        ) from exc
+
+    for node in osmium.FileProcessor(path, osmium.osm.NODE):
+        if not node.tags:
+            continue
+
+        yield {
+            "id": node.id,
+            "lat": node.location.lat,
+            "lon": node.location.lon,
+            "tags": {tag.k: tag.v for tag in node.tags},
+        }
+
+
+def read_places(path):
+    """
+    Pick a reader based on the file name.
+
+    NDJSON is returned as raw (line_number, line) pairs; OSM readers
+    return parsed places. classify_chunk() accepts both.
+    """
+    if path.endswith(".pbf"):
+        return read_osm_pbf(path)
+    if path.endswith(".osm"):
+        return read_osm_xml(path)
+    return read_ndjson_lines(path)
+
+
+# ==================================================
+# WORKER
+# ==================================================
+
+def classify_chunk(places, keep_unknown=False):
+    """
+    Classify one chunk of places (runs inside a worker process).
+
+    Items are parsed places or raw NDJSON (line_number, line) pairs.
+    Decoding and output serialization both happen here, so the parent
+    process only moves text.
+
+    A malformed place (invalid JSON, a non-object line, an unhashable
+    tag value) is skipped and counted, as /classify/batch gives it an
+    error slot instead of failing the request.
+
+    Returns
+    -------
+    tuple
+        (lines, classified_count, unknown_tag_counter, skipped_count)
+    """
+    lines = []
+    classified = 0
+    skipped = 0
+    unknown_tags = Counter()
+
+    for place in places:
+        try:
+            if isinstance(place, tuple):
+                place = parse_ndjson_line(*place)
+
+            tags = place["tags"]
+            result = classify_business(tags)
+        except (ValueError, AttributeError, TypeError):
+            skipped += 1
+            continue
+
+        if result["industry"] is not None:
+            classified += 1
+        else:
+            # Track which registry tags we fail to recognize
+            for tag_key in INDEXED_TAG_KEYS:
+                value = tags.get(tag_key)
+                if isinstance(value, str):
+                    unknown_tags[f"{tag_key}={value}"] += 1
+
+            if not keep_unknown:
+                continue
+
+        lines.append(json.dumps({
+            "id": place["id"],
+            "lat": place["lat"],
+            "lon": place["lon"],
+            "industry": result["industry"],
+            "sub_industry": result["sub_industry"],
+        }))
+
+    return lines, classified, unknown_tags, skipped
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ==================================================
+# PIPELINE
+# ==================================================
+
+def classify_file(
+    input_path,
+    output_path,
+    workers=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    keep_unknown=False,
+):
+    """
+    Classify every place in input_path and write NDJSON to output_path.
+
+    Parameters
+    ----------
+    workers : int | None
+        Process pool size (None = CPU count, 1 = run inline)
+    chunk_size : int
+        Places per worker task
+    keep_unknown : bool
+        Also write places that could not be classified
+
+    Memory is bounded: at most 2 x workers chunks are in flight.
+    Malformed lines are skipped; "rows" counts the places classified
+    (or found unknown) and "skipped" the lines dropped.
+
+    Returns
+    -------
+    dict
+        Throughput and unknown-tag statistics
+    """
+    started = time.perf_counter()
+
+    rows = 0
+    classified = 0
+    skipped = 0
+    unknown_tags = Counter()
+
+    def consume(chunk_size_read, outcome, handle):
+        nonlocal rows, classified, skipped
+        lines, chunk_classified, chunk_unknown, chunk_skipped = outcome
+
+        rows += chunk_size_read - chunk_skipped
+        classified += chunk_classified
+        skipped += chunk_skipped
+        unknown_tags.update(chunk_unknown)
+
+        if lines:
+            handle.write("\n".join(lines))
+            handle.write("\n")
+
+    chunks = _chunks(read_places(input_path), chunk_size)
+
+    workers = workers or os.cpu_count() or 1
+
+    with open(output_path, "w", encoding="utf-8") as handle:
+        if workers == 1:
+            for chunk in chunks:
+                consume(len(chunk), classify_chunk(chunk, keep_unknown), handle)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                max_in_flight = 2 * workers
+                in_flight = deque()
+
+                for chunk in chunks:
+                    in_flight.append(
+                        (len(chunk), pool.submit(classify_chunk, chunk, keep_unknown))
+                    )
+
+                    # Oldest first keeps output in input order
+                    if len(in_flight) >= max_in_flight:
+                        count, future = in_flight.popleft()
+                        consume(count, future.result(), handle)
+
+                while in_flight:
+                    count, future = in_flight.popleft()
+                    consume(count, future.result(), handle)
+
+    seconds = time.perf_counter() - started
+    unknown = rows - classified
+
+    return {
+        "rows": rows,
+        "classified": classified,
+        "unknown": unknown,
+        "unknown_rate": round(unknown / rows, 4) if rows else 0.0,
+        "skipped": skipped,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+        "top_unknown_tags": unknown_tags.most_common(TOP_UNKNOWN_TAGS),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Classify an OSM extract (NDJSON, .osm or .osm.pbf) into industries."
+    )
+    parser.add_argument("input", help="input file (.ndjson/.jsonl, .osm or .osm.pbf)")
+    parser.add_argument("output", help="output NDJSON file")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (1 = inline)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--keep-unknown", action="store_true", help="also write unclassified places")
+    args = parser.parse_args(argv)
+
+    stats = classify_file(
+        args.input,
+        args.output,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        keep_unknown=args.keep_unknown,
+    )
+
+    json.dump(stats, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,96 @@ Design goals:
 • Deterministic
 • Explainable
 • Safe with incomplete data
+
+Performance:
+The registry is compiled ONCE at import into a flat
+(tag_key, tag_value) -> (industry, sub_industry) lookup,
+so classifying a place costs a handful of dict lookups
+instead of a walk over the whole registry.
 """
 
+import json
+
 from app.intelligence.industry_registry import INDUSTRY_REGISTRY
 
 
+def compile_registry(registry: dict):
+    """
+    Compile the registry into a flat inverted index.
+
+    Precedence:
+    The reference classifier returns the FIRST (industry, tag_key) group,
+    in registry iteration order, whose value map contains the place's tag.
+    Each index entry therefore stores the rank of its group, and the
+    lowest rank wins when several tags match.
+
+    Returns
+    -------
+    tuple
+        (index, tag_keys)
+        index    : {(tag_key, tag_value): (rank, industry, sub_industry)}
+        tag_keys : tuple of every tag key used by the registry
+    """
+    index = {}
+    tag_keys = []
+
+    rank = 0
+    for industry, tag_groups in registry.items():
+        for tag_key, value_map in tag_groups.items():
+            if tag_key not in tag_keys:
+                tag_keys.append(tag_key)
+
+            for tag_value, sub_industry in value_map.items():
+                # An earlier group already owns this tag
+                index.setdefault(
+                    (tag_key, tag_value),
+                    (rank, industry, sub_industry)
+                )
+
+            rank += 1
+
+    return index, tuple(tag_keys)
+
+
+# Compiled once at import
+TAG_INDEX, INDEXED_TAG_KEYS = compile_registry(INDUSTRY_REGISTRY)
+
+# Every possible classify_business() result, pre-serialized as JSON.
+# Batch endpoints emit these bytes directly instead of building dicts.
+UNKNOWN_RESULT_JSON = json.dumps({"industry": None, "sub_industry": None}).encode()
+RESULT_JSON = {
+    entry: json.dumps({"industry": entry[1], "sub_industry": entry[2]}).encode()
+    for entry in TAG_INDEX.values()
+}
+
+
+def match_tags(tags: dict):
+    """
+    Find the winning TAG_INDEX entry for a tag dict.
+
+    Returns
+    -------
+    tuple | None
+        (rank, industry, sub_industry), or None for unknown places
+    """
+    best = None
+
+    # Only the few tag keys the registry knows about are looked at
+    for tag_key in INDEXED_TAG_KEYS:
+        raw_value = tags.get(tag_key)
+
+        if raw_value is None:
+            continue
+
+        match = TAG_INDEX.get((tag_key, raw_value))
+
+        # Lower rank = earlier in the registry = wins
+        if match is not None and (best is None or match[0] < best[0]):
+            best = match
+
+    return best
+
+
 def classify_business(tags: dict) -> dict:
     """
     Classify a place using raw map-style tags.
@@ -35,6 +120,46 @@ def classify_business(tags: dict) -> dict:
         }
     """
 
+    # Defensive: missing or empty tags
+    if not tags:
+        return {"industry": None, "sub_industry": None}
+
+    best = match_tags(tags)
+
+    if best is not None:
+        return {"industry": best[1], "sub_industry": best[2]}
+
+    # Unknown / unsupported business
+    return {"industry": None, "sub_industry": None}
+
+
+def classify_business_json(tags: dict) -> bytes:
+    """
+    Same as classify_business(), but returns the result as JSON bytes.
+
+    No result dict is created: the answer is one of the
+    pre-serialized RESULT_JSON values.
+    """
+    if not tags:
+        return UNKNOWN_RESULT_JSON
+
+    best = match_tags(tags)
+
+    if best is not None:
+        return RESULT_JSON[best]
+
+    return UNKNOWN_RESULT_JSON
+
+
+def classify_business_reference(tags: dict) -> dict:
+    """
+    Reference classifier: walks the registry directly.
+
+    This is the original, obviously-correct implementation.
+    classify_business() must always agree with it; it is kept for
+    validation of the compiled index, not for production traffic.
+    """
+
     # Defensive: missing or empty tags
     if not tags:
         return {"industry": None, "sub_industry": None}
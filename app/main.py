@@ -13,26 +13,160 @@ Business logic lives in:
 - app/metrics/       -> competition, density, signals
 """
 
-from fastapi import FastAPI
+import asyncio
+import io
+import json
+import os
+import time
+from concurrent.futures import BrokenExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+# -------------------------------
+# Runtime imports (worker pool & measurements)
+# -------------------------------
+from app.telemetry import (
+    PHASE3_STAGES,
+    REQUEST_LATENCY,
+    histogram_lines,
+    metric_lines,
+    size_bucket,
+)
+from app.payload_codec import UnsupportedPayload, decode_phase3_body, encode_json
+from app.shadow import CLASSIFY_CHECK, PHASE3_CHECK, shadow_from_env
+from app.worker_pool import PoolSaturated, pool_from_env
 
 # -------------------------------
 # Phase 2 imports (Business ontology & classification)
 # -------------------------------
-from app.intelligence.industry_classifier import classify_business
+from app.intelligence.industry_classifier import (
+    classify_business,
+    classify_business_json,
+)
 
 # -------------------------------
 # Phase 3 imports (Competition & density analysis)
 # -------------------------------
-from app.metrics.phase3_engine import phase3_analyze
+from app.metrics.phase3_engine import (
+    phase3_analyze,
+    phase3_analyze_many,
+    phase3_analyze_timed,
+)
+from app.metrics.industry_comparison import phase3_analyze_all_industries
+from app.metrics.poi_store import load_region
+from app.metrics.raster import phase3_raster_npz
+from app.metrics.result_cache import cache_from_env
+from app.metrics.site_search import search_sites
+from app.metrics.tile_pyramid import StalePyramid, load_pyramid, phase3_tile_lookup
+from app.metrics.tracked_site import build_tracked_site, registry_from_env, validate_site_payload
 
 
 # -------------------------------
 # FastAPI app initialization
 # -------------------------------
 
+# Phase 3 result cache (None when LOCATORIS_CACHE_BACKEND=off)
+phase3_cache = cache_from_env()
+
+# Process pool for CPU-heavy Phase 3 work (see app/worker_pool.py)
+phase3_pool = pool_from_env()
+
+# Saved sites re-scored incrementally from POI change events
+tracked_sites = registry_from_env()
+
+# Per-stage Phase 3 instrumentation for /metrics (LOCATORIS_PHASE3_METRICS=1).
+# Off by default; "debug_timings": true in a payload measures that request only.
+PHASE3_METRICS_ENABLED = os.environ.get("LOCATORIS_PHASE3_METRICS", "0") == "1"
+
+# Sampled re-runs through the reference engines (LOCATORIS_SHADOW_FRACTION,
+# see app/shadow.py); off by default
+shadow = shadow_from_env()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    phase3_pool.shutdown()
+    shadow.shutdown()
+
+
 # Create the FastAPI application instance
 # Title appears in Swagger UI
-app = FastAPI(title="LocatorisLLM")
+app = FastAPI(title="LocatorisLLM", lifespan=lifespan)
+
+
+def _payload_points(payload: dict) -> int:
+    """
+    Number of points a Phase 3 payload makes the engine scan.
+    """
+    points = len(payload.get("competitors", [])) + len(payload.get("anchors", []))
+
+    if "region" in payload:
+        points += len(load_region(payload["region"]))
+
+    return points * max(len(payload.get("targets", [])), 1)
+
+
+async def _read_phase3_payload(request: Request) -> dict:
+    """
+    Decode a Phase 3 request body straight into packed points.
+
+    JSON (orjson when installed, object or columnar points), the binary
+    points format and MessagePack are accepted; see app/payload_codec.py.
+    Done before the cache lookup and pool dispatch, so both work on
+    packed columns instead of per-point dicts.
+    """
+    try:
+        return decode_phase3_body(await request.body(), request.headers.get("content-type", ""))
+    except UnsupportedPayload as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _json_response(value) -> Response:
+    """
+    JSON response encoded with the fast encoder (see encode_json).
+    """
+    return Response(content=encode_json(value), media_type="application/json")
+
+
+async def _run_phase3(endpoint, fn, payload, points, always_pool=False):
+    """
+    Run a Phase 3 engine function on the pool and map failures to HTTP.
+
+    Latency is recorded per (endpoint, payload size bucket).
+    """
+    started = time.perf_counter()
+
+    try:
+        return await phase3_pool.run(fn, payload, points, always_pool)
+    except PoolSaturated as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="analysis capacity exhausted, retry later",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="analysis timed out")
+    except BrokenExecutor:
+        # The pool replaces its executor; a retry gets a fresh worker
+        raise HTTPException(
+            status_code=503,
+            detail="analysis worker crashed, retry later",
+            headers={"Retry-After": str(phase3_pool.retry_after_seconds)},
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown region: {payload.get('region')}")
+    finally:
+        REQUEST_LATENCY.observe(
+            (endpoint, size_bucket(points)),
+            time.perf_counter() - started,
+        )
 
 
 # -------------------------------
@@ -59,7 +193,7 @@ def health():
 # -------------------------------
 
 @app.post("/classify")
-def classify(tags: dict):
+async def classify(tags: dict):
     """
     Classify a business based on OpenStreetMap-style tags.
 
@@ -81,7 +215,178 @@ def classify(tags: dict):
     Note:
     - This endpoint does NOT perform any competition analysis.
     """
-    return classify_business(tags)
+    started = time.perf_counter()
+
+    try:
+        result = classify_business(tags)
+    except TypeError:
+        raise HTTPException(status_code=400, detail="tag values must not be lists or objects")
+
+    shadow.submit(CLASSIFY_CHECK, tags, result, time.perf_counter() - started)
+
+    return result
+
+
+# -------------------------------
+# Phase 2: Batch classification endpoint (JSON array or NDJSON)
+# -------------------------------
+
+# JSON array results are streamed to the client in groups of this many
+CLASSIFY_BATCH_FLUSH = 1000
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+# Larger batch bodies are refused before parsing (LOCATORIS_CLASSIFY_MAX_BODY_BYTES)
+CLASSIFY_MAX_BODY_BYTES = int(os.environ.get("LOCATORIS_CLASSIFY_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+
+
+def _classify_record(tags: dict) -> bytes:
+    """
+    Classify one decoded record; a list or object tag value (which the
+    tag index cannot look up) produces an error object in its slot.
+    """
+    try:
+        return classify_business_json(tags)
+    except TypeError:
+        return b'{"error": "tag values must not be lists or objects"}'
+
+
+def _classify_line(line: bytes) -> bytes:
+    """
+    Classify one NDJSON line; malformed lines produce an error object
+    so output stays aligned with input.
+    """
+    try:
+        tags = json.loads(line)
+    except ValueError:
+        return b'{"error": "invalid JSON"}'
+
+    if not isinstance(tags, dict):
+        return b'{"error": "expected a JSON object of tags"}'
+
+    return _classify_record(tags)
+
+
+async def _read_batch_body(request: Request) -> bytes:
+    """
+    Read a batch request body, refusing (HTTP 413) anything larger than
+    CLASSIFY_MAX_BODY_BYTES before it is buffered or parsed.
+    """
+    declared = request.headers.get("content-length", "")
+
+    if declared.isdigit() and int(declared) > CLASSIFY_MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"batch bodies are limited to {CLASSIFY_MAX_BODY_BYTES} bytes")
+
+    chunks = []
+    size = 0
+
+    async for chunk in request.stream():
+        size += len(chunk)
+
+        if size > CLASSIFY_MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail=f"batch bodies are limited to {CLASSIFY_MAX_BODY_BYTES} bytes")
+
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+
+def _stream_ndjson_results(body: bytes):
+    """
+    Classify an NDJSON body line by line, streaming NDJSON back.
+
+    A sync generator: Starlette iterates it in a worker thread, so
+    classification never runs on the event loop.
+    """
+    out = []
+
+    for line in io.BytesIO(body):
+        if line.strip():
+            out.append(_classify_line(line))
+
+        if len(out) == CLASSIFY_BATCH_FLUSH:
+            yield b"\n".join(out) + b"\n"
+            out = []
+
+    if out:
+        yield b"\n".join(out) + b"\n"
+
+
+def _decode_tag_array(body: bytes) -> list:
+    """
+    Parse a JSON array of tag objects (run off the event loop).
+
+    Raises:
+    - ValueError for invalid JSON
+    - TypeError when the body is not an array of objects
+    """
+    items = json.loads(body)
+
+    if not isinstance(items, list) or not all(isinstance(tags, dict) for tags in items):
+        raise TypeError("expected a JSON array of tag objects")
+
+    return items
+
+
+def _stream_array_results(items: list):
+    """
+    Classify a decoded JSON array, streaming a JSON array back.
+    """
+    yield b"["
+
+    for start in range(0, len(items), CLASSIFY_BATCH_FLUSH):
+        batch = items[start:start + CLASSIFY_BATCH_FLUSH]
+        separator = b"," if start else b""
+
+        yield separator + b",".join([_classify_record(tags) for tags in batch])
+
+    yield b"]"
+
+
+@app.post("/classify/batch")
+async def classify_batch(request: Request):
+    """
+    Classify many places in one request.
+
+    This endpoint belongs to Phase 2.
+
+    Input (either):
+    - JSON array of tag dictionaries
+      [ {"amenity": "cafe"}, {"shop": "books"}, ... ]
+    - NDJSON stream (Content-Type: application/x-ndjson),
+      one tag dictionary per line
+
+    Bodies above CLASSIFY_MAX_BODY_BYTES are rejected (413) unparsed;
+    parsing and classification run in worker threads, not on the
+    event loop.
+
+    Output:
+    - results in input order, in the same framing as the input
+      (JSON array -> JSON array, NDJSON -> NDJSON), streamed
+    - each result has the /classify shape
+    - malformed NDJSON lines, and records with a list or object tag
+      value, yield {"error": ...} in their slot
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    body = await _read_batch_body(request)
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        return StreamingResponse(
+            _stream_ndjson_results(body),
+            media_type="application/x-ndjson",
+        )
+
+    try:
+        items = await asyncio.get_running_loop().run_in_executor(None, _decode_tag_array, body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="body must be a JSON array or NDJSON")
+    except TypeError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    return StreamingResponse(
+        _stream_array_results(items),
+        media_type="application/json",
+    )
 
 
 # -------------------------------
@@ -89,7 +394,7 @@ def classify(tags: dict):
 # -------------------------------
 
 @app.post("/phase3/competition")
-def phase3_competition(payload: dict):
+async def phase3_competition(request: Request):
     """
     Perform Phase 3 competition & density analysis.
 
@@ -116,8 +421,547 @@ def phase3_competition(payload: dict):
     - spatial competition pattern
     - competitive advantage vectors
 
+    Region mode (points stored server-side, see app/metrics/poi_store.py):
+    {
+        "target": { "lat": float, "lon": float },
+        "industry": "cafe",
+        "region": "karachi"
+    }
+
     Important:
     - This endpoint produces SIGNALS, not business advice.
     - Strategy is handled later by the LLM reasoning layer (Phase 6).
+
+    Wire formats (Content-Type, see app/payload_codec.py):
+    - application/json: points as objects (above) or as columns,
+      "competitors": { "lat": [...], "lon": [...] },
+      "anchors": { "lat": [...], "lon": [...], "type": [...] }
+    - application/x-locatoris-points: packed float64 / float32 blocks
+    - application/msgpack: the JSON structure (optional 'msgpack' package)
+
+    Execution:
+    - Large payloads run on the process pool; small ones inline
+    - 503 + Retry-After when the pool is saturated, 504 on timeout
+
+    Optional breakdown (same radius queries, no extra scan):
+    - "breakdown": true, or { "top_k": 5, "bands_km": [0.25, 0.5, 1, 2] }
+    - adds the nearest competitors / anchors and per-distance-band
+      counts and score contributions
+
+    Optional distance strategy:
+    - "distance_mode": "haversine" (default, exact) | "local_projection"
+      | "auto"; the projection is sub-millimetre at Phase 3 radii below
+      85 degrees latitude (error table in app/metrics/geodesic.py)
+
+    Optional anchor approximation (region payloads):
+    - "anchor_error": 0.05 scores dense anchor clusters as super-anchors;
+      the anchor score stays within anchor_error x exact (+ 0.001),
+      see app/metrics/anchor_clusters.py
+
+    Shadow evaluation:
+    - with LOCATORIS_SHADOW_FRACTION set, a sample of computed (not
+      cached) results is re-checked against the pure-Python reference
+      in the background; see GET /shadow/stats
+
+    Debugging:
+    - "debug_timings": true adds a debug_timings block (per-step
+      milliseconds and point counters) and bypasses the cache lookup
+    """
+    payload = await _read_phase3_payload(request)
+    debug_timings = bool(payload.pop("debug_timings", False))
+
+    try:
+        points = _payload_points(payload)
+
+        cache_key = None
+        if phase3_cache is not None and debug_timings:
+            cache_key = phase3_cache.key_for(payload)
+        elif phase3_cache is not None:
+            cache_key, cached = phase3_cache.lookup(payload)
+            if cached is not None:
+                return _json_response(cached)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown region: {payload.get('region')}")
+
+    started = time.perf_counter()
+
+    if not (debug_timings or PHASE3_METRICS_ENABLED):
+        result = await _run_phase3("phase3_competition", phase3_analyze, payload, points)
+        timings = None
+    else:
+        result, timings = await _run_phase3(
+            "phase3_competition",
+            phase3_analyze_timed,
+            payload,
+            points,
+        )
+        PHASE3_STAGES.record(timings)
+
+    shadow.submit(PHASE3_CHECK, payload, result, time.perf_counter() - started)
+
+    if cache_key is not None:
+        phase3_cache.store(cache_key, result)
+
+    if debug_timings:
+        result["debug_timings"] = timings
+
+    return _json_response(result)
+
+
+# -------------------------------
+# Phase 3: Result cache statistics
+# -------------------------------
+
+@app.get("/phase3/cache/stats")
+def phase3_cache_stats():
+    """
+    Hit / miss / eviction counters of the Phase 3 result cache.
+
+    Returns {"enabled": false} when caching is switched off.
+    """
+    if phase3_cache is None:
+        return {"enabled": False}
+
+    return {"enabled": True, **phase3_cache.stats()}
+
+
+# -------------------------------
+# Phase 3: Tracked sites (incremental re-scoring)
+# -------------------------------
+
+def _tracked_site(site_id):
+    try:
+        return tracked_sites.get(site_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown tracked site: {site_id}")
+
+
+@app.post("/phase3/sites")
+async def create_tracked_site(payload: dict):
+    """
+    Save a site for incremental monitoring.
+
+    Input payload structure (as /phase3/competition, points need ids):
+    {
+        "site_id": "optional-id",
+        "target": { "lat": float, "lon": float },
+        "industry": "cafe",
+        "competitors": [ { "id": "c1", "lat": float, "lon": float }, ... ],
+        "anchors": [ { "id": "a1", "type": "hospital", "lat": float, "lon": float }, ... ]
+    }
+
+    Output:
+    - site_id and the current Phase 3 output
+    """
+    try:
+        points = validate_site_payload(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # Built (one haversine per point) off the event loop, registered here
+    site_id, site = await _run_phase3("phase3_sites", build_tracked_site, payload, points)
+
+    try:
+        tracked_sites.register(site_id, site)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    return {"site_id": site_id, "result": site.result()}
+
+
+@app.post("/phase3/sites/{site_id}/events")
+async def push_site_events(site_id: str, payload: dict):
+    """
+    Apply POI change events to a tracked site and return its new output.
+
+    Input payload structure:
+    {
+        "events": [
+            { "op": "add", "kind": "competitor", "id": "c9", "lat": float, "lon": float },
+            { "op": "remove", "kind": "anchor", "id": "a1" }
+        ]
+    }
+
+    "add" on a known id moves the point. Each event costs O(1);
+    nothing is re-scanned.
+
+    Output:
+    - applied / ignored (unknown removes) counts and the Phase 3 output
+    """
+    site = _tracked_site(site_id)
+
+    applied = ignored = 0
+
+    try:
+        for event in payload.get("events", []):
+            if site.apply(event):
+                applied += 1
+            else:
+                ignored += 1
+    except (ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(
+            status_code=400,
+            detail=f"event {applied + ignored} rejected ({exc!r}); earlier events were applied",
+        )
+
+    return {"site_id": site_id, "applied": applied, "ignored": ignored, "result": site.result()}
+
+
+@app.get("/phase3/sites/{site_id}")
+def get_tracked_site(site_id: str):
+    """
+    Current Phase 3 output of a tracked site.
+    """
+    return {"site_id": site_id, "result": _tracked_site(site_id).result()}
+
+
+@app.delete("/phase3/sites/{site_id}")
+def delete_tracked_site(site_id: str):
+    """
+    Stop tracking a site.
+    """
+    if not tracked_sites.delete(site_id):
+        raise HTTPException(status_code=404, detail=f"unknown tracked site: {site_id}")
+
+    return {"site_id": site_id, "deleted": True}
+
+
+# -------------------------------
+# Phase 3: Batch analysis endpoint (many targets, one POI set)
+# -------------------------------
+
+@app.post("/phase3/competition/batch")
+async def phase3_competition_batch(request: Request):
+    """
+    Perform Phase 3 analysis for many candidate sites at once.
+
+    All targets share one competitor / anchor set, which is sent and
+    scanned once instead of once per target.
+
+    Input payload structure:
+    {
+        "targets": [
+            { "lat": float, "lon": float },
+            ...
+        ],
+        "industry": "cafe",
+        "competitors": [ ... ],
+        "anchors": [ ... ],
+        "chunk_size": 1000000   (optional memory bound)
+    }
+
+    Output:
+    - results: one Phase 3 output per target, in request order
+      (same shape as /phase3/competition)
+    """
+    payload = await _read_phase3_payload(request)
+
+    try:
+        points = _payload_points(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown region: {payload.get('region')}")
+
+    results = await _run_phase3("phase3_competition_batch", phase3_analyze_many, payload, points)
+
+    return _json_response({"results": results})
+
+
+# -------------------------------
+# Phase 3: Every industry at once (comparison view)
+# -------------------------------
+
+@app.post("/phase3/competition/industries")
+async def phase3_competition_industries(payload: dict):
+    """
+    Perform Phase 3 analysis of one target for every industry.
+
+    One distance pass serves all industries, instead of one
+    /phase3/competition call per industry.
+
+    Input payload structure:
+    {
+        "target": { "lat": float, "lon": float },
+        "competitors": [
+            { "lat": float, "lon": float, "industry": "cafe" },
+            { "lat": float, "lon": float, "tags": { "amenity": "cafe" } },
+            ...
+        ],
+        "anchors": [ ... ]
+    }
+    or "region": "karachi" instead of competitors / anchors.
+
+    Competitors are tagged with a Phase 3 industry key, classifier
+    labels ("industry" + "sub_industry") or raw OSM "tags".
+
+    Output:
+    - industries: { industry key: Phase 3 output }
+      (same shape as /phase3/competition)
+    """
+    try:
+        points = _payload_points(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown region: {payload.get('region')}")
+
+    results = await _run_phase3(
+        "phase3_competition_industries",
+        phase3_analyze_all_industries,
+        payload,
+        points,
+    )
+
+    return _json_response({"industries": results})
+
+
+# -------------------------------
+# Phase 3: Candidate-site search
+# -------------------------------
+
+@app.post("/phase3/search")
+async def phase3_site_search(request: Request):
+    """
+    Find the best locations for a business inside an area.
+
+    Input payload structure:
+    {
+        "bbox": { "min_lat", "min_lon", "max_lat", "max_lon" }
+          or "polygon": [ { "lat": float, "lon": float }, ... ],
+        "industry": "cafe",
+        "competitors": [ ... ], "anchors": [ ... ]   (or "region": "karachi"),
+        "top_n": 5,
+        "min_separation_m": 500,
+        "resolution_m": 50,
+        "beam_width": 48,
+        "objective": { "competition_weight": -1.0, "anchor_weight": 1.0 }
+    }
+
+    Output:
+    - sites: best first, each with lat / lon, objective score and the
+      full Phase 3 output at that point
+    - points_evaluated vs cells_in_area (how much the search pruned)
+    """
+    payload = await _read_phase3_payload(request)
+
+    try:
+        points = _payload_points(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown region: {payload.get('region')}")
+
+    # Search cost follows the area and beam, not the point count
+    return _json_response(
+        await _run_phase3("phase3_search", search_sites, payload, points, always_pool=True)
+    )
+
+
+# -------------------------------
+# Phase 3: Precomputed tile lookups (map panning)
+# -------------------------------
+
+@app.post("/phase3/tiles/lookup")
+async def phase3_tiles_lookup(payload: dict):
+    """
+    Approximate Phase 3 output interpolated from a region's tile pyramid.
+
+    Input payload structure:
+    {
+        "target": { "lat": float, "lon": float },
+        "industry": "cafe",
+        "region": "karachi",
+        "cell_size_m": 100     (optional pyramid level; default finest)
+    }
+
+    Output:
+    - result (same shape as /phase3/competition), approximate / stale
+      flags and the measured error of the level used
+    - a pyramid built from an older store is bypassed: the exact
+      engine answers (on the analysis pool) with "stale": true
+
+    Build pyramids offline: python -m app.metrics.tile_pyramid <region>
     """
-    return phase3_analyze(payload)
+    try:
+        return phase3_tile_lookup(payload)
+    except StalePyramid as exc:
+        exact_payload = exc.exact_payload
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"no tile pyramid for region: {payload.get('region')}")
+
+    result = await _run_phase3(
+        "phase3_tiles_lookup",
+        phase3_analyze,
+        exact_payload,
+        _payload_points(exact_payload),
+    )
+
+    return {"approximate": False, "stale": True, "result": result}
+
+
+@app.get("/phase3/tiles/{region}/report")
+def phase3_tiles_report(region: str):
+    """
+    Approximation error of a region's pyramid against exact
+    phase3_analyze, per industry and level (measured at build time).
+    """
+    try:
+        pyramid = load_pyramid(region)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"no tile pyramid for region: {region}")
+
+    return {
+        "region": region,
+        "levels_m": pyramid.levels_m,
+        "store_fingerprint": pyramid.store_fingerprint,
+        "error_report": pyramid.manifest["error_report"],
+    }
+
+
+# -------------------------------
+# Phase 3: Density raster endpoint (heatmap over a bounding box)
+# -------------------------------
+
+@app.post("/phase3/raster")
+async def phase3_density_raster(request: Request):
+    """
+    Compute a Phase 3 competition surface over a bounding box.
+
+    Input payload structure:
+    {
+        "bbox": { "min_lat": float, "min_lon": float,
+                  "max_lat": float, "max_lon": float },
+        "cell_size_m": 100,
+        "industry": "cafe",
+        "competitors": [ ... ],
+        "anchors": [ ... ]
+    }
+    "region" payloads are rejected (400); use /phase3/tiles/lookup.
+
+    Output:
+    - binary NumPy .npz archive (NOT JSON) holding
+      raw_competition_score, normalized_competition_score and
+      density_label arrays, plus a JSON "metadata" entry
+    - X-Raster-Shape header: "rows,cols" (row 0 = south, col 0 = west)
+    """
+    payload = await _read_phase3_payload(request)
+
+    try:
+        points = _payload_points(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"unknown region: {payload.get('region')}")
+
+    # Rasters always go to the pool: cost scales with cells, not points
+    (rows, cols), content = await _run_phase3(
+        "phase3_raster",
+        phase3_raster_npz,
+        payload,
+        points,
+        always_pool=True,
+    )
+
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"X-Raster-Shape": f"{rows},{cols}"},
+    )
+
+
+# -------------------------------
+# Runtime statistics (pool & latency histograms)
+# -------------------------------
+
+@app.get("/runtime/stats")
+def runtime_stats():
+    """
+    Worker pool counters and request latency histograms.
+
+    Histograms are keyed "<endpoint>/<payload size bucket>".
+    """
+    return {
+        "pool": phase3_pool.stats(),
+        "latency": REQUEST_LATENCY.snapshot(),
+    }
+
+
+# -------------------------------
+# Shadow evaluation (engines vs reference)
+# -------------------------------
+
+@app.get("/shadow/stats")
+def shadow_stats():
+    """
+    Shadow evaluation results per engine ("phase3", "classify").
+
+    Includes:
+    - compared / mismatched / failed / dropped counts
+    - mismatch counts per output field and recent sample diffs
+    - latency ratio of the reference to the active engine
+    """
+    return shadow.stats()
+
+
+# -------------------------------
+# Prometheus metrics
+# -------------------------------
+
+@app.get("/metrics")
+def metrics():
+    """
+    Runtime metrics in the Prometheus text exposition format.
+
+    Includes:
+    - request latency histograms per endpoint and payload size bucket
+    - worker pool and result cache counters
+    - Phase 3 per-stage time and point counters
+      (populated when LOCATORIS_PHASE3_METRICS=1 or per debug_timings request)
+    """
+    pool = phase3_pool.stats()
+
+    lines = histogram_lines(
+        "locatoris_request_latency_seconds",
+        "Request latency per endpoint and payload size bucket.",
+        REQUEST_LATENCY,
+        ("endpoint", "size"),
+    )
+
+    for field, kind in (
+        ("in_flight", "gauge"),
+        ("inline_runs", "counter"),
+        ("pooled_runs", "counter"),
+        ("rejected", "counter"),
+        ("timeouts", "counter"),
+        ("restarts", "counter"),
+    ):
+        name = f"locatoris_pool_{field}" + ("_total" if kind == "counter" else "")
+        lines += metric_lines(name, kind, f"Analysis pool {field.replace('_', ' ')}.", [((), pool[field])])
+
+    if phase3_cache is not None:
+        cache = phase3_cache.stats()
+
+        for field, kind in (
+            ("entries", "gauge"),
+            ("hits", "counter"),
+            ("misses", "counter"),
+            ("evictions", "counter"),
+            ("expirations", "counter"),
+        ):
+            name = f"locatoris_phase3_cache_{field}" + ("_total" if kind == "counter" else "")
+            lines += metric_lines(name, kind, f"Phase 3 result cache {field}.", [((), cache[field])])
+
+    lines += PHASE3_STAGES.prometheus_lines()
+    lines += shadow.prometheus_lines()
+
+    return PlainTextResponse(
+        "\n".join(lines) + "\n",
+        media_type="text/plain; version=0.0.4",
+    )
@@ -0,0 +1,285 @@
+"""
+anchor_clusters.py
+
+Clustered demand anchors with a bounded anchor-score error.
+
+Why this exists:
+- OSM tagging yields hundreds of office / building anchors in a single
+  CBD block, and anchor_influence_score() visits every one of them
+- Far from the target, a tight group of anchors influences it almost
+  exactly like one heavier anchor at the group's centroid
+
+How it works:
+- Anchors of the same type are grouped by grid cell at several
+  levels (CLUSTER_CELL_KM, doubling per level). Each cluster keeps its
+  total weight, weighted centroid and radius (furthest member from the
+  centroid), and nests inside exactly one cluster of the next level
+- A query walks the levels top down. A cluster whose centroid lies at
+  distance D with radius r is:
+  - skipped when D - r > radius (every member is out of range)
+  - used as one super-anchor, W / (D + 0.1), when D + r <= radius
+    (every member is in range) and r <= max_error * (D + 0.1)
+  - otherwise opened: its children are tested instead, and at the
+    finest level its members are scored exactly
+
+Error bound:
+- Each member at distance d contributes w / (d + 0.1); the super-anchor
+  charges it w / (D + 0.1). Since |d - D| <= r, the relative error of
+  that one term is |d - D| / (D + 0.1) <= r / (D + 0.1) <= max_error
+- All terms are positive, so the unrounded score is within
+  max_error * exact of the exact one; the rounded score is within
+  max_error * exact + 0.001
+- Whether an anchor is in range is never approximated, so the number
+  of anchors within radius is exact
+- max_error=0 never merges (cluster radii carry a positive margin):
+  every in-range anchor is scored exactly, in anchor order, so the
+  score equals anchor_influence_score()
+
+tests/test_anchor_clusters.py checks the bound; benchmarks/
+bench_anchor_clusters.py measures how many anchors a query still scans.
+"""
+
+import numpy as np
+
+from app.metrics.anchors import (
+    ANCHOR_RADIUS_KM,
+    anchor_influence_from_terms,
+    anchor_weights,
+    pack_anchors,
+)
+from app.metrics.geodesic import (
+    DEFAULT_DISTANCE_MODE,
+    KM_PER_DEGREE,
+    distances_within,
+    haversine_many,
+    haversine_pairs,
+)
+from app.metrics.points import PointSet
+from app.metrics.spatial_index import GridIndex
+
+# Finest cluster cell edge (km); every level doubles it
+CLUSTER_CELL_KM = 0.025
+
+# Number of cluster levels (finest 25 m, coarsest 800 m)
+CLUSTER_LEVELS = 6
+
+# Default relative error bound on the anchor score
+DEFAULT_ANCHOR_ERROR = 0.05
+
+# Slack (km) on cluster radii and range decisions, so floating-point
+# noise can only send a cluster down to the exact path
+_CLUSTER_MARGIN_KM = 1e-9
+
+
+def _expand_ranges(starts, stops) -> np.ndarray:
+    """
+    Concatenation of arange(start, stop) for every (start, stop) pair.
+    """
+    counts = stops - starts
+    total = int(counts.sum())
+
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    offsets = np.cumsum(counts) - counts
+
+    return np.repeat(starts - offsets, counts) + np.arange(total)
+
+
+def _reduce_runs(ufunc, values, starts) -> np.ndarray:
+    """
+    ufunc.reduceat over the runs beginning at starts (empty-safe).
+    """
+    if len(starts) == 0:
+        return values[:0]
+
+    return ufunc.reduceat(values, starts)
+
+
+class AnchorClusters:
+    """
+    Multi-level clusters over one anchor set.
+
+    Built once per anchor set, then queried for any number of targets.
+    Level 0 is the finest; self.levels[-1] is the coarsest.
+    """
+
+    def __init__(
+        self,
+        lats,
+        lons,
+        weights,
+        type_codes,
+        cell_km=CLUSTER_CELL_KM,
+        levels=CLUSTER_LEVELS,
+    ):
+        if levels < 1:
+            raise ValueError("levels must be at least 1")
+
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+        cell_deg = cell_km / KM_PER_DEGREE
+        rows = np.floor((self.lats + 90) / cell_deg).astype(np.int64)
+        cols = np.floor((self.lons + 180) / cell_deg).astype(np.int64)
+        type_codes = np.asarray(type_codes, dtype=np.int64)
+
+        # Sorting by (type, coarsest cell, ..., finest cell) makes every
+        # cluster a contiguous run nested inside its parent's run
+        keys = []
+        for level in range(levels):
+            keys += [cols >> level, rows >> level]
+        keys.append(type_codes)
+
+        self._order = np.lexsort(keys)
+
+        sorted_lats = self.lats[self._order]
+        sorted_lons = self.lons[self._order]
+        sorted_weights = self.weights[self._order]
+
+        count = len(self._order)
+        boundary = np.zeros(count, dtype=bool)
+        boundary[:1] = True
+        boundary[1:] = np.diff(type_codes[self._order]) != 0
+
+        self.levels = [None] * levels
+
+        for level in reversed(range(levels)):
+            for key in (rows >> level, cols >> level):
+                boundary[1:] |= np.diff(key[self._order]) != 0
+
+            starts = np.flatnonzero(boundary)
+            stops = np.append(starts[1:], count).astype(np.int64)
+
+            weight = _reduce_runs(np.add, sorted_weights, starts)
+            lat = _reduce_runs(np.add, sorted_weights * sorted_lats, starts) / weight
+            lon = _reduce_runs(np.add, sorted_weights * sorted_lons, starts) / weight
+
+            spread = haversine_pairs(
+                sorted_lats,
+                sorted_lons,
+                np.repeat(lat, stops - starts),
+                np.repeat(lon, stops - starts),
+            )
+            radius = _reduce_runs(np.maximum, spread, starts) + _CLUSTER_MARGIN_KM
+
+            self.levels[level] = {
+                "lat": lat,
+                "lon": lon,
+                "weight": weight,
+                "radius": radius,
+                "size": stops - starts,
+                "start": starts,
+                "stop": stops,
+            }
+
+        # Children of a cluster: the next finer level's runs inside it
+        for level in range(1, levels):
+            finer = self.levels[level - 1]["start"]
+            clusters = self.levels[level]
+            clusters["child_start"] = np.searchsorted(finer, clusters["start"])
+            clusters["child_stop"] = np.searchsorted(finer, clusters["stop"])
+
+        top = self.levels[-1]
+        self._top_index = GridIndex(top["lat"], top["lon"])
+        self._top_reach = float(top["radius"].max()) if len(top["radius"]) else 0.0
+
+    @classmethod
+    def from_points(cls, anchors, cell_km=CLUSTER_CELL_KM, levels=CLUSTER_LEVELS):
+        """
+        Clusters a list of anchor dicts or a PointSet from pack_anchors().
+        """
+        if not isinstance(anchors, PointSet):
+            anchors = pack_anchors(anchors)
+
+        weights = anchor_weights(anchors, np.arange(len(anchors)))
+
+        return cls(anchors.lats, anchors.lons, weights, anchors.type_codes, cell_km, levels)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def influence_terms(
+        self,
+        lat,
+        lon,
+        radius_km=ANCHOR_RADIUS_KM,
+        max_error=DEFAULT_ANCHOR_ERROR,
+        mode=DEFAULT_DISTANCE_MODE,
+    ) -> tuple:
+        """
+        Influence terms of every anchor within radius_km of (lat, lon),
+        with tight far clusters merged into super-anchors.
+
+        Parameters:
+        - lat, lon: target coordinates
+        - radius_km: max distance anchors are considered relevant
+        - max_error: relative error bound on the summed terms (>= 0)
+        - mode: distance strategy for exactly scored anchors
+
+        Returns:
+        - (terms, anchors_within_radius, anchors_scanned): the terms
+          (super-anchors first, then exact anchors), the exact number
+          of anchors in range and how many were measured one by one
+        """
+        candidates = self._top_index.candidates(lat, lon, radius_km + self._top_reach)
+
+        terms = []
+        within = 0
+
+        for level in reversed(range(len(self.levels))):
+            clusters = self.levels[level]
+
+            distances = haversine_many(lat, lon, clusters["lat"][candidates], clusters["lon"][candidates])
+            radius = clusters["radius"][candidates]
+
+            reachable = distances - radius <= radius_km + _CLUSTER_MARGIN_KM
+            merged = (
+                reachable
+                & (distances + radius <= radius_km - _CLUSTER_MARGIN_KM)
+                & (radius <= max_error * (distances + 0.1))
+            )
+
+            terms.append(clusters["weight"][candidates[merged]] / (distances[merged] + 0.1))
+            within += int(clusters["size"][candidates[merged]].sum())
+
+            opened = candidates[reachable & ~merged]
+
+            if level == 0:
+                # Anchor order, so max_error=0 sums exactly like the exact path
+                members = np.sort(self._order[_expand_ranges(clusters["start"][opened], clusters["stop"][opened])])
+            else:
+                candidates = _expand_ranges(clusters["child_start"][opened], clusters["child_stop"][opened])
+
+        indices, distances = distances_within(
+            lat,
+            lon,
+            self.lats[members],
+            self.lons[members],
+            radius_km,
+            mode,
+        )
+        terms.append(self.weights[members[indices]] / (distances + 0.1))
+        within += len(indices)
+
+        return np.concatenate(terms), within, len(members)
+
+    def influence(
+        self,
+        lat,
+        lon,
+        radius_km=ANCHOR_RADIUS_KM,
+        max_error=DEFAULT_ANCHOR_ERROR,
+        mode=DEFAULT_DISTANCE_MODE,
+    ) -> float:
+        """
+        anchor_influence_score() of (lat, lon) within max_error.
+
+        Returns:
+        - rounded anchor score, within max_error * exact + 0.001 of
+          the exact score
+        """
+        terms, _, _ = self.influence_terms(lat, lon, radius_km, max_error, mode)
+
+        return anchor_influence_from_terms(terms)
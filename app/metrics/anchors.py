@@ -15,7 +15,17 @@ Examples:
 A competitor near anchors is stronger than one in isolation.
 """
 
-from math import radians, sin, cos, sqrt, atan2
+import numpy as np
+
+# haversine is re-exported for existing callers
+from app.metrics.geodesic import (
+    haversine,
+    pack_coordinates,
+    DEFAULT_DISTANCE_MODE,
+    distances_within,
+    sequential_sum,
+)
+from app.metrics.points import PointSet
 
 # Each anchor type has a weight based on how strongly it drives footfall
 ANCHOR_WEIGHTS = {
@@ -30,33 +40,66 @@ ANCHOR_WEIGHTS = {
     "default": 1.0,
 }
 
+# Anchors further than this (km) do not influence the target
+ANCHOR_RADIUS_KM = 1.5
+
+# Anchor type names in code order
+ANCHOR_TYPES = tuple(ANCHOR_WEIGHTS)
+
+# Compact integer codes for anchor types (columnar storage)
+ANCHOR_TYPE_CODES = {anchor_type: code for code, anchor_type in enumerate(ANCHOR_TYPES)}
+
+# Weight of each anchor type code, indexable by a code array
+ANCHOR_WEIGHT_BY_CODE = np.array(list(ANCHOR_WEIGHTS.values()), dtype=np.float64)
+
+# Which classified places act as demand anchors, and as which type.
+# Keys are (industry, sub_industry) labels from the industry registry;
+# a None sub_industry covers the whole industry.
+ANCHOR_TYPE_BY_CLASSIFICATION = {
+    ("Healthcare", "Hospital"): "hospital",
+    ("Education", "University"): "university",
+    ("Education", "College"): "university",
+    ("Education", "School"): "school",
+    ("Education", "Preschool / Kindergarten"): "school",
+    ("Mixed-Use & Anchors", "Office Complex"): "office",
+    ("Mixed-Use & Anchors", "Commercial Complex"): "office",
+    ("Entertainment & Recreation", None): "recreation",
+    ("Culture & Tourism", None): "tourism",
+    ("Hospitality", None): "tourism",
+}
+
 
-def haversine(lat1, lon1, lat2, lon2) -> float:
+def anchor_type_for(industry, sub_industry):
     """
-    Calculates distance (in kilometers) between two geographic points.
+    Returns the anchor type of a classified place, or None if the
+    place is not a demand anchor.
+    """
+    anchor_type = ANCHOR_TYPE_BY_CLASSIFICATION.get((industry, sub_industry))
 
-    Uses the Haversine formula.
-    Metric units are used internally for global consistency.
+    if anchor_type is None:
+        anchor_type = ANCHOR_TYPE_BY_CLASSIFICATION.get((industry, None))
 
-    Returns:
-    - distance in kilometers
-    """
-    R = 6371  # Earth radius in kilometers
+    return anchor_type
 
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
 
-    a = (
-        sin(dlat / 2) ** 2
-        + cos(radians(lat1))
-        * cos(radians(lat2))
-        * sin(dlon / 2) ** 2
-    )
+def pack_anchors(anchors) -> PointSet:
+    """
+    Packs anchors (dicts or columns) into a PointSet with type codes
+    into ANCHOR_TYPES.
 
-    return 2 * R * atan2(sqrt(a), sqrt(1 - a))
+    Unknown types are stored as "default", which weighs the same as
+    ANCHOR_WEIGHTS.get(type, ANCHOR_WEIGHTS["default"]).
+    """
+    return PointSet.parse(anchors, ANCHOR_TYPES)
 
 
-def anchor_influence_score(target, anchors, radius_km=1.5) -> float:
+def anchor_influence_score(
+    target,
+    anchors,
+    radius_km=ANCHOR_RADIUS_KM,
+    index=None,
+    mode=DEFAULT_DISTANCE_MODE,
+) -> float:
     """
     Computes how strongly demand anchors influence a target location.
 
@@ -69,36 +112,91 @@ def anchor_influence_score(target, anchors, radius_km=1.5) -> float:
 
     Parameters:
     - target: dict with lat/lon
-    - anchors: list of anchor dicts
+    - anchors: list of anchor dicts, or a PointSet from pack_anchors()
     - radius_km: max distance anchors are considered relevant
+    - index: optional GridIndex built over the same anchors
+    - mode: distance strategy (see geodesic.DISTANCE_MODES)
 
     Returns:
     - float anchor influence score
     """
 
-    score = 0.0
+    if not anchors:
+        return 0.0
 
-    # Iterate through all known anchors
-    for anchor in anchors:
+    # Ignore anchors beyond relevance radius
+    if index is not None:
+        indices, distances = index.query(target["lat"], target["lon"], radius_km, mode=mode)
+    else:
+        lats, lons = pack_coordinates(anchors)
 
-        # Distance between target and anchor
-        dist = haversine(
+        indices, distances = distances_within(
             target["lat"],
             target["lon"],
-            anchor["lat"],
-            anchor["lon"],
+            lats,
+            lons,
+            radius_km,
+            mode,
         )
 
-        # Ignore anchors beyond relevance radius
-        if dist <= radius_km:
+    return anchor_influence_from_distances(anchors, indices, distances)
+
+
+def anchor_weights(anchors, indices) -> np.ndarray:
+    """
+    Looks up ANCHOR_WEIGHTS for the anchors at the given indices.
+
+    Only anchors that matter (inside the radius) are looked up.
+    Untyped and unknown types weigh "default", as in pack_anchors().
+    A packed anchor set (pack_anchors) is looked up by code, without
+    touching any dict.
+    """
+    if isinstance(anchors, PointSet):
+        if anchors.type_names != ANCHOR_TYPES:
+            raise ValueError("anchor point sets must be packed with pack_anchors()")
+
+        return ANCHOR_WEIGHT_BY_CODE[anchors.type_codes[indices]]
 
-            # Get anchor type weight
-            weight = ANCHOR_WEIGHTS.get(
-                anchor["type"],
+    return np.fromiter(
+        (
+            ANCHOR_WEIGHTS.get(
+                anchors[i].get("type"),
                 ANCHOR_WEIGHTS["default"]
             )
+            for i in indices.tolist()
+        ),
+        dtype=np.float64,
+        count=len(indices),
+    )
+
+
+def anchor_influence_from_distances(anchors, indices, distances) -> float:
+    """
+    Anchor influence from anchors already known to be within radius.
+
+    Parameters:
+    - anchors: the full anchor list
+    - indices: positions of in-radius anchors, in original order
+    - distances: matching distances in kilometers
+    """
+    return anchor_influence_from_weights(
+        anchor_weights(anchors, indices),
+        distances,
+    )
+
 
-            # Add weighted, distance-decayed influence
-            score += weight / (dist + 0.1)
+def anchor_influence_from_weights(weights, distances) -> float:
+    """
+    Anchor influence from per-anchor weights and distances
+    (both restricted to anchors within radius).
+    """
+    # Add weighted, distance-decayed influence
+    return anchor_influence_from_terms(weights / (distances + 0.1))
 
-    return round(score, 3)
+
+def anchor_influence_from_terms(terms) -> float:
+    """
+    Anchor influence from per-anchor terms weight / (distance + 0.1),
+    summed in order and rounded.
+    """
+    return round(sequential_sum(terms), 3)
@@ -0,0 +1,152 @@
+"""
+breakdown.py
+
+Nearest-point and distance-band breakdowns for Phase 3.
+
+Analysts regularly ask two follow-up questions about a score:
+- "Which are the 5 nearest competitors?"
+- "How many are within 250 m / 500 m / 1 km / 2 km?"
+
+Both are answered from the (indices, distances) the radius query has
+already produced, so the breakdown costs no extra scan:
+- top-k: partial selection (argpartition) instead of a full sort
+- bands: one binary search per point, then bincount
+
+Only points inside the analysis radius are considered (2 km for
+competitors, 1.5 km for anchors); bands beyond it stay empty.
+"""
+
+import numpy as np
+
+# Default number of nearest points reported per signal
+DEFAULT_TOP_K = 5
+
+# Default band upper edges (km)
+DEFAULT_DISTANCE_BANDS_KM = (0.25, 0.5, 1.0, 2.0)
+
+# Refuse absurd top-k requests (the output is JSON)
+MAX_TOP_K = 1_000
+
+
+def parse_breakdown_options(option) -> tuple:
+    """
+    Validate the payload's "breakdown" option.
+
+    Accepted forms:
+    - true                                -> defaults
+    - { "top_k": 5, "bands_km": [...] }   -> either key optional
+
+    Returns:
+    - (top_k, bands tuple)
+    """
+    if option is True:
+        option = {}
+
+    if not isinstance(option, dict):
+        raise ValueError('breakdown must be true or an object with "top_k" / "bands_km"')
+
+    top_k = option.get("top_k", DEFAULT_TOP_K)
+    bands = option.get("bands_km", DEFAULT_DISTANCE_BANDS_KM)
+
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or not 0 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"breakdown.top_k must be an integer between 0 and {MAX_TOP_K}")
+
+    try:
+        bands = tuple(float(edge) for edge in bands)
+    except (TypeError, ValueError):
+        raise ValueError("breakdown.bands_km must be a list of numbers")
+
+    if not bands or bands[0] <= 0 or any(a >= b for a, b in zip(bands, bands[1:])):
+        raise ValueError("breakdown.bands_km must be positive and strictly increasing")
+
+    return top_k, bands
+
+
+def nearest_order(indices, distances, k) -> np.ndarray:
+    """
+    Positions (into indices / distances) of the k nearest points,
+    nearest first; ties go to the earlier point.
+    """
+    k = min(k, len(distances))
+
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # k-th smallest distance; everything tied with it stays a candidate
+    # so ties at the cut are broken by point order, not by argpartition
+    cutoff = distances[np.argpartition(distances, k - 1)[k - 1]]
+    selected = np.flatnonzero(distances <= cutoff)
+
+    return selected[np.lexsort((indices[selected], distances[selected]))][:k]
+
+
+def point_breakdown(
+    lats,
+    lons,
+    indices,
+    distances,
+    weights,
+    top_k,
+    bands,
+    with_index=True,
+    type_of=None,
+) -> dict:
+    """
+    Nearest points and per-band counts / contributions for one signal.
+
+    Parameters:
+    - lats, lons: packed coordinates of the whole point set
+    - indices, distances: in-radius hits from the radius query
+    - weights: per-hit weight (1 for competitors, ANCHOR_WEIGHTS for anchors)
+    - top_k, bands: from parse_breakdown_options()
+    - with_index: include each nearest point's position in the input list
+    - type_of: optional callable, point position -> type name, added to
+      each nearest entry as "type" (anchors)
+
+    Contributions are weight / (distance + 0.1), the term the signal's
+    score sums; band contributions add up to the unrounded score when
+    the last band reaches the analysis radius.
+    """
+    contributions = weights / (distances + 0.1)
+
+    nearest = []
+
+    for position in nearest_order(indices, distances, top_k).tolist():
+        point = int(indices[position])
+        entry = {"index": point} if with_index else {}
+
+        entry.update({
+            "lat": float(lats[point]),
+            "lon": float(lons[point]),
+            "distance_km": round(float(distances[position]), 4),
+            "contribution": round(float(contributions[position]), 3),
+        })
+
+        if type_of is not None:
+            entry["type"] = type_of(point)
+
+        nearest.append(entry)
+
+    # Band i holds distances in (bands[i - 1], bands[i]]; the overflow
+    # slot (beyond the last edge) is not reported
+    edges = np.asarray(bands)
+    slots = np.searchsorted(edges, distances, side="left")
+
+    counts = np.bincount(slots, minlength=len(edges) + 1)[:len(edges)]
+    sums = np.bincount(slots, weights=contributions, minlength=len(edges) + 1)[:len(edges)]
+
+    band_rows = []
+    within = 0
+
+    for i, edge in enumerate(bands):
+        within += int(counts[i])
+
+        band_rows.append({
+            "min_km": bands[i - 1] if i else 0.0,
+            "max_km": edge,
+            "count": int(counts[i]),
+            "count_within": within,
+            "contribution": round(float(sums[i]), 3),
+        })
+
+    return {"nearest": nearest, "bands": band_rows}
@@ -11,32 +11,26 @@ It answers:
 This is intentionally simple and deterministic.
 """
 
-from math import radians, sin, cos, sqrt, atan2
-
-
-def haversine(lat1, lon1, lat2, lon2) -> float:
-    """
-    Computes geographic distance between two points.
-
-    Returns:
-    - distance in kilometers
-    """
-    R = 6371
-
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-
-    a = (
-        sin(dlat / 2) ** 2
-        + cos(radians(lat1))
-        * cos(radians(lat2))
-        * sin(dlon / 2) ** 2
-    )
-
-    return 2 * R * atan2(sqrt(a), sqrt(1 - a))
-
-
-def effective_competition(target, competitors, radius_km=2.0) -> float:
+# haversine is re-exported for existing callers
+from app.metrics.geodesic import (
+    haversine,
+    pack_coordinates,
+    DEFAULT_DISTANCE_MODE,
+    distances_within,
+    sequential_sum,
+)
+
+# Competitors further than this (km) exert no pressure
+COMPETITION_RADIUS_KM = 2.0
+
+
+def effective_competition(
+    target,
+    competitors,
+    radius_km=COMPETITION_RADIUS_KM,
+    index=None,
+    mode=DEFAULT_DISTANCE_MODE,
+) -> float:
     """
     Computes effective competition score.
 
@@ -47,25 +41,44 @@ def effective_competition(target, competitors, radius_km=2.0) -> float:
 
     Parameters:
     - target: location being evaluated
-    - competitors: list of competitor locations
+    - competitors: list of competitor locations (dicts or a PointSet)
     - radius_km: max distance for relevance
+    - index: optional GridIndex built over the same competitors
+    - mode: distance strategy (see geodesic.DISTANCE_MODES)
 
     Returns:
     - numeric competition score
     """
 
-    score = 0.0
+    if not competitors:
+        return 0.0
 
-    for comp in competitors:
-        dist = haversine(
+    # Only competitors inside the radius contribute
+    if index is not None:
+        _, distances = index.query(target["lat"], target["lon"], radius_km, mode=mode)
+    else:
+        lats, lons = pack_coordinates(competitors)
+
+        _, distances = distances_within(
             target["lat"],
             target["lon"],
-            comp["lat"],
-            comp["lon"],
+            lats,
+            lons,
+            radius_km,
+            mode,
         )
 
-        if dist <= radius_km:
-            # Inverse distance weighting
-            score += 1 / (dist + 0.1)
+    return competition_from_distances(distances)
+
+
+def competition_from_distances(distances) -> float:
+    """
+    Competition score from distances already known to be within radius.
+
+    Shared by every path that finds distances its own way
+    (single target, spatial index, batched targets).
+    """
+    # Inverse distance weighting
+    score = sequential_sum(1 / (distances + 0.1))
 
     return round(score, 3)
@@ -0,0 +1,425 @@
+"""
+geodesic.py
+
+Shared distance kernels for the metrics layer.
+
+Every Phase 3 metric boils down to "how far is each point from the target?".
+This module answers that question once, for all scorers:
+
+- haversine():        scalar reference (one pair of points)
+- haversine_many():   NumPy-vectorized kernel over packed lat/lon arrays
+- distances_within(): vectorized radius query whose distances are
+                      bit-for-bit identical to the scalar reference
+- distance_matrix_within(): the same query for a block of targets at once
+- haversine_pairs():  element-wise distances between two coordinate arrays
+
+Metric units (kilometers) are used throughout.
+
+Distance modes (the `mode` argument of the radius queries):
+- "haversine" (default): great-circle distances, identical to haversine()
+- "local_projection": points are projected once into planar
+  coordinates around the target (equirectangular, with the longitude
+  scale taken at the mid latitude to first order) and measured with
+  Pythagoras. No trigonometry per point and no exact re-check loop.
+- "auto": local_projection inside the envelope below, haversine outside
+
+Maximum |local_projection - haversine| (meters), measured over 200k
+uniform points per cell (benchmarks/bench_distance_modes.py re-checks
+these bounds):
+
+    radius      lat 0   lat 45   lat 70   lat 80   lat 85   lat 89
+    0.5 km     0.0000   0.0000   0.0000   0.0000   0.0000   0.0005
+    1.5 km     0.0000   0.0000   0.0000   0.0001   0.0005   0.0128
+    2.0 km     0.0000   0.0000   0.0001   0.0003   0.0012   0.0303
+    5.0 km     0.0001   0.0003   0.0012   0.0047   0.0189   0.4723
+    10  km     0.0010   0.0021   0.0095   0.0379   0.1513   3.7633
+
+The projection breaks down when the search circle reaches a pole,
+so "auto" only projects for |lat| <= 85 and radius <= 10 km (error
+below 0.16 m there, sub-millimetre at the Phase 3 radii).
+
+Projected distances differ from haversine in the last few bits, so
+rounded scores can differ in the last decimal and points within
+millimetres of the radius may fall on the other side of it.
+"""
+
+from itertools import repeat
+from math import pi, radians, sin, cos, sqrt, atan2
+
+import numpy as np
+
+from app.metrics.points import PointSet
+
+# Earth radius in kilometers
+EARTH_RADIUS_KM = 6371
+
+# Length of one degree of latitude (km) on that sphere
+KM_PER_DEGREE = 2 * pi * EARTH_RADIUS_KM / 360
+
+# Distance strategies accepted by the radius queries
+DISTANCE_MODES = ("haversine", "local_projection", "auto")
+
+DEFAULT_DISTANCE_MODE = "haversine"
+
+# Envelope where "auto" uses the local projection (see module docstring)
+AUTO_PROJECTION_MAX_ABS_LAT = 85.0
+AUTO_PROJECTION_MAX_RADIUS_KM = 10.0
+
+# Upper bound (meters) on |local_projection - haversine| within each
+# radius (km) for |lat| <= AUTO_PROJECTION_MAX_ABS_LAT; re-checked by
+# benchmarks/bench_distance_modes.py
+PROJECTION_ERROR_BOUND_M = {
+    0.5: 0.0001,
+    1.5: 0.001,
+    2.0: 0.002,
+    5.0: 0.025,
+    10.0: 0.2,
+}
+
+# Safety margin (km) used when pre-filtering with the vectorized kernel.
+# Points this close to the radius boundary are re-checked exactly.
+_BOUNDARY_MARGIN_KM = 1e-9
+
+
+def haversine(lat1, lon1, lat2, lon2) -> float:
+    """
+    Calculates distance (in kilometers) between two geographic points.
+
+    Uses the Haversine formula.
+    This is the scalar reference every vectorized path must agree with.
+
+    Returns:
+    - distance in kilometers
+    """
+    R = EARTH_RADIUS_KM
+
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+
+    a = (
+        sin(dlat / 2) ** 2
+        + cos(radians(lat1))
+        * cos(radians(lat2))
+        * sin(dlon / 2) ** 2
+    )
+
+    return 2 * R * atan2(sqrt(a), sqrt(1 - a))
+
+
+def pack_coordinates(points):
+    """
+    Packs a list of {"lat", "lon"} dicts into two float64 arrays.
+
+    Parameters:
+    - points: list of dicts with "lat" and "lon" keys, or a PointSet
+      (whose arrays are returned without copying)
+
+    Returns:
+    - (lats, lons) tuple of 1-D float64 arrays
+    """
+    if isinstance(points, PointSet):
+        return points.lats, points.lons
+
+    count = len(points)
+
+    lats = np.fromiter((p["lat"] for p in points), dtype=np.float64, count=count)
+    lons = np.fromiter((p["lon"] for p in points), dtype=np.float64, count=count)
+
+    return lats, lons
+
+
+def _haversine_terms(lat, lon, lats, lons):
+    """
+    Computes the haversine "a" term for every point.
+
+    Operation order mirrors haversine(), but np.sin / np.cos may differ
+    from math.sin / math.cos in the last bit, so "a" is only used to
+    select candidates.
+    """
+    dlat = np.radians(lats - lat)
+    dlon = np.radians(lons - lon)
+
+    return (
+        np.sin(dlat / 2) ** 2
+        + cos(radians(lat))
+        * np.cos(np.radians(lats))
+        * np.sin(dlon / 2) ** 2
+    )
+
+
+def haversine_many(lat, lon, lats, lons) -> np.ndarray:
+    """
+    Vectorized haversine from one target to many points.
+
+    Parameters:
+    - lat, lon: target coordinates (degrees)
+    - lats, lons: packed float64 arrays of point coordinates (degrees)
+
+    Returns:
+    - float64 array of distances in kilometers
+    """
+    a = _haversine_terms(lat, lon, lats, lons)
+
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_pairs(lats1, lons1, lats2, lons2) -> np.ndarray:
+    """
+    Element-wise haversine between two equally shaped coordinate arrays.
+
+    Unlike distances_within(), results are plain vectorized floats
+    (np.arctan2), which is fine for surfaces and approximations.
+
+    Returns:
+    - float64 array of distances in kilometers
+    """
+    dlat = np.radians(lats2 - lats1)
+    dlon = np.radians(lons2 - lons1)
+
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(np.radians(lats1))
+        * np.cos(np.radians(lats2))
+        * np.sin(dlon / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def resolve_distance_mode(mode, lat, radius_km) -> str:
+    """
+    Concrete strategy ("haversine" or "local_projection") for a query.
+
+    Raises:
+    - ValueError for an unknown mode
+    """
+    if mode not in DISTANCE_MODES:
+        raise ValueError(f"unknown distance_mode {mode!r}; expected one of {DISTANCE_MODES}")
+
+    if mode == "auto":
+        if abs(lat) <= AUTO_PROJECTION_MAX_ABS_LAT and radius_km <= AUTO_PROJECTION_MAX_RADIUS_KM:
+            return "local_projection"
+        return "haversine"
+
+    return mode
+
+
+def _projected_offsets(lat, lon, lats, lons, radius_km=None):
+    """
+    Planar (x, y) offsets of points from the target, in radians of arc.
+
+    y is the latitude difference; x the longitude difference scaled by
+    cos of the mid latitude, expanded to first order around the target:
+    cos(lat0) - sin(lat0) * dlat / 2.
+
+    Longitude differences are wrapped across the antimeridian unless
+    radius_km shows the search circle cannot reach it (point longitudes
+    are assumed to lie in [-180, 180]); the wrap is a third of the cost.
+    """
+    lat_rad = radians(lat)
+    cos_lat = cos(lat_rad)
+
+    dlat = np.radians(lats - lat)
+    dlon = lons - lon
+
+    if radius_km is None or abs(lon) + _lon_reach_deg(cos_lat, radius_km) >= 180:
+        dlon = (dlon + 180) % 360 - 180
+
+    return np.radians(dlon) * (cos_lat - sin(lat_rad) * 0.5 * dlat), dlat
+
+
+def _lon_reach_deg(cos_lat, radius_km) -> float:
+    """
+    Longitude span (degrees) a circle of radius_km can cover, generously.
+    """
+    return 2 * radius_km / (KM_PER_DEGREE * max(cos_lat, 1e-12)) + 1
+
+
+def local_projection_many(lat, lon, lats, lons) -> np.ndarray:
+    """
+    Local-projection distances from one target to many points (km).
+
+    Accurate only near the target; see the error table above.
+    """
+    x, y = _projected_offsets(lat, lon, lats, lons)
+
+    return EARTH_RADIUS_KM * np.sqrt(x * x + y * y)
+
+
+def _projected_within(lat, lon, lats, lons, radius_km):
+    """
+    distances_within() for the local_projection mode.
+    """
+    x, y = _projected_offsets(lat, lon, lats, lons, radius_km)
+    squared = x * x + y * y
+
+    # Compare squared arc lengths first; sqrt only for the hits
+    limit = radius_km / EARTH_RADIUS_KM
+    candidates = np.flatnonzero(squared <= limit * limit * (1 + 1e-12))
+
+    distances = EARTH_RADIUS_KM * np.sqrt(squared[candidates])
+    keep = distances <= radius_km
+
+    return candidates[keep], distances[keep]
+
+
+def distances_within(lat, lon, lats, lons, radius_km, mode=DEFAULT_DISTANCE_MODE):
+    """
+    Finds every point within radius_km of the target.
+
+    The vectorized kernel selects candidates; their distances are then
+    recomputed with haversine() itself so they match it exactly.
+    (np.sin / np.cos / np.arctan2 may differ from the math module in
+    the last bit, which is enough to change a rounded score.) Only the
+    few points inside the radius pay for the scalar call.
+
+    Parameters:
+    - lat, lon: target coordinates (degrees)
+    - lats, lons: packed float64 arrays of point coordinates (degrees)
+    - radius_km: inclusive search radius
+    - mode: distance strategy (see DISTANCE_MODES); only "haversine"
+      matches haversine() exactly
+
+    Returns:
+    - (indices, distances) arrays, in original point order
+    """
+    if resolve_distance_mode(mode, lat, radius_km) == "local_projection":
+        return _projected_within(lat, lon, lats, lons, radius_km)
+
+    a = _haversine_terms(lat, lon, lats, lons)
+    root_a = np.sqrt(a)
+    root_b = np.sqrt(1 - a)
+
+    approx = 2 * EARTH_RADIUS_KM * np.arctan2(root_a, root_b)
+    candidates = np.flatnonzero(approx <= radius_km + _BOUNDARY_MARGIN_KM)
+
+    exact = np.fromiter(
+        map(
+            haversine,
+            repeat(lat),
+            repeat(lon),
+            lats[candidates].tolist(),
+            lons[candidates].tolist(),
+        ),
+        dtype=np.float64,
+        count=len(candidates),
+    )
+
+    keep = exact <= radius_km
+
+    return candidates[keep], exact[keep]
+
+
+def distance_matrix_within(
+    target_lats,
+    target_lons,
+    lats,
+    lons,
+    radius_km,
+    cos_lats=None,
+    mode=DEFAULT_DISTANCE_MODE,
+):
+    """
+    Radius query for a block of targets against one point set.
+
+    Builds a (targets x points) matrix, so callers bound memory by
+    passing blocks of targets. Distances match haversine() exactly.
+
+    Parameters:
+    - target_lats, target_lons: float64 arrays of target coordinates
+    - lats, lons: packed float64 arrays of point coordinates
+    - radius_km: inclusive search radius
+    - cos_lats: optional precomputed np.cos(np.radians(lats))
+    - mode: distance strategy; "auto" projects only when every target
+      of the block lies inside the projection envelope
+
+    Returns:
+    - (rows, cols, distances) arrays sorted by row, then by point order
+    """
+    extreme_lat = float(np.abs(target_lats).max()) if len(target_lats) else 0.0
+
+    if resolve_distance_mode(mode, extreme_lat, radius_km) == "local_projection":
+        return _projected_matrix_within(target_lats, target_lons, lats, lons, radius_km)
+
+    if cos_lats is None:
+        cos_lats = np.cos(np.radians(lats))
+
+    target_lats = target_lats[:, None]
+    target_lons = target_lons[:, None]
+
+    dlat = np.radians(lats - target_lats)
+    dlon = np.radians(lons - target_lons)
+
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(np.radians(target_lats))
+        * cos_lats
+        * np.sin(dlon / 2) ** 2
+    )
+    root_a = np.sqrt(a)
+    root_b = np.sqrt(1 - a)
+
+    approx = 2 * EARTH_RADIUS_KM * np.arctan2(root_a, root_b)
+    rows, cols = np.nonzero(approx <= radius_km + _BOUNDARY_MARGIN_KM)
+
+    exact = np.fromiter(
+        map(
+            haversine,
+            target_lats[rows, 0].tolist(),
+            target_lons[rows, 0].tolist(),
+            lats[cols].tolist(),
+            lons[cols].tolist(),
+        ),
+        dtype=np.float64,
+        count=len(rows),
+    )
+
+    keep = exact <= radius_km
+
+    return rows[keep], cols[keep], exact[keep]
+
+
+def _projected_matrix_within(target_lats, target_lons, lats, lons, radius_km):
+    """
+    distance_matrix_within() for the local_projection mode.
+    """
+    # Scalar math.cos / math.sin per target, as in _projected_offsets(),
+    # so batch and single-target distances agree bit for bit
+    target_rad = [radians(lat) for lat in target_lats.tolist()]
+    cos_target = np.array([cos(value) for value in target_rad])[:, None]
+    sin_target = np.array([sin(value) for value in target_rad])[:, None]
+
+    dlat = np.radians(lats - target_lats[:, None])
+    dlon = lons - target_lons[:, None]
+
+    # Same per-target wrap decision as _projected_offsets()
+    wrap = [
+        abs(lon) + _lon_reach_deg(cos_lat, radius_km) >= 180
+        for lon, cos_lat in zip(target_lons.tolist(), cos_target[:, 0].tolist())
+    ]
+    if any(wrap):
+        dlon[wrap] = (dlon[wrap] + 180) % 360 - 180
+
+    x = np.radians(dlon) * (cos_target - sin_target * 0.5 * dlat)
+    squared = x * x + dlat * dlat
+
+    limit = radius_km / EARTH_RADIUS_KM
+    rows, cols = np.nonzero(squared <= limit * limit * (1 + 1e-12))
+
+    distances = EARTH_RADIUS_KM * np.sqrt(squared[rows, cols])
+    keep = distances <= radius_km
+
+    return rows[keep], cols[keep], distances[keep]
+
+
+def sequential_sum(values) -> float:
+    """
+    Sums values strictly left to right.
+
+    Matches a plain `score += value` loop bit-for-bit, unlike np.sum
+    (pairwise) or the builtin sum() on newer Python versions (compensated).
+    """
+    if len(values) == 0:
+        return 0.0
+
+    return float(np.cumsum(values)[-1])
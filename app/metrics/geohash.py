@@ -0,0 +1,58 @@
+"""
+geohash.py
+
+Minimal geohash encoding.
+
+A geohash names a lat/lon rectangle with a short base-32 string;
+longer strings are smaller rectangles, and every prefix of a geohash
+is the rectangle containing it. Approximate cell sizes:
+
+    precision 5  ~ 4.9 km x 4.9 km
+    precision 6  ~ 1.2 km x 0.6 km
+    precision 7  ~ 153 m x 153 m
+    precision 8  ~ 38 m x 19 m
+    precision 9  ~ 4.8 m x 4.8 m
+"""
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat, lon, precision=8) -> str:
+    """
+    Geohash of a point at the given precision (number of characters).
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash bits alternate, starting with longitude
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
@@ -0,0 +1,325 @@
+"""
+industry_comparison.py
+
+Phase 3 for every industry at once ("comparison view").
+
+Why this exists:
+- The comparison view scores one target for every industry in
+  INDUSTRY_DENSITY_TOLERANCE
+- One phase3_analyze call per industry repeats the same distance work:
+  only the competitor subset and the tolerance divisor differ
+
+Here a single radius query over ALL competitors feeds every industry:
+- each competitor is tagged with the industry keys it competes under
+  (an explicit key, classifier labels, or raw OSM tags run through
+  classify_business)
+- the per-competitor terms 1 / (d + 0.1) are scattered into one sum per
+  industry with np.bincount, which adds in point order, so each sum is
+  bit-identical to phase3_analyze over that industry's competitors
+- the anchor score is computed once and shared
+
+Region payloads do the same over the store: one query across every
+competing partition, rows mapped to keys through their sub-industry code.
+"""
+
+import numpy as np
+
+from app.intelligence.industry_classifier import classify_business
+from app.metrics.anchors import ANCHOR_RADIUS_KM, anchor_weights, anchor_influence_from_weights
+from app.metrics.competition import COMPETITION_RADIUS_KM
+from app.metrics.geodesic import pack_coordinates
+from app.metrics.industry_weights import (
+    INDUSTRY_DENSITY_TOLERANCE,
+    TOLERANCE_KEYS_BY_CLASSIFICATION,
+)
+from app.metrics.phase3_engine import _distance_mode, build_phase3_result
+from app.metrics.poi_store import load_region, query_partitions
+from app.metrics.spatial_index import GridIndex
+
+# Industries reported, in INDUSTRY_DENSITY_TOLERANCE order ("default" is
+# a fallback divisor, not an industry)
+COMPARED_INDUSTRIES = tuple(key for key in INDUSTRY_DENSITY_TOLERANCE if key != "default")
+
+_KEY_CODES = {key: code for code, key in enumerate(COMPARED_INDUSTRIES)}
+
+
+def competitor_industries(point) -> tuple:
+    """
+    Industry keys a competitor counts towards.
+
+    Accepted tagging, first match wins:
+    - "tags": raw OSM tags, classified with classify_business()
+    - "sub_industry" (+ "industry"): classifier labels
+    - "industry": a Phase 3 industry key ("cafe")
+
+    A grocery store counts towards both "grocery" and "retail".
+
+    Raises:
+    - ValueError for a non-object point or tagging fields of the wrong
+      type (see _check_tagging())
+    """
+    _check_tagging(point)
+
+    if "tags" in point:
+        classification = classify_business(point["tags"] or {})
+        return TOLERANCE_KEYS_BY_CLASSIFICATION.get(
+            (classification["industry"], classification["sub_industry"]), ()
+        )
+
+    if "sub_industry" in point:
+        return TOLERANCE_KEYS_BY_CLASSIFICATION.get((point.get("industry"), point["sub_industry"]), ())
+
+    industry = point.get("industry")
+
+    return (industry,) if industry in _KEY_CODES else ()
+
+
+def _key_table(key_lists):
+    """
+    CSR table (offsets, key codes) of one key list per group.
+    """
+    offsets = np.zeros(len(key_lists) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(keys) for keys in key_lists])
+
+    codes = np.fromiter(
+        (_KEY_CODES[key] for keys in key_lists for key in keys),
+        dtype=np.int64,
+        count=int(offsets[-1]),
+    )
+
+    return offsets, codes
+
+
+def industry_sums(groups, terms, offsets, codes) -> np.ndarray:
+    """
+    Sum of terms per industry.
+
+    Parameters:
+    - groups: per-term group id (competitor or store code), in point order
+    - terms: per-term contribution
+    - offsets, codes: CSR table of industry codes per group (_key_table)
+
+    Every term is repeated once per industry of its group; bincount then
+    adds each industry's terms strictly in input order.
+    """
+    counts = offsets[groups + 1] - offsets[groups]
+    total = int(counts.sum())
+
+    starts = np.repeat(offsets[groups], counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return np.bincount(
+        codes[starts + within],
+        weights=np.repeat(terms, counts),
+        minlength=len(COMPARED_INDUSTRIES),
+    )
+
+
+def phase3_analyze_all_industries(payload: dict) -> dict:
+    """
+    Phase 3 output for every industry, from one distance pass.
+
+    Input payload structure:
+    {
+        "target": { "lat": float, "lon": float },
+        "competitors": [
+            { "lat": float, "lon": float, "industry": "cafe" },
+            { "lat": float, "lon": float, "tags": { "shop": "books" } },
+            { "lat": float, "lon": float, "industry": "Retail", "sub_industry": "Florist" },
+            ...
+        ],
+        "anchors": [ { "type": "hospital", "lat": float, "lon": float }, ... ]
+    }
+    or "region": "karachi" instead of competitors / anchors.
+
+    Competitors matching no industry are ignored.
+
+    Returns:
+    - { industry key: Phase 3 output } for every key in COMPARED_INDUSTRIES,
+      each identical to phase3_analyze with that industry's competitors
+    """
+    target = payload["target"]
+    mode = _distance_mode(payload)
+
+    if "region" in payload:
+        sums, competitor_counts, anchor_score = _region_signals(payload["region"], target, mode)
+    else:
+        sums, competitor_counts, anchor_score = _payload_signals(payload, target, mode)
+
+    return {
+        industry: build_phase3_result(
+            round(float(sums[code]), 3),
+            anchor_score,
+            industry,
+            int(competitor_counts[code]),
+        )
+        for code, industry in enumerate(COMPARED_INDUSTRIES)
+    }
+
+
+def _check_tagging(point):
+    """
+    Raises ValueError unless the fields competitor_industries() reads
+    have usable types:
+    - "tags": an object (or null) whose values are not lists or objects
+    - "industry" / "sub_industry": strings (or null)
+    """
+    if not isinstance(point, dict):
+        raise ValueError("competitors must be objects")
+
+    if "tags" in point:
+        tags = point["tags"]
+
+        if tags is not None and not isinstance(tags, dict):
+            raise ValueError('competitor "tags" must be an object')
+
+        if tags and any(isinstance(value, (list, dict)) for value in tags.values()):
+            raise ValueError("tag values must not be lists or objects")
+
+        return
+
+    for field in ("industry", "sub_industry"):
+        value = point.get(field)
+
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f'competitor "{field}" must be a string')
+
+
+def _tagging(point):
+    """
+    Hashable form of the fields competitor_industries() reads, so each
+    distinct tagging is resolved (and classified) once per payload.
+
+    Plain industry keys (the common case) are their own tagging.
+
+    Raises:
+    - ValueError as competitor_industries()
+    """
+    _check_tagging(point)
+
+    if "tags" in point:
+        return ("tags", tuple(sorted((point["tags"] or {}).items())))
+
+    if "sub_industry" in point:
+        return ("labels", point.get("industry"), point["sub_industry"])
+
+    return point.get("industry")
+
+
+def _payload_signals(payload, target, mode):
+    """
+    (per-industry raw competition sums, competitor counts, anchor score)
+    from points listed in the payload.
+    """
+    competitors = payload.get("competitors", [])
+
+    # Competitors are grouped by tagging; groups -> industry keys via CSR
+    group_by_tagging = {}
+    group_keys = []
+
+    def group_of(point):
+        tagging = _tagging(point)
+
+        group = group_by_tagging.get(tagging)
+
+        if group is None:
+            group = group_by_tagging[tagging] = len(group_keys)
+            group_keys.append(competitor_industries(point))
+
+        return group
+
+    groups = np.fromiter((group_of(point) for point in competitors), dtype=np.int64, count=len(competitors))
+    offsets, codes = _key_table(group_keys)
+    key_counts = np.diff(offsets)
+
+    # Competitors matching no industry never reach the radius query
+    tagged = key_counts[groups] > 0
+    lats, lons = pack_coordinates(competitors)
+    tagged_groups = groups[tagged]
+
+    competitor_index = GridIndex(lats[tagged], lons[tagged])
+    hits, distances = competitor_index.query(
+        target["lat"],
+        target["lon"],
+        COMPETITION_RADIUS_KM,
+        mode=mode,
+    )
+
+    sums = industry_sums(tagged_groups[hits], 1 / (distances + 0.1), offsets, codes)
+
+    competitor_counts = np.zeros(len(COMPARED_INDUSTRIES), dtype=np.int64)
+    np.add.at(
+        competitor_counts,
+        codes,
+        np.repeat(np.bincount(groups, minlength=len(group_keys)), key_counts),
+    )
+
+    # Anchors are industry independent: scored once
+    anchors = payload.get("anchors", [])
+    anchor_index = GridIndex.from_points(anchors)
+    anchor_indices, anchor_distances = anchor_index.query(
+        target["lat"],
+        target["lon"],
+        ANCHOR_RADIUS_KM,
+        mode=mode,
+    )
+    anchor_score = anchor_influence_from_weights(
+        anchor_weights(anchors, anchor_indices),
+        anchor_distances,
+    )
+
+    return sums, competitor_counts, anchor_score
+
+
+def _region_signals(region, target, mode):
+    """
+    Same as _payload_signals(), against a region's POI store.
+    """
+    store = load_region(region)
+
+    # Store sub-industry code -> industry keys
+    code_keys = [() for _ in store.sub_industries]
+
+    for industry in COMPARED_INDUSTRIES:
+        for code in store.competitor_codes(industry):
+            code_keys[code] += (industry,)
+
+    offsets, codes = _key_table(code_keys)
+
+    partitions = []
+    competitor_counts = np.zeros(len(COMPARED_INDUSTRIES), dtype=np.int64)
+
+    for code, keys in enumerate(code_keys):
+        partition = store.partition("sub_industry", code) if keys else None
+
+        if partition is not None:
+            partitions.append(partition)
+            competitor_counts[codes[offsets[code]:offsets[code + 1]]] += len(partition)
+
+    rows, distances = query_partitions(
+        partitions,
+        target["lat"],
+        target["lon"],
+        COMPETITION_RADIUS_KM,
+        mode=mode,
+    )
+    sums = industry_sums(
+        store.sub_industry[rows].astype(np.int64),
+        1 / (distances + 0.1),
+        offsets,
+        codes,
+    )
+
+    anchor_rows, anchor_distances = query_partitions(
+        store.anchor_partitions(),
+        target["lat"],
+        target["lon"],
+        ANCHOR_RADIUS_KM,
+        mode=mode,
+    )
+    anchor_score = anchor_influence_from_weights(
+        store.anchor_weight_by_code[store.anchor_type[anchor_rows]],
+        anchor_distances,
+    )
+
+    return sums, competitor_counts, anchor_score
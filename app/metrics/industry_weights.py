@@ -13,8 +13,19 @@ They are normalization factors that allow fair comparison across industries.
 
 Lower tolerance value  => industry tolerates more competitors
 Higher tolerance value => industry saturates faster
+
+It also bridges the classifier's labels to these keys:
+- classify_business() outputs registry labels ("Food & Beverage" / "Cafe")
+- Phase 3 takes industry keys ("cafe")
+- A key names every classification whose sub-industry or industry label
+  starts with it, word for word ("cafe" -> Cafe, "retail" -> all of Retail)
+
+The bridge is computed once from the registry, so request handling
+never string-matches labels.
 """
 
+from app.intelligence.industry_registry import INDUSTRY_REGISTRY
+
 # Dictionary mapping industry → density tolerance factor
 # These values are intentionally simple and explainable.
 INDUSTRY_DENSITY_TOLERANCE = {
@@ -50,3 +61,77 @@ def get_density_tolerance(industry: str) -> float:
         industry,
         INDUSTRY_DENSITY_TOLERANCE["default"]
     )
+
+
+def _label_keys(label) -> set:
+    """
+    Every key that names a label: its leading words, lower-cased
+    ("Grocery Store" -> "grocery", "grocery store").
+    """
+    words = label.lower().split(" ")
+
+    return {" ".join(words[:count]) for count in range(1, len(words) + 1)}
+
+
+def _build_bridge() -> dict:
+    """
+    Industry key -> (industry, sub_industry) classifications it names,
+    in registry order.
+    """
+    bridge = {}
+
+    for industry, tag_groups in INDUSTRY_REGISTRY.items():
+        industry_keys = _label_keys(industry)
+
+        for value_map in tag_groups.values():
+            for sub_industry in value_map.values():
+                for key in industry_keys | _label_keys(sub_industry):
+                    classifications = bridge.setdefault(key, [])
+
+                    if (industry, sub_industry) not in classifications:
+                        classifications.append((industry, sub_industry))
+
+    return {key: tuple(classifications) for key, classifications in bridge.items()}
+
+
+# Industry key -> classifications that compete under it
+COMPETITOR_CLASSIFICATIONS = _build_bridge()
+
+# Classification -> most specific INDUSTRY_DENSITY_TOLERANCE key
+# (sub-industry matches win: ("Retail", "Grocery Store") -> "grocery")
+INDUSTRY_KEY_BY_CLASSIFICATION = {}
+
+for _key in sorted(
+    (key for key in INDUSTRY_DENSITY_TOLERANCE if key != "default"),
+    key=lambda key: len(COMPETITOR_CLASSIFICATIONS.get(key, ())),
+):
+    for _classification in COMPETITOR_CLASSIFICATIONS.get(_key, ()):
+        INDUSTRY_KEY_BY_CLASSIFICATION.setdefault(_classification, _key)
+
+
+# Classification -> every INDUSTRY_DENSITY_TOLERANCE key it competes under
+# (("Retail", "Grocery Store") -> ("retail", "grocery"))
+TOLERANCE_KEYS_BY_CLASSIFICATION = {}
+
+for _key in INDUSTRY_DENSITY_TOLERANCE:
+    for _classification in COMPETITOR_CLASSIFICATIONS.get(_key, ()):
+        TOLERANCE_KEYS_BY_CLASSIFICATION[_classification] = (
+            TOLERANCE_KEYS_BY_CLASSIFICATION.get(_classification, ()) + (_key,)
+        )
+
+
+def competitor_classifications(industry: str) -> tuple:
+    """
+    (industry, sub_industry) label pairs that compete with an industry key.
+
+    Unknown keys (including "default") have no competitors.
+    """
+    return COMPETITOR_CLASSIFICATIONS.get(industry, ())
+
+
+def industry_key_for(industry, sub_industry) -> str:
+    """
+    INDUSTRY_DENSITY_TOLERANCE key of a classify_business() result,
+    or "default" when no key covers it.
+    """
+    return INDUSTRY_KEY_BY_CLASSIFICATION.get((industry, sub_industry), "default")
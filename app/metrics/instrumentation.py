@@ -0,0 +1,77 @@
+"""
+instrumentation.py
+
+Opt-in per-stage timing and counters for the Phase 3 engine.
+
+Why this exists:
+- phase3_analyze has six clearly marked steps; in production we need
+  to see which one eats the time
+- "points scanned" vs "points within radius" shows how well the
+  spatial index prunes
+
+How it stays cheap:
+- The engine always talks to a recorder object
+- When nobody asked for timings, that recorder is NO_TIMINGS, whose
+  methods do nothing (one no-op method call per step)
+
+Stage times are measured between consecutive mark() calls, so each
+stage covers exactly the code since the previous mark.
+"""
+
+import time
+
+
+class StageTimings:
+    """
+    Records wall time per stage and integer counters for one analysis.
+    """
+
+    __slots__ = ("stages", "counters", "_last")
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        """
+        Close the current stage: time since the previous mark.
+        """
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def count(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def snapshot(self) -> dict:
+        """
+        JSON-ready view: stage milliseconds and counters.
+        """
+        return {
+            "stages_ms": {stage: round(seconds * 1e3, 4) for stage, seconds in self.stages.items()},
+            "total_ms": round(sum(self.stages.values()) * 1e3, 4),
+            "counters": dict(self.counters),
+        }
+
+
+class _DisabledTimings:
+    """
+    Recorder used when instrumentation is off: every call is a no-op.
+    """
+
+    __slots__ = ()
+
+    enabled = False
+
+    def mark(self, stage):
+        pass
+
+    def count(self, counter, value=1):
+        pass
+
+
+# Shared no-op recorder
+NO_TIMINGS = _DisabledTimings()
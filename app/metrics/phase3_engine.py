@@ -15,9 +15,44 @@ IMPORTANT CONCEPT:
 
 import math
 
-from app.metrics.competition import effective_competition
-from app.metrics.anchors import anchor_influence_score
+import numpy as np
+
+from app.metrics.competition import (
+    COMPETITION_RADIUS_KM,
+    competition_from_distances,
+)
+from app.metrics.anchors import (
+    ANCHOR_RADIUS_KM,
+    pack_anchors,
+    anchor_weights,
+    anchor_influence_from_distances,
+    anchor_influence_from_terms,
+    anchor_influence_from_weights,
+)
+from app.metrics.anchor_clusters import AnchorClusters
+from app.metrics.breakdown import parse_breakdown_options, point_breakdown
+from app.metrics.geodesic import (
+    DEFAULT_DISTANCE_MODE,
+    DISTANCE_MODES,
+    pack_coordinates,
+    distance_matrix_within,
+)
 from app.metrics.industry_weights import get_density_tolerance
+from app.metrics.instrumentation import NO_TIMINGS, StageTimings
+from app.metrics.points import PointSet
+from app.metrics.poi_store import load_region, query_partitions
+from app.metrics.spatial_index import GridIndex
+
+# Upper bounds (exclusive) of the "low" and "medium" density labels
+LOW_DENSITY_MAX = 1.2
+MEDIUM_DENSITY_MAX = 3.0
+
+# Density labels in code order (used by array-backed outputs)
+DENSITY_LABELS = ("low", "medium", "high")
+
+# Default upper bound on (targets x points) matrix cells computed at once
+# by phase3_analyze_many. ~1M cells keeps each float64 temporary near 8 MB.
+DEFAULT_CHUNK_SIZE = 1_000_000
 
 
 def normalize_score(raw_score: float) -> float:
@@ -45,14 +80,35 @@ def classify_density(normalized_score: float) -> str:
 
     These thresholds are deliberately coarse to avoid false precision.
     """
-    if normalized_score < 1.2:
+    if normalized_score < LOW_DENSITY_MAX:
         return "low"
-    if normalized_score < 3.0:
+    if normalized_score < MEDIUM_DENSITY_MAX:
         return "medium"
     return "high"
 
 
-def phase3_analyze(payload: dict) -> dict:
+def normalize_scores(raw_scores: np.ndarray) -> np.ndarray:
+    """
+    Array version of normalize_score(): log(1 + raw_score), 3 decimals.
+    """
+    return np.round(np.log1p(raw_scores), 3)
+
+
+def classify_density_codes(normalized_scores: np.ndarray) -> np.ndarray:
+    """
+    Array version of classify_density().
+
+    Returns:
+    - uint8 codes indexing DENSITY_LABELS (0 = low, 1 = medium, 2 = high)
+    """
+    return np.searchsorted(
+        np.array([LOW_DENSITY_MAX, MEDIUM_DENSITY_MAX]),
+        normalized_scores,
+        side="right",
+    ).astype(np.uint8)
+
+
+def phase3_analyze(payload: dict, timings=NO_TIMINGS) -> dict:
     """
     Main Phase 3 analysis function.
 
@@ -62,8 +118,34 @@ def phase3_analyze(payload: dict) -> dict:
 
     This function does NOT provide advice.
     It produces structured inputs for later reasoning layers.
+
+    If the payload names a "region" instead of listing points,
+    competitors and anchors come from that region's POI store.
+
+    Pass a StageTimings as `timings` to record per-step wall time and
+    point counters (see phase3_analyze_timed).
+
+    Optional "breakdown" (true or { "top_k", "bands_km" }) adds the
+    nearest competitors / anchors and per-distance-band counts and
+    contributions, taken from the same radius queries.
+
+    Competitors and anchors may be lists of dicts or PointSets
+    (see ingest_phase3_payload).
+
+    Optional "distance_mode": "haversine" (default, exact),
+    "local_projection" or "auto" trades bit-exact distances for a
+    cheaper planar kernel; see geodesic.py for its error bounds.
+
+    Optional "anchor_error" (region and batch modes, default 0 = exact)
+    scores anchors through AnchorClusters: the anchor score may then be
+    off by up to anchor_error x the exact score (+ 0.001 rounding).
+    A requested breakdown lists exact anchors, so it keeps scoring exact.
     """
 
+    # Region mode: points live server-side
+    if "region" in payload:
+        return _phase3_analyze_region(payload, timings)
+
     # -------------------------------
     # Extract inputs
     # -------------------------------
@@ -71,23 +153,318 @@ def phase3_analyze(payload: dict) -> dict:
     competitors = payload.get("competitors", [])
     anchors = payload.get("anchors", [])
     industry = payload.get("industry", "default")
+    breakdown = _breakdown_options(payload)
+    mode = _distance_mode(payload)
+
+    # Spatial indexes are built once per payload and reused by every
+    # radius query below
+    competitor_index = GridIndex.from_points(competitors)
+    anchor_index = GridIndex.from_points(anchors)
+
+    timings.mark("index_build")
 
     # -------------------------------
     # Step 1: Raw competition pressure
     # -------------------------------
-    raw_competition = effective_competition(
-        target,
-        competitors
+    # Same as effective_competition(..., index=competitor_index)
+    competitor_indices, competitor_distances = competitor_index.query(
+        target["lat"],
+        target["lon"],
+        COMPETITION_RADIUS_KM,
+        timings,
+        "competitors",
+        mode,
     )
+    raw_competition = competition_from_distances(competitor_distances)
+
+    timings.count("competitors_within_radius", len(competitor_distances))
+    timings.mark("raw_competition")
 
     # -------------------------------
     # Step 2: Anchor-driven amplification
     # -------------------------------
-    anchor_score = anchor_influence_score(
-        target,
-        anchors
+    # Same as anchor_influence_score(..., index=anchor_index)
+    anchor_indices, anchor_distances = anchor_index.query(
+        target["lat"],
+        target["lon"],
+        ANCHOR_RADIUS_KM,
+        timings,
+        "anchors",
+        mode,
+    )
+    # Same as anchor_influence_from_distances(), weights kept for the breakdown
+    weights = anchor_weights(anchors, anchor_indices)
+    anchor_score = anchor_influence_from_weights(weights, anchor_distances)
+
+    timings.count("anchors_within_radius", len(anchor_distances))
+    timings.mark("anchors")
+
+    result = build_phase3_result(
+        raw_competition,
+        anchor_score,
+        industry,
+        len(competitors),
+        timings,
     )
 
+    if breakdown is not None:
+        result["breakdown"] = {
+            "competitors": point_breakdown(
+                competitor_index.lats,
+                competitor_index.lons,
+                competitor_indices,
+                competitor_distances,
+                np.ones(len(competitor_distances)),
+                *breakdown,
+            ),
+            "anchors": point_breakdown(
+                anchor_index.lats,
+                anchor_index.lons,
+                anchor_indices,
+                anchor_distances,
+                weights,
+                *breakdown,
+                type_of=lambda point: anchors[point].get("type", "default"),
+            ),
+        }
+
+        timings.mark("breakdown")
+
+    return result
+
+
+def ingest_phase3_payload(payload: dict) -> dict:
+    """
+    Packs a Phase 3 payload's point lists into PointSets.
+
+    Points may be lists of dicts or columns ({"lat": [...], "lon": [...],
+    "type": [...]}). Targets (batch mode) and competitors become packed
+    coordinates; anchors additionally carry int8 type codes into
+    ANCHOR_TYPES. Every Phase 3 function gives the same output for the
+    packed payload as for the original, while the points take a
+    fraction of the memory and ship to worker processes as a few flat
+    buffers.
+
+    Returns:
+    - shallow copy of the payload (other fields untouched)
+
+    Raises:
+    - ValueError when a point lacks numeric "lat" / "lon"
+    """
+    packed = dict(payload)
+
+    if "targets" in payload:
+        packed["targets"] = PointSet.parse(payload["targets"])
+    if "competitors" in payload:
+        packed["competitors"] = PointSet.parse(payload["competitors"])
+    if "anchors" in payload:
+        packed["anchors"] = pack_anchors(payload["anchors"])
+
+    return packed
+
+
+def _distance_mode(payload):
+    """
+    Validated "distance_mode" option (see geodesic.DISTANCE_MODES).
+    """
+    mode = payload.get("distance_mode", DEFAULT_DISTANCE_MODE)
+
+    if mode not in DISTANCE_MODES:
+        raise ValueError(f"distance_mode must be one of {DISTANCE_MODES}")
+
+    return mode
+
+
+def _anchor_error(payload):
+    """
+    Validated "anchor_error" option: relative error bound on the anchor
+    score (0 = exact, see anchor_clusters.py).
+    """
+    error = payload.get("anchor_error", 0.0)
+
+    if isinstance(error, bool) or not isinstance(error, (int, float)) or not 0 <= error < 1:
+        raise ValueError("anchor_error must be a number in [0, 1)")
+
+    return float(error)
+
+
+def _chunk_size(payload):
+    """
+    Validated "chunk_size" option: max distance-matrix cells per block.
+    """
+    chunk_size = payload.get("chunk_size", DEFAULT_CHUNK_SIZE)
+
+    if isinstance(chunk_size, bool) or not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+
+    return chunk_size
+
+
+def _breakdown_options(payload):
+    """
+    Parsed "breakdown" option, or None when it was not requested.
+    """
+    option = payload.get("breakdown")
+
+    if option is None or option is False:
+        return None
+
+    return parse_breakdown_options(option)
+
+
+def phase3_analyze_timed(payload: dict) -> tuple:
+    """
+    phase3_analyze() with instrumentation switched on.
+
+    Module-level (picklable), so it can run in a worker process and
+    ship its measurements back with the result.
+
+    Returns:
+    - (result, timings snapshot)
+    """
+    timings = StageTimings()
+    result = phase3_analyze(payload, timings)
+
+    return result, timings.snapshot()
+
+
+def _phase3_analyze_region(payload: dict, timings=NO_TIMINGS) -> dict:
+    """
+    Phase 3 analysis against a server-side POI store.
+
+    Input payload structure:
+    {
+        "target": { "lat": float, "lon": float },
+        "industry": "cafe",
+        "region": "karachi"
+    }
+
+    Competitors are the region's POIs whose classification the industry
+    key names (industry_weights.COMPETITOR_CLASSIFICATIONS); anchors are
+    every POI the store marks as an anchor. Only the matching store
+    partitions are queried.
+    """
+    target = payload["target"]
+    industry = payload.get("industry", "default")
+    breakdown = _breakdown_options(payload)
+    mode = _distance_mode(payload)
+    anchor_error = _anchor_error(payload)
+    store = load_region(payload["region"])
+
+    timings.mark("store_load")
+
+    # Step 1: Raw competition pressure (this industry's partitions only)
+    competitor_partitions = store.competitor_partitions(industry)
+    competitor_count = sum(len(partition) for partition in competitor_partitions)
+
+    competitor_rows, competitor_distances = query_partitions(
+        competitor_partitions,
+        target["lat"],
+        target["lon"],
+        COMPETITION_RADIUS_KM,
+        timings,
+        "competitors",
+        mode,
+    )
+    raw_competition = competition_from_distances(competitor_distances)
+
+    timings.count("competitors_within_radius", len(competitor_distances))
+    timings.mark("raw_competition")
+
+    # Step 2: Anchor-driven amplification
+    if anchor_error and breakdown is None:
+        # Clustered anchors, within anchor_error of the exact score
+        terms, anchors_within, anchors_scanned = store.anchor_clusters().influence_terms(
+            target["lat"],
+            target["lon"],
+            ANCHOR_RADIUS_KM,
+            anchor_error,
+            mode,
+        )
+        anchor_score = anchor_influence_from_terms(terms)
+
+        timings.count("anchors_scanned", anchors_scanned)
+    else:
+        # One partition per anchor type
+        anchor_rows, anchor_distances = query_partitions(
+            store.anchor_partitions(),
+            target["lat"],
+            target["lon"],
+            ANCHOR_RADIUS_KM,
+            timings,
+            "anchors",
+            mode,
+        )
+        weights = store.anchor_weight_by_code[store.anchor_type[anchor_rows]]
+        anchor_score = anchor_influence_from_weights(weights, anchor_distances)
+        anchors_within = len(anchor_distances)
+
+    timings.count("anchors_within_radius", anchors_within)
+    timings.mark("anchors")
+
+    # Steps 3 – 6
+    result = build_phase3_result(
+        raw_competition,
+        anchor_score,
+        industry,
+        competitor_count,
+        timings,
+    )
+
+    # Store positions mean nothing to callers, so no "index" here;
+    # anchor types are mapped back from store codes to names
+    if breakdown is not None:
+        anchor_types = store.meta["anchor_types"]
+
+        result["breakdown"] = {
+            "competitors": point_breakdown(
+                store.lat,
+                store.lon,
+                competitor_rows,
+                competitor_distances,
+                np.ones(len(competitor_distances)),
+                *breakdown,
+                with_index=False,
+            ),
+            "anchors": point_breakdown(
+                store.lat,
+                store.lon,
+                anchor_rows,
+                anchor_distances,
+                weights,
+                *breakdown,
+                with_index=False,
+                type_of=lambda row: anchor_types[store.anchor_type[row]],
+            ),
+        }
+
+        timings.mark("breakdown")
+
+    return result
+
+
+def build_phase3_result(
+    raw_competition,
+    anchor_score,
+    industry,
+    competitor_count,
+    timings=NO_TIMINGS,
+) -> dict:
+    """
+    Turns the two raw signals into the final Phase 3 output.
+
+    Steps 3 – 6 of the analysis live here so every Phase 3 mode
+    (single target, batch, ...) produces exactly the same shape
+    from the same formulas.
+
+    Parameters:
+    - raw_competition: rounded effective_competition() score
+    - anchor_score: rounded anchor_influence_score() score
+    - industry: canonical industry key
+    - competitor_count: number of competitors in the payload
+    - timings: optional StageTimings (steps 3 – 6 are marked)
+    """
+
     # -------------------------------
     # Step 3: Industry normalization
     # -------------------------------
@@ -98,16 +475,22 @@ def phase3_analyze(payload: dict) -> dict:
         3
     )
 
+    timings.mark("tolerance")
+
     # -------------------------------
     # Step 4: Human-scale normalization
     # -------------------------------
     normalized_score = normalize_score(raw_effective_score)
 
+    timings.mark("normalization")
+
     # -------------------------------
     # Step 5: Density classification
     # -------------------------------
     density_label = classify_density(normalized_score)
 
+    timings.mark("classification")
+
     # -------------------------------
     # Step 6: Competitive advantage vectors
     # -------------------------------
@@ -131,7 +514,7 @@ def phase3_analyze(payload: dict) -> dict:
     # -------------------------------
     # Final Phase 3 output
     # -------------------------------
-    return {
+    result = {
         # Raw metrics (machine-facing, precise)
         "raw_competition_score": raw_effective_score,
 
@@ -140,7 +523,7 @@ def phase3_analyze(payload: dict) -> dict:
         "density_label": density_label,
 
         # Structural signals
-        "competitor_count": len(competitors),
+        "competitor_count": competitor_count,
         "dominant_competitor_present": raw_effective_score > 4.5,
         "competition_pattern": (
             "anchor_clustered"
@@ -151,3 +534,136 @@ def phase3_analyze(payload: dict) -> dict:
         # Strategic input vectors (NOT advice)
         "advantage_vectors": advantage_vectors,
     }
+
+    timings.mark("vectors")
+
+    return result
+
+
+def _hits_per_target(target_lats, target_lons, lats, lons, radius_km, chunk_size, mode):
+    """
+    Yields (indices, distances) of in-radius points for each target.
+
+    The targets x points distance matrix is computed in blocks of rows,
+    so at most ~chunk_size cells exist at any time.
+    """
+    if len(lats) == 0:
+        no_hits = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+        for _ in range(len(target_lats)):
+            yield no_hits
+        return
+
+    rows_per_block = max(1, chunk_size // len(lats))
+    cos_lats = np.cos(np.radians(lats))
+
+    for start in range(0, len(target_lats), rows_per_block):
+        stop = min(start + rows_per_block, len(target_lats))
+
+        rows, cols, distances = distance_matrix_within(
+            target_lats[start:stop],
+            target_lons[start:stop],
+            lats,
+            lons,
+            radius_km,
+            cos_lats,
+            mode,
+        )
+
+        # Hits are sorted by row; split them per target
+        bounds = np.searchsorted(rows, np.arange(stop - start + 1)).tolist()
+
+        for row in range(stop - start):
+            lo, hi = bounds[row], bounds[row + 1]
+            yield cols[lo:hi], distances[lo:hi]
+
+
+def phase3_analyze_many(payload: dict) -> list:
+    """
+    Batch Phase 3 analysis: many targets, one shared POI set.
+
+    Every target gets exactly the output phase3_analyze() would give it,
+    but competitors and anchors are packed once and distances are
+    computed for whole blocks of targets at a time.
+
+    Input payload structure:
+    {
+        "targets": [{ "lat": float, "lon": float }, ...],
+        "industry": "cafe",
+        "competitors": [...],
+        "anchors": [...],
+        "chunk_size": int   (optional, max matrix cells per block),
+        "distance_mode": "haversine"   (optional, as in phase3_analyze),
+        "anchor_error": 0.05   (optional, as in phase3_analyze)
+    }
+
+    With anchor_error, anchors are clustered once (AnchorClusters) and
+    every target is scored against the clusters instead of the
+    anchor distance blocks.
+
+    Returns:
+    - list of Phase 3 outputs, in target order
+    """
+
+    # -------------------------------
+    # Extract inputs
+    # -------------------------------
+    targets = payload["targets"]
+    competitors = payload.get("competitors", [])
+    anchors = payload.get("anchors", [])
+    industry = payload.get("industry", "default")
+    chunk_size = _chunk_size(payload)
+    mode = _distance_mode(payload)
+    anchor_error = _anchor_error(payload)
+
+    target_lats, target_lons = pack_coordinates(targets)
+    competitor_lats, competitor_lons = pack_coordinates(competitors)
+    anchor_lats, anchor_lons = pack_coordinates(anchors)
+
+    competitor_hits = _hits_per_target(
+        target_lats,
+        target_lons,
+        competitor_lats,
+        competitor_lons,
+        COMPETITION_RADIUS_KM,
+        chunk_size,
+        mode,
+    )
+
+    if anchor_error:
+        clusters = AnchorClusters.from_points(anchors)
+        anchor_scores = (
+            clusters.influence(lat, lon, ANCHOR_RADIUS_KM, anchor_error, mode)
+            for lat, lon in zip(target_lats.tolist(), target_lons.tolist())
+        )
+    else:
+        anchor_scores = (
+            anchor_influence_from_distances(anchors, anchor_indices, anchor_distances)
+            for anchor_indices, anchor_distances in _hits_per_target(
+                target_lats,
+                target_lons,
+                anchor_lats,
+                anchor_lons,
+                ANCHOR_RADIUS_KM,
+                chunk_size,
+                mode,
+            )
+        )
+
+    results = []
+
+    for (_, competitor_distances), anchor_score in zip(competitor_hits, anchor_scores):
+        # Steps 1 – 2 from the precomputed distances
+        raw_competition = competition_from_distances(competitor_distances)
+
+        # Steps 3 – 6 are shared with phase3_analyze
+        results.append(
+            build_phase3_result(
+                raw_competition,
+                anchor_score,
+                industry,
+                len(competitors),
+            )
+        )
+
+    return results
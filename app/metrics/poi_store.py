@@ -0,0 +1,534 @@
+"""
+poi_store.py
+
+Server-side columnar POI store for the metrics layer.
+
+Why this exists:
+- Phase 3 callers used to ship every competitor and anchor as JSON
+- For a dense city that is megabytes per request
+- The same points are re-sent over and over
+
+A store is one directory per region holding plain NumPy column files:
+
+    <root>/<region> -> <region>.v<version>/   (symlink to the live version)
+        lat.npy           float64  latitude
+        lon.npy           float64  longitude
+        industry.npy      int16    code into meta["industries"]     (-1 = unknown)
+        sub_industry.npy  int16    code into meta["sub_industries"] (-1 = unknown)
+        anchor_type.npy   int8     code into meta["anchor_types"]   (-1 = not an anchor)
+        meta.json         code tables, row count, content fingerprint
+
+Codes are keyed to INDUSTRY_REGISTRY and ANCHOR_WEIGHTS. The code tables
+are written into meta.json, so a store stays readable even if the
+registry is later reordered.
+
+Columns are opened memory-mapped and read-only: every worker process
+shares the same pages through the OS page cache. Partitions keep row
+ids only and read coordinates through the shared columns.
+
+Rebuilds never rewrite a mapped file. Each build writes a new version
+directory and atomically replaces the region symlink with one pointing
+at it, so <root>/<region> always resolves to a complete store. The
+previous version is kept until the next build (readers still opening
+it finish), older ones are deleted. load_region opens every file of a
+store from one resolved version directory and re-opens a region whose
+symlink moved.
+
+Partitions:
+- Rows are grouped by (industry, sub_industry) and, for anchors, by
+  anchor type; each group is a Partition with its own GridIndex
+- A Phase 3 industry key maps to its partitions through the
+  precomputed bridge in industry_weights.py, so a request queries only
+  its competitors' partitions instead of filtering the whole region
+- Partitions are built lazily, once per process
+
+Build a store from bulk classifier output:
+    python -m app.metrics.poi_store classified.ndjson data/poi_store/karachi
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from array import array
+
+import numpy as np
+
+from app.intelligence.industry_registry import INDUSTRY_REGISTRY
+from app.metrics.anchor_clusters import AnchorClusters
+from app.metrics.anchors import (
+    ANCHOR_TYPE_CODES,
+    ANCHOR_WEIGHT_BY_CODE,
+    anchor_type_for,
+)
+from app.metrics.geodesic import DEFAULT_DISTANCE_MODE
+from app.metrics.industry_weights import COMPETITOR_CLASSIFICATIONS
+from app.metrics.instrumentation import NO_TIMINGS
+from app.metrics.spatial_index import GridIndex
+
+# Directory holding one sub-directory per region
+POI_STORE_ROOT = os.environ.get("LOCATORIS_POI_STORE_DIR", "data/poi_store")
+
+STORE_FORMAT_VERSION = 1
+
+# Region names double as directory names
+_REGION_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Taxonomy code tables, in registry order
+INDUSTRY_CODES = {industry: code for code, industry in enumerate(INDUSTRY_REGISTRY)}
+
+SUB_INDUSTRY_CODES = {}
+for _industry, _tag_groups in INDUSTRY_REGISTRY.items():
+    for _value_map in _tag_groups.values():
+        for _sub_industry in _value_map.values():
+            SUB_INDUSTRY_CODES.setdefault(
+                (_industry, _sub_industry),
+                len(SUB_INDUSTRY_CODES)
+            )
+
+_COLUMNS = {
+    "lat": np.float64,
+    "lon": np.float64,
+    "industry": np.int16,
+    "sub_industry": np.int16,
+    "anchor_type": np.int8,
+}
+
+# Open stores, by directory (one mapping per process)
+_OPEN_STORES = {}
+
+# Times load_region re-opens a store that was swapped while it was opening
+_OPEN_ATTEMPTS = 3
+
+
+class Partition:
+    """
+    Rows of one store partition, in store order, with their own GridIndex.
+    """
+
+    __slots__ = ("rows", "index")
+
+    def __init__(self, rows, lats, lons):
+        self.rows = rows
+        self.index = GridIndex(lats, lons, rows=rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def query_partitions(
+    partitions,
+    lat,
+    lon,
+    radius_km,
+    timings=NO_TIMINGS,
+    label="points",
+    mode=DEFAULT_DISTANCE_MODE,
+):
+    """
+    Radius query over several partitions of one store.
+
+    Hits are merged back into store order, so scores summed from them
+    match a scan of the whole store bit for bit.
+
+    Returns:
+    - (store rows, distances) arrays in store order
+    """
+    rows = []
+    distances = []
+
+    for partition in partitions:
+        hits, hit_distances = partition.index.query(lat, lon, radius_km, timings, label, mode)
+        rows.append(partition.rows[hits])
+        distances.append(hit_distances)
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    if len(rows) == 1:
+        return rows[0], distances[0]
+
+    rows = np.concatenate(rows)
+    order = np.argsort(rows, kind="stable")
+
+    return rows[order], np.concatenate(distances)[order]
+
+
+def partition_rows(partitions) -> np.ndarray:
+    """
+    Store rows of several partitions, merged back into store order.
+    """
+    if not partitions:
+        return np.empty(0, dtype=np.int64)
+
+    return np.sort(np.concatenate([partition.rows for partition in partitions]))
+
+
+def _store_version(path) -> tuple:
+    """
+    (version directory, meta.json inode, meta.json mtime) of the store
+    path currently resolves to; changes whenever the store is rebuilt.
+    Raises FileNotFoundError for a missing store.
+    """
+    version = os.path.realpath(path)
+    stat = os.stat(os.path.join(version, "meta.json"))
+
+    return version, stat.st_ino, stat.st_mtime_ns
+
+
+class POIStore:
+    """
+    Read-only, memory-mapped columnar POI set for one region.
+
+    Every file is opened from the one version directory path resolved
+    to, so a concurrent rebuild cannot mix versions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stamp = _store_version(path)
+        version = self.stamp[0]
+
+        with open(os.path.join(version, "meta.json"), "r", encoding="utf-8") as handle:
+            self.meta = json.load(handle)
+
+        for column in _COLUMNS:
+            setattr(
+                self,
+                column,
+                np.load(os.path.join(version, f"{column}.npy"), mmap_mode="r"),
+            )
+
+        self.industries = self.meta["industries"]
+        self.sub_industries = [tuple(pair) for pair in self.meta["sub_industries"]]
+
+        # Store-local anchor code -> weight (robust to ANCHOR_WEIGHTS reordering)
+        default_code = ANCHOR_TYPE_CODES["default"]
+        self.anchor_weight_by_code = np.array(
+            [
+                ANCHOR_WEIGHT_BY_CODE[ANCHOR_TYPE_CODES.get(anchor_type, default_code)]
+                for anchor_type in self.meta["anchor_types"]
+            ],
+            dtype=np.float64,
+        )
+
+        # Industry key -> store sub-industry codes (precomputed bridge,
+        # see industry_weights.COMPETITOR_CLASSIFICATIONS)
+        sub_industry_codes = {pair: code for code, pair in enumerate(self.sub_industries)}
+        self.competitor_codes_by_industry = {
+            industry: [
+                sub_industry_codes[pair]
+                for pair in classifications
+                if pair in sub_industry_codes
+            ]
+            for industry, classifications in COMPETITOR_CLASSIFICATIONS.items()
+        }
+
+        self._anchor_clusters = None
+        self._grouped_rows = {}
+        self._partitions = {}
+
+    @property
+    def fingerprint(self) -> str:
+        return self.meta["fingerprint"]
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def _rows_by_code(self, column) -> dict:
+        """
+        code -> row ids (store order) for one code column.
+
+        One stable sort per column and process; every partition of that
+        column is then a slice.
+        """
+        grouped = self._grouped_rows.get(column)
+
+        if grouped is None:
+            codes = getattr(self, column)
+            order = np.argsort(codes, kind="stable")
+            present, starts = np.unique(codes[order], return_index=True)
+            stops = np.append(starts[1:], len(order))
+
+            grouped = {
+                int(code): order[start:stop]
+                for code, start, stop in zip(present.tolist(), starts.tolist(), stops.tolist())
+            }
+            self._grouped_rows[column] = grouped
+
+        return grouped
+
+    def partition(self, column, code):
+        """
+        Partition of the rows holding one code of a code column
+        ("sub_industry" or "anchor_type"), built on first use.
+
+        Returns:
+        - Partition, or None when no row has that code
+        """
+        key = (column, code)
+        partition = self._partitions.get(key)
+
+        if partition is None:
+            rows = self._rows_by_code(column).get(code)
+
+            if rows is None:
+                return None
+
+            partition = Partition(rows, self.lat, self.lon)
+            self._partitions[key] = partition
+
+        return partition
+
+    def competitor_codes(self, industry):
+        """
+        Sub-industry codes that compete with a Phase 3 industry key.
+
+        A sub-industry competes when its own label or its industry's
+        label names the key ("cafe" -> Cafe, "retail" -> all of Retail).
+        """
+        return self.competitor_codes_by_industry.get(industry, [])
+
+    def competitor_partitions(self, industry) -> list:
+        """
+        One Partition per (industry, sub_industry) competing with a
+        Phase 3 industry key; each is built on first use.
+        """
+        partitions = (
+            self.partition("sub_industry", code)
+            for code in self.competitor_codes(industry)
+        )
+
+        return [partition for partition in partitions if partition is not None]
+
+    def anchor_partitions(self) -> list:
+        """
+        One Partition per anchor type (store code into meta["anchor_types"])
+        present in the store.
+        """
+        return [
+            self.partition("anchor_type", code)
+            for code in self._rows_by_code("anchor_type")
+            if code >= 0
+        ]
+
+    def anchor_clusters(self) -> AnchorClusters:
+        """
+        AnchorClusters over every anchor in the region (see
+        anchor_clusters.py), for scoring with a bounded anchor error.
+
+        Built on first use and then reused by every request.
+        """
+        if self._anchor_clusters is None:
+            mask = self.anchor_type >= 0
+            codes = self.anchor_type[mask]
+
+            self._anchor_clusters = AnchorClusters(
+                self.lat[mask],
+                self.lon[mask],
+                self.anchor_weight_by_code[codes],
+                codes,
+            )
+
+        return self._anchor_clusters
+
+
+def region_path(region, root=None):
+    """
+    Directory of a region's store. Rejects names that are not plain
+    identifiers so payloads cannot point outside the store root.
+    """
+    if not isinstance(region, str) or not _REGION_NAME.match(region):
+        raise ValueError(f"invalid region name: {region!r}")
+
+    return os.path.join(root or POI_STORE_ROOT, region)
+
+
+def load_region(region, root=None) -> POIStore:
+    """
+    Open (or reuse) the memory-mapped store of a region; re-opened
+    after a rebuild (new version swapped in, see _write_store).
+
+    Raises:
+    - FileNotFoundError if the region has not been built
+    - RuntimeError if rebuilds kept replacing the store while it was
+      being opened (nothing is cached then)
+    """
+    path = region_path(region, root)
+
+    for _ in range(_OPEN_ATTEMPTS):
+        stamp = _store_version(path)
+        store = _OPEN_STORES.get(path)
+
+        if store is not None and store.stamp == stamp:
+            return store
+
+        try:
+            store = POIStore(path)
+        except FileNotFoundError:
+            # Its version was deleted by a second rebuild while opening
+            continue
+
+        if store.stamp == stamp:
+            _OPEN_STORES[path] = store
+            return store
+
+    raise RuntimeError(f"region {region!r} kept changing while it was opened; retry")
+
+
+def build_poi_store(records, path) -> dict:
+    """
+    Write a columnar store from classified POI records.
+
+    Parameters:
+    - records: iterable of dicts with "lat", "lon", "industry",
+      "sub_industry" and optionally "anchor_type" (the bulk classifier
+      output format); records without coordinates are skipped
+    - path: output directory (created if needed)
+
+    Returns:
+    - the store's meta dict
+    """
+    columns = {
+        "lat": array("d"),
+        "lon": array("d"),
+        "industry": array("h"),
+        "sub_industry": array("h"),
+        "anchor_type": array("b"),
+    }
+
+    for record in records:
+        if record.get("lat") is None or record.get("lon") is None:
+            continue
+
+        industry = record.get("industry")
+        sub_industry = record.get("sub_industry")
+        anchor_type = record.get("anchor_type") or anchor_type_for(industry, sub_industry)
+
+        columns["lat"].append(record["lat"])
+        columns["lon"].append(record["lon"])
+        columns["industry"].append(INDUSTRY_CODES.get(industry, -1))
+        columns["sub_industry"].append(SUB_INDUSTRY_CODES.get((industry, sub_industry), -1))
+        columns["anchor_type"].append(
+            -1 if anchor_type is None
+            else ANCHOR_TYPE_CODES.get(anchor_type, ANCHOR_TYPE_CODES["default"])
+        )
+
+    arrays = {
+        column: np.frombuffer(columns[column], dtype=dtype)
+        for column, dtype in _COLUMNS.items()
+    }
+
+    return _write_store(path, arrays, {
+        "industries": list(INDUSTRY_CODES),
+        "sub_industries": [list(pair) for pair in SUB_INDUSTRY_CODES],
+        "anchor_types": list(ANCHOR_TYPE_CODES),
+    })
+
+
+def extract_store(store, rows, path) -> dict:
+    """
+    Write the given rows of a store as a store of their own.
+
+    Rows keep their relative order and the parent's code tables, so the
+    sub-store scores exactly like the parent over those rows.
+
+    Parameters:
+    - store: the parent POIStore
+    - rows: sorted parent row ids
+    - path: output directory (created if needed)
+
+    Returns:
+    - the sub-store's meta dict
+    """
+    arrays = {column: np.asarray(getattr(store, column)[rows]) for column in _COLUMNS}
+    tables = {name: store.meta[name] for name in ("industries", "sub_industries", "anchor_types")}
+
+    return _write_store(path, arrays, tables)
+
+
+def _write_store(path, arrays, tables) -> dict:
+    """
+    Write a store into a new version directory and point path at it.
+
+    Files of an existing store are never rewritten in place: processes
+    that still map them keep reading the old (unlinked) files until
+    load_region sees the new version and re-opens the store.
+    """
+    path = os.path.normpath(path)
+    name = os.path.basename(path)
+    staging = f"{path}.v{time.time_ns():x}-{os.getpid()}"
+    link = f"{path}.link-{os.getpid()}"
+
+    os.makedirs(staging)
+    digest = hashlib.sha1()
+
+    for column, dtype in _COLUMNS.items():
+        values = np.ascontiguousarray(arrays[column], dtype=dtype)
+        digest.update(values.tobytes())
+        np.save(os.path.join(staging, f"{column}.npy"), values)
+
+    meta = {
+        "version": STORE_FORMAT_VERSION,
+        "count": len(arrays["lat"]),
+        "fingerprint": digest.hexdigest(),
+        **tables,
+    }
+
+    with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as handle:
+        json.dump(meta, handle, indent=2)
+
+    # A store written before versioning is a plain directory: turn it
+    # into a version once (the only moment path does not resolve)
+    if os.path.isdir(path) and not os.path.islink(path):
+        os.replace(path, f"{path}.v0-legacy")
+        os.symlink(f"{name}.v0-legacy", path)
+
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+
+    # Replacing a symlink is atomic: path always names a complete store
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(staging), link)
+    os.replace(link, path)
+
+    # Keep the previous version for readers still opening it
+    parent = os.path.dirname(path) or "."
+    keep = (os.path.realpath(staging), previous)
+
+    for entry in os.listdir(parent):
+        version = os.path.realpath(os.path.join(parent, entry))
+
+        if entry.startswith(f"{name}.v") and version not in keep:
+            shutil.rmtree(version, ignore_errors=True)
+
+    return meta
+
+
+def read_classified_ndjson(path):
+    """
+    Stream records from a bulk classifier output file.
+    """
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build a columnar POI store from classified NDJSON."
+    )
+    parser.add_argument("input", help="bulk classifier output (.ndjson)")
+    parser.add_argument("output", help="store directory, e.g. data/poi_store/<region>")
+    args = parser.parse_args(argv)
+
+    meta = build_poi_store(read_classified_ndjson(args.input), args.output)
+    print(f"wrote {meta['count']} POIs to {args.output} ({meta['fingerprint']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+points.py
+
+Compact, array-backed point sets for the metrics layer.
+
+Why this exists:
+- Competitors and anchors arrive as one dict per point
+  ({"lat": ..., "lon": ..., "type": ...})
+- A Python dict costs a few hundred bytes; 100k of them cost tens of
+  megabytes and every key lookup is a string hash
+- Every metric immediately packs them into float64 arrays anyway
+
+A PointSet holds the same information as packed columns:
+- lats, lons:   float64 arrays
+- type_codes:   optional int8 array of codes into type_names
+                (anchors use ANCHOR_TYPES, see anchors.py)
+
+That is 17 bytes per anchor instead of a dict.
+
+Payloads may also send points as columns,
+{"lat": [...], "lon": [...], "type": [...]}, which decode far faster
+than one JSON object per point (see PointSet.parse).
+
+Every metric function accepts a PointSet wherever it accepts a list of
+point dicts (pack_coordinates() and anchor_weights() use the columns
+directly). Indexing or iterating a PointSet yields plain dicts, so code
+that still expects dicts keeps working.
+"""
+
+import numpy as np
+
+
+class PointSet:
+    """
+    Packed coordinates (and optional type codes) of a list of points.
+    """
+
+    __slots__ = ("lats", "lons", "type_codes", "type_names")
+
+    def __init__(self, lats, lons, type_codes=None, type_names=None):
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lons = np.ascontiguousarray(lons, dtype=np.float64)
+
+        if self.lats.shape != self.lons.shape or self.lats.ndim != 1:
+            raise ValueError("lats and lons must be 1-D arrays of the same length")
+
+        if (type_codes is None) != (type_names is None):
+            raise ValueError("type_codes and type_names go together")
+
+        if type_codes is not None:
+            type_codes = np.ascontiguousarray(type_codes, dtype=np.int8)
+
+            if type_codes.shape != self.lats.shape:
+                raise ValueError("type_codes must have one code per point")
+
+            if len(type_codes) and not 0 <= type_codes.min() <= type_codes.max() < len(type_names):
+                raise ValueError("type_codes must index type_names")
+
+            type_names = tuple(type_names)
+
+        self.type_codes = type_codes
+        self.type_names = type_names
+
+    @classmethod
+    def from_dicts(cls, points, type_names=None):
+        """
+        Packs a list of point dicts.
+
+        Parameters:
+        - points: list of {"lat", "lon"} dicts (a PointSet is returned as is)
+        - type_names: when given, each point's "type" is stored as its
+          position in type_names; unknown or missing types map to
+          "default" (which must then be one of the names)
+
+        Raises:
+        - ValueError when a point lacks numeric "lat" / "lon"
+        """
+        if isinstance(points, cls):
+            return points
+
+        count = len(points)
+
+        try:
+            lats = np.fromiter((p["lat"] for p in points), dtype=np.float64, count=count)
+            lons = np.fromiter((p["lon"] for p in points), dtype=np.float64, count=count)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('every point needs numeric "lat" and "lon"')
+
+        if type_names is None:
+            return cls(lats, lons)
+
+        codes = {name: code for code, name in enumerate(type_names)}
+        default_code = codes["default"]
+
+        type_codes = np.fromiter(
+            (codes.get(p.get("type"), default_code) for p in points),
+            dtype=np.int8,
+            count=count,
+        )
+
+        return cls(lats, lons, type_codes, type_names)
+
+    @classmethod
+    def from_columns(cls, columns, type_names=None):
+        """
+        Builds a PointSet from columnar input.
+
+        Parameters:
+        - columns: { "lat": [...], "lon": [...], "type": [...] }
+          ("type" only used with type_names; lists or arrays)
+        - type_names: as in from_dicts()
+
+        Raises:
+        - ValueError when the columns are missing, non-numeric or of
+          different lengths
+        """
+        try:
+            lats = np.asarray(columns["lat"], dtype=np.float64)
+            lons = np.asarray(columns["lon"], dtype=np.float64)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('columnar points need numeric "lat" and "lon" lists')
+
+        if type_names is None:
+            return cls(lats, lons)
+
+        codes = {name: code for code, name in enumerate(type_names)}
+        default_code = codes["default"]
+        types = columns.get("type")
+
+        if types is None:
+            type_codes = np.full(len(lats), default_code, dtype=np.int8)
+        elif len(types) != len(lats):
+            raise ValueError('columnar "type" must have one entry per point')
+        else:
+            type_codes = np.fromiter(
+                (codes.get(name, default_code) for name in types),
+                dtype=np.int8,
+                count=len(types),
+            )
+
+        return cls(lats, lons, type_codes, type_names)
+
+    @classmethod
+    def parse(cls, points, type_names=None):
+        """
+        PointSet from any accepted point representation:
+        a list of point dicts, a dict of columns, or a PointSet.
+        """
+        if isinstance(points, dict):
+            return cls.from_columns(points, type_names)
+
+        return cls.from_dicts(points, type_names)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def __getitem__(self, i) -> dict:
+        point = {"lat": float(self.lats[i]), "lon": float(self.lons[i])}
+
+        if self.type_codes is not None:
+            point["type"] = self.type_names[self.type_codes[i]]
+
+        return point
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def types(self) -> list:
+        """
+        Type name of every point (requires type codes).
+        """
+        return np.array(self.type_names, dtype=object)[self.type_codes].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        size = self.lats.nbytes + self.lons.nbytes
+
+        if self.type_codes is not None:
+            size += self.type_codes.nbytes
+
+        return size
@@ -0,0 +1,348 @@
+"""
+raster.py
+
+Phase 3 density surfaces ("raster mode").
+
+Instead of scoring a single target, this module scores the center of
+every cell in a regular grid over a bounding box. It produces the same
+signals as phase3_analyze, from the same formulas:
+
+- raw_competition_score
+- normalized_competition_score
+- density_label
+
+Output is array-backed (one 2-D array per signal), NOT a list of dicts,
+so a million-cell surface stays a few megabytes.
+
+How it is computed:
+- Every point is assigned to its home cell
+- For each cell offset within reach of the radius (a convolution stencil),
+  the distance from every point to the offset cell's center is computed
+  in one vectorized step and its contribution scattered into the grid
+
+The Python loop runs over stencil offsets, never over cells or points.
+"""
+
+import io
+import json
+from math import ceil, cos, radians
+
+import numpy as np
+
+from app.metrics.anchors import ANCHOR_RADIUS_KM, anchor_weights
+from app.metrics.competition import COMPETITION_RADIUS_KM
+from app.metrics.geodesic import KM_PER_DEGREE, pack_coordinates, haversine_pairs
+from app.metrics.industry_weights import get_density_tolerance
+from app.metrics.phase3_engine import (
+    DENSITY_LABELS,
+    normalize_scores,
+    classify_density_codes,
+)
+
+# Refuse rasters larger than this many cells (memory guard)
+MAX_RASTER_CELLS = 4_000_000
+
+# Longitude cells shrink toward the poles; beyond this the grid degenerates
+MAX_RASTER_ABS_LAT = 85.0
+
+
+class RasterGrid:
+    """
+    Regular grid of roughly square cells over a bounding box.
+
+    Row 0 is the southern edge, column 0 the western edge.
+    Cell (row, col) is scored at its center.
+    """
+
+    def __init__(self, bbox, cell_size_m):
+        if not isinstance(bbox, dict):
+            raise ValueError('bbox must be an object with "min_lat", "min_lon", "max_lat", "max_lon"')
+
+        for field in ("min_lat", "min_lon", "max_lat", "max_lon"):
+            value = bbox.get(field)
+
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f'bbox needs a numeric "{field}"')
+
+        self.min_lat = float(bbox["min_lat"])
+        self.min_lon = float(bbox["min_lon"])
+        self.max_lat = float(bbox["max_lat"])
+        self.max_lon = float(bbox["max_lon"])
+
+        if isinstance(cell_size_m, bool) or not isinstance(cell_size_m, (int, float)) or not cell_size_m > 0:
+            raise ValueError("cell_size_m must be a positive number")
+
+        if self.min_lat >= self.max_lat or self.min_lon >= self.max_lon:
+            raise ValueError("bbox must satisfy min_lat < max_lat and min_lon < max_lon")
+
+        if max(abs(self.min_lat), abs(self.max_lat)) > MAX_RASTER_ABS_LAT:
+            raise ValueError(f"bbox must stay within ±{MAX_RASTER_ABS_LAT} degrees latitude")
+
+        self.cell_size_m = cell_size_m
+        cell_km = cell_size_m / 1000
+
+        # Cells are square (in km) at the middle latitude of the box
+        mid_lat = (self.min_lat + self.max_lat) / 2
+
+        self.lat_step = cell_km / KM_PER_DEGREE
+        self.lon_step = cell_km / (KM_PER_DEGREE * cos(radians(mid_lat)))
+
+        self.n_rows = ceil((self.max_lat - self.min_lat) / self.lat_step)
+        self.n_cols = ceil((self.max_lon - self.min_lon) / self.lon_step)
+
+        if self.n_rows * self.n_cols > MAX_RASTER_CELLS:
+            raise ValueError(
+                f"raster would have {self.n_rows * self.n_cols} cells "
+                f"(limit {MAX_RASTER_CELLS}); use a larger cell_size_m"
+            )
+
+        self.center_lats = self.min_lat + (np.arange(self.n_rows) + 0.5) * self.lat_step
+        self.center_lons = self.min_lon + (np.arange(self.n_cols) + 0.5) * self.lon_step
+
+    @classmethod
+    def from_steps(cls, min_lat, min_lon, lat_step, lon_step, n_rows, n_cols):
+        """
+        Grid with an explicit origin and cell steps (degrees).
+
+        Used where cells must line up with a fixed lattice, e.g. tiles
+        of a larger grid (see tile_pyramid.py).
+        """
+        grid = cls.__new__(cls)
+
+        grid.min_lat, grid.min_lon = float(min_lat), float(min_lon)
+        grid.lat_step, grid.lon_step = float(lat_step), float(lon_step)
+        grid.n_rows, grid.n_cols = int(n_rows), int(n_cols)
+        grid.max_lat = grid.min_lat + grid.n_rows * grid.lat_step
+        grid.max_lon = grid.min_lon + grid.n_cols * grid.lon_step
+        grid.cell_size_m = grid.lat_step * KM_PER_DEGREE * 1000
+
+        grid.center_lats = grid.min_lat + (np.arange(grid.n_rows) + 0.5) * grid.lat_step
+        grid.center_lons = grid.min_lon + (np.arange(grid.n_cols) + 0.5) * grid.lon_step
+
+        return grid
+
+    @property
+    def shape(self):
+        return (self.n_rows, self.n_cols)
+
+    def reach(self, radius_km):
+        """
+        Stencil half-size (rows, cols) needed to cover radius_km.
+
+        Not clamped to the grid: a point many cells outside a small
+        box can still be within radius_km of it.
+        """
+        # Longitude cells are narrowest (in km) at the most polar latitude reached
+        edge_lat = min(
+            max(abs(self.min_lat), abs(self.max_lat)) + radius_km / KM_PER_DEGREE,
+            90.0,
+        )
+        narrowest_col_km = self.lon_step * KM_PER_DEGREE * max(cos(radians(edge_lat)), 1e-6)
+
+        reach_rows = ceil(radius_km / (self.lat_step * KM_PER_DEGREE)) + 1
+        reach_cols = ceil(radius_km / narrowest_col_km) + 1
+
+        return reach_rows, reach_cols
+
+    def metadata(self) -> dict:
+        return {
+            "bbox": {
+                "min_lat": self.min_lat,
+                "min_lon": self.min_lon,
+                "max_lat": self.max_lat,
+                "max_lon": self.max_lon,
+            },
+            "cell_size_m": self.cell_size_m,
+            "shape": list(self.shape),
+            "lat_step": self.lat_step,
+            "lon_step": self.lon_step,
+        }
+
+
+def accumulate_field(grid, lats, lons, weights, radius_km) -> np.ndarray:
+    """
+    Sums weight / (distance + 0.1) into every cell center within radius_km.
+
+    This is the inverse-distance term of effective_competition (weights = 1)
+    and anchor_influence_score (weights = ANCHOR_WEIGHTS), evaluated for
+    all cells at once.
+
+    Returns:
+    - unrounded float64 array of shape grid.shape
+    """
+    field = np.zeros(grid.n_rows * grid.n_cols)
+
+    if len(lats) == 0:
+        return field.reshape(grid.shape)
+
+    # Bring longitudes next to the box (handles points across the antimeridian)
+    mid_lon = (grid.min_lon + grid.max_lon) / 2
+    lons = mid_lon + (lons - mid_lon + 180) % 360 - 180
+
+    rows = np.floor((lats - grid.min_lat) / grid.lat_step).astype(np.int64)
+    cols = np.floor((lons - grid.min_lon) / grid.lon_step).astype(np.int64)
+
+    reach_rows, reach_cols = grid.reach(radius_km)
+
+    # Drop points too far from the box to touch any cell
+    reachable = (
+        (rows >= -reach_rows) & (rows < grid.n_rows + reach_rows)
+        & (cols >= -reach_cols) & (cols < grid.n_cols + reach_cols)
+    )
+    lats, lons, rows, cols, weights = (
+        lats[reachable], lons[reachable], rows[reachable], cols[reachable], weights[reachable]
+    )
+
+    if len(lats) == 0:
+        return field.reshape(grid.shape)
+
+    # Only offsets that move some point into the grid: the stencil can
+    # be far wider than a small box (fine cells, large radius)
+    row_offsets = range(
+        max(-reach_rows, -int(rows.max())),
+        min(reach_rows, grid.n_rows - 1 - int(rows.min())) + 1,
+    )
+    col_offsets = range(
+        max(-reach_cols, -int(cols.max())),
+        min(reach_cols, grid.n_cols - 1 - int(cols.min())) + 1,
+    )
+
+    for row_offset in row_offsets:
+        cell_rows = rows + row_offset
+        row_ok = (cell_rows >= 0) & (cell_rows < grid.n_rows)
+
+        if not row_ok.any():
+            continue
+
+        for col_offset in col_offsets:
+            cell_cols = cols + col_offset
+            hit = np.flatnonzero(row_ok & (cell_cols >= 0) & (cell_cols < grid.n_cols))
+
+            if hit.size == 0:
+                continue
+
+            hit_rows = cell_rows[hit]
+            hit_cols = cell_cols[hit]
+
+            distances = haversine_pairs(
+                lats[hit],
+                lons[hit],
+                grid.center_lats[hit_rows],
+                grid.center_lons[hit_cols],
+            )
+            near = distances <= radius_km
+
+            np.add.at(
+                field,
+                hit_rows[near] * grid.n_cols + hit_cols[near],
+                weights[hit][near] / (distances[near] + 0.1),
+            )
+
+    return field.reshape(grid.shape)
+
+
+def phase3_raster(payload: dict) -> dict:
+    """
+    Phase 3 analysis for every cell of a bounding box.
+
+    Input payload structure:
+    {
+        "bbox": { "min_lat", "min_lon", "max_lat", "max_lon" },
+        "cell_size_m": 100,
+        "industry": "cafe",
+        "competitors": [...],
+        "anchors": [...]
+    }
+    Points must be listed: "region" payloads are rejected (score a
+    region's surface through its tile pyramid instead).
+
+    Returns:
+    - dict with grid metadata and three arrays of shape (rows, cols):
+      raw_competition_score (float64, rounded to 3 decimals),
+      normalized_competition_score (float64, rounded to 3 decimals),
+      density_label (uint8 codes into DENSITY_LABELS)
+
+    Values match phase3_analyze at each cell center, up to the last
+    floating-point bit of summation order. The scores stay float64:
+    float32 cannot hold a 3-decimal value such as 2065.807 exactly.
+
+    Raises:
+    - ValueError for a malformed bbox / cell_size_m, or a "region" payload
+    """
+    if "region" in payload:
+        raise ValueError('rasters need "competitors" / "anchors"; "region" is not supported')
+
+    grid = RasterGrid(payload.get("bbox"), payload.get("cell_size_m", 100))
+
+    competitors = payload.get("competitors", [])
+    anchors = payload.get("anchors", [])
+    industry = payload.get("industry", "default")
+
+    # Step 1: raw competition field
+    competitor_lats, competitor_lons = pack_coordinates(competitors)
+    raw_competition = np.round(
+        accumulate_field(
+            grid,
+            competitor_lats,
+            competitor_lons,
+            np.ones(len(competitors)),
+            COMPETITION_RADIUS_KM,
+        ),
+        3,
+    )
+
+    # Step 2: anchor influence field
+    anchor_lats, anchor_lons = pack_coordinates(anchors)
+    anchor_score = np.round(
+        accumulate_field(
+            grid,
+            anchor_lats,
+            anchor_lons,
+            anchor_weights(anchors, np.arange(len(anchors))),
+            ANCHOR_RADIUS_KM,
+        ),
+        3,
+    )
+
+    # Steps 3 – 5: same formulas as phase3_analyze
+    tolerance = get_density_tolerance(industry)
+    raw_effective = np.round((raw_competition + anchor_score) / tolerance, 3)
+    normalized = normalize_scores(raw_effective)
+
+    return {
+        **grid.metadata(),
+        "industry": industry,
+        "density_labels": list(DENSITY_LABELS),
+        "raw_competition_score": raw_effective,
+        "normalized_competition_score": normalized,
+        "density_label": classify_density_codes(normalized),
+    }
+
+
+def raster_to_npz(raster: dict) -> bytes:
+    """
+    Serializes a phase3_raster() result as a NumPy .npz archive.
+
+    Arrays are stored under their signal names; everything else goes into
+    a JSON "metadata" entry. Load with np.load(io.BytesIO(data)).
+    """
+    arrays = {key: value for key, value in raster.items() if isinstance(value, np.ndarray)}
+    metadata = {key: value for key, value in raster.items() if key not in arrays}
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    return buffer.getvalue()
+
+
+def phase3_raster_npz(payload: dict) -> tuple:
+    """
+    phase3_raster() + raster_to_npz() in one picklable call, so both the
+    computation and the compression can run in a worker process.
+
+    Returns:
+    - (shape, npz bytes)
+    """
+    raster = phase3_raster(payload)
+
+    return tuple(raster["shape"]), raster_to_npz(raster)
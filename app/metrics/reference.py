@@ -0,0 +1,114 @@
+"""
+reference.py
+
+Pure-Python reference implementations (the oracle).
+
+Every accelerated path (vectorized kernels, spatial indexes, store
+partitions, packed payloads) must give the same rounded output as the
+obvious implementation below:
+- one scalar haversine() per point, in point order
+- a plain `score += value` loop per signal
+- ANCHOR_WEIGHTS looked up by type name
+
+No NumPy, no index, no caching. It is far too slow for production
+traffic and exists to validate the engines (see app/shadow.py).
+
+Steps 3 – 6 of Phase 3 (normalization, labels, vectors) are already
+scalar Python shared by every mode, so the reference reuses
+build_phase3_result(); steps 1 – 2 are where the engines differ.
+
+classify_business_reference() (the registry walk) is re-exported so
+both oracles live behind one import.
+"""
+
+# classify_business_reference is re-exported for shadow evaluation
+from app.intelligence.industry_classifier import classify_business_reference
+from app.metrics.anchors import ANCHOR_RADIUS_KM, ANCHOR_WEIGHTS
+from app.metrics.competition import COMPETITION_RADIUS_KM
+from app.metrics.geodesic import haversine
+from app.metrics.phase3_engine import build_phase3_result
+from app.metrics.poi_store import load_region
+
+
+def competition_reference(target, competitors, radius_km=COMPETITION_RADIUS_KM) -> float:
+    """
+    effective_competition(), one competitor at a time.
+    """
+    score = 0.0
+
+    for competitor in competitors:
+        distance = haversine(target["lat"], target["lon"], competitor["lat"], competitor["lon"])
+
+        if distance <= radius_km:
+            score += 1 / (distance + 0.1)
+
+    return round(score, 3)
+
+
+def anchor_influence_reference(target, anchors, radius_km=ANCHOR_RADIUS_KM) -> float:
+    """
+    anchor_influence_score(), one anchor at a time.
+    """
+    score = 0.0
+
+    for anchor in anchors:
+        distance = haversine(target["lat"], target["lon"], anchor["lat"], anchor["lon"])
+
+        if distance <= radius_km:
+            weight = ANCHOR_WEIGHTS.get(anchor.get("type"), ANCHOR_WEIGHTS["default"])
+            score += weight / (distance + 0.1)
+
+    return round(score, 3)
+
+
+def _region_points(region, industry) -> tuple:
+    """
+    A region's competitors and typed anchors as plain dicts, read row
+    by row from its POI store.
+    """
+    store = load_region(region)
+
+    competing = set(store.competitor_codes(industry))
+    anchor_types = store.meta["anchor_types"]
+
+    competitors = []
+    anchors = []
+
+    for lat, lon, sub_industry, anchor_type in zip(
+        store.lat.tolist(),
+        store.lon.tolist(),
+        store.sub_industry.tolist(),
+        store.anchor_type.tolist(),
+    ):
+        if sub_industry in competing:
+            competitors.append({"lat": lat, "lon": lon})
+        if anchor_type >= 0:
+            anchors.append({"lat": lat, "lon": lon, "type": anchor_types[anchor_type]})
+
+    return competitors, anchors
+
+
+def phase3_analyze_reference(payload: dict) -> dict:
+    """
+    Reference phase3_analyze() for single-target payloads (listed
+    points or "region"), in the exact haversine distance mode.
+
+    Breakdown, timings and the approximate options ("distance_mode",
+    "anchor_error") are not modelled; compare only the core fields.
+
+    Returns:
+    - Phase 3 output (same shape as phase3_analyze without breakdown)
+    """
+    target = payload["target"]
+    industry = payload.get("industry", "default")
+
+    if "region" in payload:
+        competitors, anchors = _region_points(payload["region"], industry)
+    else:
+        competitors = payload.get("competitors", [])
+        anchors = payload.get("anchors", [])
+
+    raw_competition = competition_reference(target, competitors)
+    anchor_score = anchor_influence_reference(target, anchors)
+
+    return build_phase3_result(raw_competition, anchor_score, industry, len(competitors))
@@ -0,0 +1,348 @@
+"""
+result_cache.py
+
+Result cache in front of phase3_analyze.
+
+Why this exists:
+- Dashboards re-query the same neighbourhoods constantly
+- phase3_analyze is deterministic, so a repeated question can reuse
+  a previous answer
+
+Cache key:
+- the target's geohash cell (precision 8 by default, ~38 m x 19 m),
+  so GPS jitter around one spot still hits
+- every non-point payload field (industry, region, options)
+- content hash of the competitor / anchor set
+
+Tradeoff: a snapped hit returns the result computed for the FIRST
+target seen in that geohash cell, so its scores and breakdown distances
+are measured from a point up to a cell away from the requested one.
+Precision 0 keys on exact coordinates instead (no snapping; jittered
+requests then always miss).
+
+Backends:
+- MemoryCacheBackend: in-process LRU with TTL
+- DiskCacheBackend:   local SQLite file with LRU eviction and TTL
+                      (survives restarts, shared by local workers)
+
+Configuration (environment):
+- LOCATORIS_CACHE_BACKEND            memory | disk | off   (default memory)
+- LOCATORIS_CACHE_MAX_ENTRIES        default 10000
+- LOCATORIS_CACHE_TTL_SECONDS        default 300
+- LOCATORIS_CACHE_GEOHASH_PRECISION  default 8; 0 = exact coordinates
+- LOCATORIS_CACHE_PATH               default data/phase3_cache.sqlite3
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.metrics import geohash
+from app.metrics.geodesic import pack_coordinates
+from app.metrics.points import PointSet
+from app.metrics.poi_store import load_region
+
+# Payload fields that hold points (hashed by content, not by JSON text)
+_POINT_FIELDS = ("target", "competitors", "anchors")
+
+# Geohash length targets are snapped to (see module docstring)
+DEFAULT_GEOHASH_PRECISION = 8
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU cache with per-entry TTL.
+    """
+
+    def __init__(self, max_entries=10_000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCacheBackend:
+    """
+    SQLite-backed LRU cache with per-entry TTL.
+
+    Values are stored as JSON. Wall-clock time is used for expiry so
+    entries stay meaningful across restarts.
+    """
+
+    def __init__(self, path, max_entries=10_000, ttl_seconds=300.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_used)")
+        self._db.commit()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            value, expires_at = row
+
+            if expires_at <= now:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                self.expirations += 1
+                return None
+
+            self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+
+        return json.loads(value)
+
+    def put(self, key, value):
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl_seconds, now),
+            )
+
+            overflow = len(self) - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM results WHERE key IN"
+                    " (SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def poi_fingerprint(payload) -> str:
+    """
+    Content hash of the competitor / anchor set of a payload.
+
+    Coordinates are hashed as packed float64 bytes; anchor types are
+    hashed as text. Two payloads listing the same points in the same
+    order share a fingerprint. Region payloads use the store's own
+    fingerprint, so rebuilding a store invalidates its entries.
+    """
+    digest = hashlib.sha1()
+
+    if "region" in payload:
+        digest.update(load_region(payload["region"]).fingerprint.encode())
+
+    for field in ("competitors", "anchors"):
+        points = payload.get(field, [])
+        lats, lons = pack_coordinates(points)
+
+        digest.update(field.encode())
+        digest.update(np.int64(len(points)).tobytes())
+        digest.update(lats.tobytes())
+        digest.update(lons.tobytes())
+
+    anchors = payload.get("anchors", [])
+
+    if isinstance(anchors, PointSet):
+        anchor_types = anchors.types() if anchors.type_codes is not None else []
+    else:
+        anchor_types = (str(anchor.get("type")) for anchor in anchors)
+
+    digest.update("\x00".join(anchor_types).encode())
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache front for a deterministic analysis function.
+    """
+
+    def __init__(self, backend, precision=DEFAULT_GEOHASH_PRECISION):
+        self.backend = backend
+        self.precision = precision
+
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, payload) -> str:
+        """
+        Cache key: target (exact, or snapped when precision > 0) +
+        options + POI content hash.
+        """
+        target = payload["target"]
+
+        if self.precision:
+            cell = geohash.encode(target["lat"], target["lon"], self.precision)
+        else:
+            cell = f"{target['lat']!r},{target['lon']!r}"
+
+        # Everything except the points themselves (industry, region, options)
+        options = {
+            field: value
+            for field, value in payload.items()
+            if field not in _POINT_FIELDS
+        }
+
+        return "|".join((
+            cell,
+            json.dumps(options, sort_keys=True, default=str),
+            poi_fingerprint(payload),
+        ))
+
+    def lookup(self, payload):
+        """
+        Look a payload up without computing anything.
+
+        Returns:
+        - (key, result); result is None on a miss. Pass the key to
+          store() once the result is known.
+        """
+        key = self.key_for(payload)
+
+        result = self.backend.get(key)
+
+        with self._lock:
+            if result is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return key, result
+
+    def store(self, key, result):
+        self.backend.put(key, result)
+
+    def get_or_compute(self, payload, compute):
+        """
+        Return the cached result for payload, or compute and store it.
+        """
+        key, result = self.lookup(payload)
+
+        if result is None:
+            result = compute(payload)
+            self.store(key, result)
+
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+
+        lookups = hits + misses
+
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "max_entries": self.backend.max_entries,
+            "ttl_seconds": self.backend.ttl_seconds,
+            "geohash_precision": self.precision,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+        }
+
+
+def cache_from_env():
+    """
+    Build the Phase 3 result cache from environment settings.
+
+    Returns:
+    - ResultCache, or None when caching is switched off
+    """
+    backend_name = os.environ.get("LOCATORIS_CACHE_BACKEND", "memory")
+    max_entries = int(os.environ.get("LOCATORIS_CACHE_MAX_ENTRIES", "10000"))
+    ttl_seconds = float(os.environ.get("LOCATORIS_CACHE_TTL_SECONDS", "300"))
+    precision = int(os.environ.get("LOCATORIS_CACHE_GEOHASH_PRECISION", str(DEFAULT_GEOHASH_PRECISION)))
+
+    if backend_name == "off":
+        return None
+
+    if backend_name == "disk":
+        backend = DiskCacheBackend(
+            os.environ.get("LOCATORIS_CACHE_PATH", "data/phase3_cache.sqlite3"),
+            max_entries,
+            ttl_seconds,
+        )
+    elif backend_name == "memory":
+        backend = MemoryCacheBackend(max_entries, ttl_seconds)
+    else:
+        raise ValueError(f"unknown LOCATORIS_CACHE_BACKEND: {backend_name!r}")
+
+    return ResultCache(backend, precision)
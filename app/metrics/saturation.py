@@ -0,0 +1,577 @@
+"""
+saturation.py
+
+City-wide saturation: the Phase 3 output of every POI in a region store,
+scored against its own peers.
+
+Why this exists:
+- Market reports need effective_competition for every business in a
+  city against every other business of the same industry
+- One phase3_analyze call per POI is O(n^2) work with Python overhead
+  per call
+
+This bulk job is a grid-bucketed spatial self-join instead:
+- POIs are bucketed into small grid cells (BUCKET_KM)
+- each bucket fetches the store rows near it once, then scores all its
+  POIs against them in (POIs x candidates) distance blocks
+- each POI competes with the store rows of its own industry key
+  (industry_weights.industry_key_for), EXCLUDING ITSELF; every anchor
+  within ANCHOR_RADIUS_KM counts, including the POI itself when it is
+  an anchor (as for a phase3_analyze target placed on an anchor)
+- buckets are grouped into work units and scored on a process pool;
+  each worker memory-maps the same store
+
+Every POI's output equals phase3_analyze on a payload with the POI as
+target, industry = its industry key, the store's competitors of that
+key minus the POI, and the store's anchors (bit for bit in the default
+haversine mode). POIs without a known classification use "default".
+
+Output is one directory of .npy columns, row i = store row i, written
+through memory maps as work units finish:
+
+    <output>/
+        industry_key.npy                  int8     code into meta["industry_keys"]
+        competitor_count.npy              int32    competitors (self excluded)
+        competitors_within_radius.npy     int32
+        anchors_within_radius.npy         int32
+        raw_competition.npy               float64  step 1 score
+        anchor_score.npy                  float64  step 2 score
+        raw_competition_score.npy         float64  Phase 3 output fields ...
+        normalized_competition_score.npy  float64
+        density_label.npy                 uint8    code into meta["density_labels"]
+        dominant_competitor_present.npy   bool
+        competition_pattern.npy           uint8    code into meta["competition_patterns"]
+        meta.json                         written last: a directory without
+                                          it is an unfinished job
+
+Run:
+    python -m app.metrics.saturation karachi data/saturation/karachi --workers 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from app.metrics.anchors import ANCHOR_RADIUS_KM
+from app.metrics.competition import COMPETITION_RADIUS_KM
+from app.metrics.geodesic import (
+    DEFAULT_DISTANCE_MODE,
+    distance_matrix_within,
+    haversine_many,
+    resolve_distance_mode,
+)
+from app.metrics.industry_weights import INDUSTRY_DENSITY_TOLERANCE, industry_key_for
+from app.metrics.phase3_engine import DEFAULT_CHUNK_SIZE, DENSITY_LABELS, build_phase3_result
+from app.metrics.poi_store import load_region
+from app.metrics.spatial_index import GridIndex
+
+SATURATION_FORMAT_VERSION = 1
+
+# Industry keys a POI can be scored under ("default" = unclassified)
+INDUSTRY_KEYS = tuple(INDUSTRY_DENSITY_TOLERANCE)
+
+# competition_pattern values in code order
+COMPETITION_PATTERNS = ("distributed", "anchor_clustered")
+
+# Bucket cell edge (km). Small buckets keep the candidate square close
+# to the search circle: (0.5 + 2 x 2)^2 km^2 vs 12.6 km^2.
+BUCKET_KM = 0.5
+
+# POIs per work unit sent to a worker
+UNIT_POIS = 20_000
+
+SATURATION_COLUMNS = {
+    "industry_key": np.int8,
+    "competitor_count": np.int32,
+    "competitors_within_radius": np.int32,
+    "anchors_within_radius": np.int32,
+    "raw_competition": np.float64,
+    "anchor_score": np.float64,
+    "raw_competition_score": np.float64,
+    "normalized_competition_score": np.float64,
+    "density_label": np.uint8,
+    "dominant_competitor_present": np.bool_,
+    "competition_pattern": np.uint8,
+}
+
+# Per-process join state, by (store path, fingerprint)
+_JOIN_STATE = {}
+
+
+# -------------------------------
+# Join state (one per store and process)
+# -------------------------------
+
+def key_tables(store) -> tuple:
+    """
+    Industry key lookup tables of a store.
+
+    Returns:
+    - key_by_sub: industry key code per sub-industry code; code -1
+      (unclassified) indexes the extra last entry
+    - competes: (keys x sub-industry codes + 1) mask of the sub-industries
+      competing with each key
+    - key_totals: competitors per key code in the whole store
+    """
+    sub_keys = [industry_key_for(*pair) for pair in store.sub_industries] + ["default"]
+    key_by_sub = np.array([INDUSTRY_KEYS.index(key) for key in sub_keys], dtype=np.int8)
+
+    competes = np.zeros((len(INDUSTRY_KEYS), len(sub_keys)), dtype=bool)
+    for key_code, key in enumerate(INDUSTRY_KEYS):
+        competes[key_code, store.competitor_codes(key)] = True
+
+    key_totals = np.array(
+        [np.count_nonzero(mask[store.sub_industry]) for mask in competes],
+        dtype=np.int64,
+    )
+
+    return key_by_sub, competes, key_totals
+
+
+class _JoinState:
+    """
+    Store-wide lookup tables shared by every bucket of one job.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.index = GridIndex(store.lat, store.lon)
+
+        self.key_by_sub, self.competes, self.key_totals = key_tables(store)
+        self.key_code = self.key_by_sub[store.sub_industry]
+
+        # A POI competing under its own key is subtracted from the total
+        self.self_competes = self.competes[self.key_code, store.sub_industry]
+
+        self.is_anchor = np.asarray(store.anchor_type) >= 0
+        self.anchor_weight = np.where(
+            self.is_anchor,
+            store.anchor_weight_by_code[store.anchor_type],
+            0.0,
+        )
+
+
+def _join_state(region, store_root) -> _JoinState:
+    store = load_region(region, store_root)
+    key = (store.path, store.fingerprint)
+
+    state = _JOIN_STATE.get(key)
+    if state is None:
+        state = _JoinState(store)
+        _JOIN_STATE[key] = state
+
+    return state
+
+
+def release_join_state(region, store_root=None):
+    """
+    Drop this process's join state of a store (e.g. a finished shard).
+    """
+    store = load_region(region, store_root)
+    _JOIN_STATE.pop((store.path, store.fingerprint), None)
+
+
+# -------------------------------
+# Scoring
+# -------------------------------
+
+def _block_sums(
+    target_lats,
+    target_lons,
+    lats,
+    lons,
+    radius_km,
+    weights,
+    chunk_size,
+    mode,
+    target_rows=None,
+    point_rows=None,
+):
+    """
+    Per-target sums of weight / (d + 0.1) over points within radius.
+
+    When target_rows / point_rows are given, a target never counts the
+    point with its own row.
+
+    Hits are added per target in point order (np.bincount is a plain
+    sequential loop), so each sum matches competition_from_distances()
+    / anchor_influence_from_weights() before rounding.
+
+    Returns:
+    - (sums, hit counts) arrays, one entry per target
+    """
+    count = len(target_lats)
+    sums = np.zeros(count)
+    hits = np.zeros(count, dtype=np.int64)
+
+    if count == 0 or len(lats) == 0:
+        return sums, hits
+
+    rows_per_block = max(1, chunk_size // len(lats))
+    cos_lats = np.cos(np.radians(lats))
+
+    for start in range(0, count, rows_per_block):
+        stop = min(start + rows_per_block, count)
+
+        rows, cols, distances = distance_matrix_within(
+            target_lats[start:stop],
+            target_lons[start:stop],
+            lats,
+            lons,
+            radius_km,
+            cos_lats,
+            mode,
+        )
+
+        if target_rows is not None:
+            keep = point_rows[cols] != target_rows[start:stop][rows]
+            rows, cols, distances = rows[keep], cols[keep], distances[keep]
+
+        terms = weights[cols] / (distances + 0.1)
+
+        sums[start:stop] = np.bincount(rows, weights=terms, minlength=stop - start)
+        hits[start:stop] = np.bincount(rows, minlength=stop - start)
+
+    return sums, hits
+
+
+def _score_bucket(state, rows, chunk_size, mode) -> dict:
+    """
+    Raw signals of one bucket's POIs (store rows, in store order).
+    """
+    store = state.store
+    lats = store.lat[rows]
+    lons = store.lon[rows]
+
+    # Every row within radius of a bucket POI lies within radius + reach
+    # of the bucket's bounding-box middle
+    mid_lat = (float(lats.min()) + float(lats.max())) / 2
+    mid_lon = (float(lons.min()) + float(lons.max())) / 2
+    reach = float(haversine_many(mid_lat, mid_lon, lats, lons).max())
+
+    near = state.index.candidates(
+        mid_lat,
+        mid_lon,
+        max(COMPETITION_RADIUS_KM, ANCHOR_RADIUS_KM) + reach + 1e-6,
+    )
+
+    # Step 2: anchors (industry independent)
+    anchors = near[state.is_anchor[near]]
+    anchor_sums, anchor_hits = _block_sums(
+        lats,
+        lons,
+        store.lat[anchors],
+        store.lon[anchors],
+        ANCHOR_RADIUS_KM,
+        state.anchor_weight[anchors],
+        chunk_size,
+        mode,
+    )
+
+    # Step 1: competitors, one block set per industry key in the bucket
+    key_codes = state.key_code[rows]
+    competition_sums = np.zeros(len(rows))
+    competition_hits = np.zeros(len(rows), dtype=np.int64)
+
+    for key_code in np.unique(key_codes).tolist():
+        members = np.flatnonzero(key_codes == key_code)
+        peers = near[state.competes[key_code][store.sub_industry[near]]]
+
+        sums, hits = _block_sums(
+            lats[members],
+            lons[members],
+            store.lat[peers],
+            store.lon[peers],
+            COMPETITION_RADIUS_KM,
+            np.ones(len(peers)),
+            chunk_size,
+            mode,
+            target_rows=rows[members],
+            point_rows=peers,
+        )
+        competition_sums[members] = sums
+        competition_hits[members] = hits
+
+    return {
+        "key_codes": key_codes,
+        "competition_sums": competition_sums,
+        "competition_hits": competition_hits,
+        "anchor_sums": anchor_sums,
+        "anchor_hits": anchor_hits,
+    }
+
+
+def score_unit(
+    region,
+    buckets,
+    store_root=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    mode=DEFAULT_DISTANCE_MODE,
+    key_totals=None,
+) -> dict:
+    """
+    Saturation columns for the store rows of some buckets.
+
+    Runs in a worker process; only row ids cross the process boundary.
+
+    Parameters:
+    - region, store_root: the store (opened memory-mapped, once per process)
+    - buckets: list of store row arrays (each in store order)
+    - key_totals: competitors per industry key code, when the store is
+      only part of the scored set (a shard, see sharding.py)
+
+    Returns:
+    - { "rows": store rows, column name: values } (SATURATION_COLUMNS)
+    """
+    state = _join_state(region, store_root)
+    key_totals = list(state.key_totals if key_totals is None else key_totals)
+    values = {name: [] for name in SATURATION_COLUMNS}
+
+    for bucket in buckets:
+        signals = _score_bucket(state, bucket, chunk_size, mode)
+
+        for key_code, self_competes, competition, anchors, competition_hits, anchor_hits in zip(
+            signals["key_codes"].tolist(),
+            state.self_competes[bucket].tolist(),
+            signals["competition_sums"].tolist(),
+            signals["anchor_sums"].tolist(),
+            signals["competition_hits"].tolist(),
+            signals["anchor_hits"].tolist(),
+        ):
+            # Steps 3 – 6 exactly as phase3_analyze (scalar rounding)
+            raw_competition = round(competition, 3)
+            anchor_score = round(anchors, 3)
+            competitor_count = key_totals[key_code] - self_competes
+
+            result = build_phase3_result(
+                raw_competition,
+                anchor_score,
+                INDUSTRY_KEYS[key_code],
+                competitor_count,
+            )
+
+            values["industry_key"].append(key_code)
+            values["competitor_count"].append(competitor_count)
+            values["competitors_within_radius"].append(competition_hits)
+            values["anchors_within_radius"].append(anchor_hits)
+            values["raw_competition"].append(raw_competition)
+            values["anchor_score"].append(anchor_score)
+            values["raw_competition_score"].append(result["raw_competition_score"])
+            values["normalized_competition_score"].append(result["normalized_competition_score"])
+            values["density_label"].append(DENSITY_LABELS.index(result["density_label"]))
+            values["dominant_competitor_present"].append(result["dominant_competitor_present"])
+            values["competition_pattern"].append(COMPETITION_PATTERNS.index(result["competition_pattern"]))
+
+    columns = {
+        name: np.array(values[name], dtype=dtype)
+        for name, dtype in SATURATION_COLUMNS.items()
+    }
+    columns["rows"] = np.concatenate(buckets) if buckets else np.empty(0, dtype=np.int64)
+
+    return columns
+
+
+# -------------------------------
+# Job
+# -------------------------------
+
+def work_units(store, bucket_km=BUCKET_KM, unit_pois=UNIT_POIS, rows=None) -> list:
+    """
+    Buckets of a store grouped into work units of about unit_pois POIs.
+
+    Parameters:
+    - rows: optional sorted store rows to cover (default: every row)
+
+    Returns:
+    - list of units, each a list of store row arrays
+    """
+    if rows is None:
+        rows = np.arange(len(store))
+
+    units = [[]]
+    size = 0
+
+    for bucket in GridIndex(store.lat[rows], store.lon[rows], bucket_km).buckets():
+        bucket = rows[bucket]
+
+        if size >= unit_pois:
+            units.append([])
+            size = 0
+
+        units[-1].append(bucket)
+        size += len(bucket)
+
+    return units if size else []
+
+
+def open_output(output, count) -> dict:
+    """
+    Create (or replace) an output's columns as writable memory maps.
+
+    A previous meta.json is removed first: it would vouch for
+    half-written columns.
+    """
+    os.makedirs(output, exist_ok=True)
+
+    meta_path = os.path.join(output, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    return {
+        name: np.lib.format.open_memmap(
+            os.path.join(output, f"{name}.npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=(count,),
+        )
+        for name, dtype in SATURATION_COLUMNS.items()
+    }
+
+
+def write_rows(columns, result):
+    """
+    Store one score_unit() result in the output columns (by store row).
+    """
+    rows = result["rows"]
+
+    for name, column in columns.items():
+        column[rows] = result[name]
+
+
+def close_output(output, columns, meta):
+    """
+    Flush the columns and write meta.json, marking the job finished.
+    """
+    for column in columns.values():
+        column.flush()
+
+    # Written aside and renamed, so readers never see half a meta.json
+    meta_path = os.path.join(output, "meta.json")
+    temporary = meta_path + ".tmp"
+
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(meta, handle, indent=2)
+
+    os.replace(temporary, meta_path)
+
+
+def output_meta(region, store, mode) -> dict:
+    """
+    meta.json fields shared by every way of producing an output.
+    """
+    return {
+        "version": SATURATION_FORMAT_VERSION,
+        "region": region,
+        "store_fingerprint": store.fingerprint,
+        "count": len(store),
+        "distance_mode": mode,
+        "industry_keys": list(INDUSTRY_KEYS),
+        "density_labels": list(DENSITY_LABELS),
+        "competition_patterns": list(COMPETITION_PATTERNS),
+    }
+
+
+def run_saturation(
+    region,
+    output,
+    store_root=None,
+    workers=None,
+    bucket_km=BUCKET_KM,
+    unit_pois=UNIT_POIS,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    mode=DEFAULT_DISTANCE_MODE,
+) -> dict:
+    """
+    Score every POI of a region against its peers and write the columns.
+
+    Parameters:
+    - region, store_root: the POI store
+    - output: output directory (created; existing columns are replaced)
+    - workers: worker processes (default: CPU count; 1 = in process)
+    - bucket_km, unit_pois: bucket cell edge and work unit size
+    - chunk_size: max distance-matrix cells computed at once per worker
+    - mode: distance strategy (see geodesic.DISTANCE_MODES)
+
+    Returns:
+    - the output's meta dict (includes timing)
+    """
+    started = time.perf_counter()
+    store = load_region(region, store_root)
+
+    # Unknown modes fail before any output is touched
+    resolve_distance_mode(mode, 0.0, COMPETITION_RADIUS_KM)
+    workers = workers or os.cpu_count() or 1
+
+    columns = open_output(output, len(store))
+    units = work_units(store, bucket_km, unit_pois)
+    options = {"store_root": store_root, "chunk_size": chunk_size, "mode": mode}
+
+    if workers == 1:
+        for unit in units:
+            write_rows(columns, score_unit(region, unit, **options))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = [executor.submit(score_unit, region, unit, **options) for unit in units]
+
+            for future in as_completed(futures):
+                write_rows(columns, future.result())
+
+    meta = {
+        **output_meta(region, store, mode),
+        "workers": workers,
+        "work_units": len(units),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    close_output(output, columns, meta)
+
+    return meta
+
+
+def load_saturation(output) -> tuple:
+    """
+    Open a finished saturation output.
+
+    Returns:
+    - (meta dict, { column name: read-only memory-mapped array })
+
+    Raises FileNotFoundError if the job never finished.
+    """
+    with open(os.path.join(output, "meta.json"), "r", encoding="utf-8") as handle:
+        meta = json.load(handle)
+
+    columns = {
+        name: np.load(os.path.join(output, f"{name}.npy"), mmap_mode="r")
+        for name in SATURATION_COLUMNS
+    }
+
+    return meta, columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score every POI of a region against its peers (Phase 3 self-join)."
+    )
+    parser.add_argument("region", help="region name of a built POI store")
+    parser.add_argument("output", help="output directory, e.g. data/saturation/<region>")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--distance-mode", default=DEFAULT_DISTANCE_MODE,
+                        help="haversine (exact, default), local_projection or auto")
+    args = parser.parse_args(argv)
+
+    meta = run_saturation(args.region, args.output, workers=args.workers, mode=args.distance_mode)
+    print(
+        f"scored {meta['count']} POIs in {meta['seconds']} s "
+        f"({meta['work_units']} work units, {meta['workers']} workers)"
+    )
+
+
+if __name__ == "__main__":
+    main()
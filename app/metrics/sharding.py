@@ -0,0 +1,462 @@
+"""
+sharding.py
+
+Geohash-sharded saturation runs (see saturation.py) with halo margins.
+
+Why this exists:
+- Country-scale stores do not fit one process
+- Splitting naively by region gives wrong scores at shard borders:
+  effective_competition and anchor_influence_score look up to
+  COMPETITION_RADIUS_KM across the boundary
+
+How it works:
+- Every POI belongs to exactly one geohash tile (its CORE shard)
+- Each shard also replicates a HALO: every POI within halo_km of the
+  tile rectangle (halo_km >= the largest Phase 3 radius)
+- A shard is written as a self-contained POI store (poi_store.extract_store)
+  holding its core and halo rows in parent store order, plus rows.npy
+  (parent row ids) and core.npy (core flags)
+- score_shard() scores the core rows against the whole shard; store-wide
+  competitor counts come from the coordinator
+- Results are merged by parent row id into the saturation output
+  format, so completion order never matters
+
+Because a shard holds every point any of its core POIs can see, in
+parent order, sharded output equals run_saturation() output exactly;
+verify_sharding() (CLI --verify) checks this column by column.
+
+Executors:
+- Shards run on any concurrent.futures-style executor (an object with
+  submit(fn, *args, **kwargs) -> Future)
+- The default is a local spawn process pool; InlineExecutor runs in process
+- An executor for other nodes needs the shard directories on storage
+  those nodes can read; only the shard spec (paths) and the industry
+  totals are sent
+
+Tiles are geohash cells: precision 4 is ~39 x 20 km, 3 is ~156 km.
+
+Run:
+    python -m app.metrics.sharding karachi data/saturation/karachi --precision 4 --verify
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from math import asin, cos, degrees, floor, radians, sin
+
+import numpy as np
+
+from app.metrics import geohash
+from app.metrics.anchors import ANCHOR_RADIUS_KM
+from app.metrics.competition import COMPETITION_RADIUS_KM
+from app.metrics.geodesic import DEFAULT_DISTANCE_MODE, EARTH_RADIUS_KM, resolve_distance_mode
+from app.metrics.phase3_engine import DEFAULT_CHUNK_SIZE
+from app.metrics.poi_store import extract_store, load_region
+from app.metrics.saturation import (
+    BUCKET_KM,
+    SATURATION_COLUMNS,
+    UNIT_POIS,
+    close_output,
+    key_tables,
+    load_saturation,
+    open_output,
+    output_meta,
+    release_join_state,
+    run_saturation,
+    score_unit,
+    work_units,
+    write_rows,
+)
+
+# Geohash characters per shard tile
+DEFAULT_PRECISION = 4
+
+# Widest radius any Phase 3 signal looks across a border
+MIN_HALO_KM = max(COMPETITION_RADIUS_KM, ANCHOR_RADIUS_KM)
+
+# Extra slack (degrees) on halo rectangles; more halo never changes scores
+_HALO_MARGIN_DEG = 1e-6
+
+
+class InlineExecutor:
+    """
+    Executor that runs each job immediately, in this process.
+    """
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+# -------------------------------
+# Tiles
+# -------------------------------
+
+def _tile_bits(precision) -> tuple:
+    """
+    (latitude bits, longitude bits) of a geohash precision.
+    """
+    return 5 * precision // 2, (5 * precision + 1) // 2
+
+
+def tile_cells(lats, lons, precision) -> tuple:
+    """
+    Integer (row, col) of every point's tile at a geohash precision.
+    """
+    lat_bits, lon_bits = _tile_bits(precision)
+
+    rows = np.floor((lats + 90) / (180 / 2**lat_bits)).astype(np.int64)
+    cols = np.floor((lons + 180) / (360 / 2**lon_bits)).astype(np.int64)
+
+    return np.clip(rows, 0, 2**lat_bits - 1), np.clip(cols, 0, 2**lon_bits - 1)
+
+
+def tile_name(row, col, precision) -> str:
+    """
+    Geohash of a tile (encoded from its center).
+    """
+    lat_bits, lon_bits = _tile_bits(precision)
+    lat_deg = 180 / 2**lat_bits
+    lon_deg = 360 / 2**lon_bits
+
+    return geohash.encode(-90 + (row + 0.5) * lat_deg, -180 + (col + 0.5) * lon_deg, precision)
+
+
+def _halo_rows(lats, lons, row, col, precision, halo_km, cells):
+    """
+    Store rows within halo_km of one tile rectangle (a superset), in
+    store order, including the tile's own rows.
+
+    Parameters:
+    - cells: { (tile row, tile col): store rows } of occupied tiles
+    """
+    lat_bits, lon_bits = _tile_bits(precision)
+    lat_deg = 180 / 2**lat_bits
+    lon_deg = 360 / 2**lon_bits
+
+    min_lat = -90 + row * lat_deg
+    max_lat = min_lat + lat_deg
+    min_lon = -180 + col * lon_deg
+
+    angular = halo_km / EARTH_RADIUS_KM
+    dlat = degrees(angular) + _HALO_MARGIN_DEG
+
+    # Widest longitude offset of a circle of radius halo_km around any
+    # point of the tile (as GridIndex._column_range); None = every column
+    cos_lat = cos(radians(max(abs(min_lat), abs(max_lat))))
+
+    if max_lat + dlat >= 90 or min_lat - dlat <= -90 or sin(angular) >= cos_lat:
+        dlon = None
+    else:
+        dlon = degrees(asin(sin(angular) / cos_lat)) + _HALO_MARGIN_DEG
+
+        if lon_deg + 2 * dlon >= 360:
+            dlon = None
+
+    first_row = max(floor((min_lat - dlat + 90) / lat_deg), 0)
+    last_row = min(floor((max_lat + dlat + 90) / lat_deg), 2**lat_bits - 1)
+
+    if dlon is None:
+        columns = range(2**lon_bits)
+    else:
+        first_col = floor((min_lon - dlon + 180) / lon_deg)
+        last_col = floor((min_lon + lon_deg + dlon + 180) / lon_deg)
+        columns = sorted({c % 2**lon_bits for c in range(first_col, last_col + 1)})
+
+    candidates = [
+        cells[(r, c)]
+        for r in range(first_row, last_row + 1)
+        for c in columns
+        if (r, c) in cells
+    ]
+
+    if not candidates:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = np.sort(np.concatenate(candidates))
+
+    keep = (lats[candidates] >= min_lat - dlat) & (lats[candidates] <= max_lat + dlat)
+
+    if dlon is not None:
+        # Longitude offset from the expanded rectangle's west edge, wrapped
+        offset = (lons[candidates] - (min_lon - dlon)) % 360
+        keep &= offset <= lon_deg + 2 * dlon
+
+    return candidates[keep]
+
+
+# -------------------------------
+# Shards
+# -------------------------------
+
+def write_shards(
+    region,
+    shard_root,
+    store_root=None,
+    precision=DEFAULT_PRECISION,
+    halo_km=MIN_HALO_KM,
+) -> list:
+    """
+    Split a store into geohash shards with halo margins.
+
+    Parameters:
+    - region, store_root: the parent POI store
+    - shard_root: directory receiving one store per shard
+    - precision: geohash characters per tile
+    - halo_km: halo width; at least MIN_HALO_KM
+
+    Returns:
+    - shard specs in tile order: { "tile", "region", "root", "core", "halo" }
+
+    Raises:
+    - ValueError for a halo narrower than the Phase 3 radii
+    """
+    if halo_km < MIN_HALO_KM:
+        raise ValueError(f"halo_km must be at least {MIN_HALO_KM} (the largest Phase 3 radius)")
+
+    store = load_region(region, store_root)
+    lats = np.asarray(store.lat)
+    lons = np.asarray(store.lon)
+
+    tile_rows, tile_cols = tile_cells(lats, lons, precision)
+
+    # Occupied tiles -> their rows, in store order
+    tile_ids = tile_rows * 2 ** _tile_bits(precision)[1] + tile_cols
+    order = np.argsort(tile_ids, kind="stable")
+    present, starts = np.unique(tile_ids[order], return_index=True)
+    stops = np.append(starts[1:], len(order))
+
+    cells = {}
+    for tile_id, start, stop in zip(present.tolist(), starts.tolist(), stops.tolist()):
+        cells[divmod(tile_id, 2 ** _tile_bits(precision)[1])] = order[start:stop]
+
+    specs = []
+
+    for (row, col), core_rows in cells.items():
+        rows = _halo_rows(lats, lons, row, col, precision, halo_km, cells)
+        tile = tile_name(row, col, precision)
+
+        shard_region = f"{region}-{tile}"
+        path = os.path.join(shard_root, shard_region)
+
+        extract_store(store, rows, path)
+        np.save(os.path.join(path, "rows.npy"), rows)
+        np.save(os.path.join(path, "core.npy"), np.isin(rows, core_rows))
+
+        specs.append({
+            "tile": tile,
+            "region": shard_region,
+            "root": shard_root,
+            "core": len(core_rows),
+            "halo": len(rows) - len(core_rows),
+        })
+
+    return specs
+
+
+def score_shard(
+    spec,
+    key_totals,
+    bucket_km=BUCKET_KM,
+    unit_pois=UNIT_POIS,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    mode=DEFAULT_DISTANCE_MODE,
+) -> dict:
+    """
+    Saturation columns of one shard's core POIs.
+
+    Runs wherever the executor puts it; reads only the shard directory.
+
+    Parameters:
+    - spec: a write_shards() shard spec
+    - key_totals: competitors per industry key code in the PARENT store
+
+    Returns:
+    - { "rows": parent store rows, column name: values }
+    """
+    path = os.path.join(spec["root"], spec["region"])
+    parent_rows = np.load(os.path.join(path, "rows.npy"))
+    core = np.flatnonzero(np.load(os.path.join(path, "core.npy")))
+
+    store = load_region(spec["region"], spec["root"])
+    results = [
+        score_unit(spec["region"], unit, spec["root"], chunk_size, mode, key_totals)
+        for unit in work_units(store, bucket_km, unit_pois, rows=core)
+    ]
+
+    # Workers go on to other shards; this one's index is no longer needed
+    release_join_state(spec["region"], spec["root"])
+
+    merged = {
+        name: np.concatenate([result[name] for result in results] or [np.empty(0, dtype=dtype)])
+        for name, dtype in SATURATION_COLUMNS.items()
+    }
+    shard_rows = np.concatenate([result["rows"] for result in results] or [core])
+    merged["rows"] = parent_rows[shard_rows]
+
+    return merged
+
+
+def _local_executor(workers):
+    if workers == 1:
+        return InlineExecutor()
+
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def run_sharded_saturation(
+    region,
+    output,
+    shard_root,
+    store_root=None,
+    precision=DEFAULT_PRECISION,
+    halo_km=MIN_HALO_KM,
+    executor=None,
+    workers=None,
+    mode=DEFAULT_DISTANCE_MODE,
+) -> dict:
+    """
+    run_saturation(), one geohash shard per job.
+
+    Parameters:
+    - region, store_root: the parent POI store
+    - output: saturation output directory (same format as run_saturation)
+    - shard_root: scratch directory for the shard stores
+    - precision, halo_km: see write_shards()
+    - executor: optional concurrent.futures-style executor; by default a
+      local process pool of `workers` (1 = in process)
+    - mode: distance strategy (see geodesic.DISTANCE_MODES)
+
+    Returns:
+    - the output's meta dict (includes shard counts and timing)
+
+    Raises:
+    - RuntimeError if the shards did not cover every row exactly once
+    """
+    started = time.perf_counter()
+    resolve_distance_mode(mode, 0.0, COMPETITION_RADIUS_KM)
+
+    store = load_region(region, store_root)
+    _, _, key_totals = key_tables(store)
+    specs = write_shards(region, shard_root, store_root, precision, halo_km)
+
+    columns = open_output(output, len(store))
+    covered = np.zeros(len(store), dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+
+    with executor or _local_executor(workers) as pool:
+        futures = [pool.submit(score_shard, spec, key_totals.tolist(), mode=mode) for spec in specs]
+
+        # Rows are disjoint across shards, so completion order is irrelevant
+        for future in as_completed(futures):
+            result = future.result()
+            write_rows(columns, result)
+            covered[result["rows"]] += 1
+
+    if not np.all(covered == 1):
+        raise RuntimeError("shards did not cover every POI exactly once")
+
+    meta = {
+        **output_meta(region, store, mode),
+        "sharding": {
+            "precision": precision,
+            "halo_km": halo_km,
+            "shards": len(specs),
+            "halo_rows": sum(spec["halo"] for spec in specs),
+        },
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    close_output(output, columns, meta)
+
+    return meta
+
+
+def verify_sharding(
+    region,
+    sharded_output,
+    reference_output,
+    store_root=None,
+    workers=None,
+    mode=DEFAULT_DISTANCE_MODE,
+) -> list:
+    """
+    Compare a sharded output against a fresh single-process run.
+
+    Returns:
+    - names of the columns that differ (empty when identical)
+    """
+    run_saturation(region, reference_output, store_root=store_root, workers=workers, mode=mode)
+
+    _, sharded = load_saturation(sharded_output)
+    _, reference = load_saturation(reference_output)
+
+    return [name for name in SATURATION_COLUMNS if not np.array_equal(sharded[name], reference[name])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score every POI of a region shard by shard (geohash tiles with halos)."
+    )
+    parser.add_argument("region", help="region name of a built POI store")
+    parser.add_argument("output", help="output directory, e.g. data/saturation/<region>")
+    parser.add_argument("--shard-root", default=None, help="shard scratch directory (default: <output>-shards)")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION, help="geohash characters per shard")
+    parser.add_argument("--halo-km", type=float, default=MIN_HALO_KM, help="halo width (km)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--distance-mode", default=DEFAULT_DISTANCE_MODE,
+                        help="haversine (exact, default), local_projection or auto")
+    parser.add_argument("--verify", action="store_true",
+                        help="also run single-process and require identical columns")
+    args = parser.parse_args(argv)
+
+    shard_root = args.shard_root or args.output.rstrip("/") + "-shards"
+
+    meta = run_sharded_saturation(
+        args.region,
+        args.output,
+        shard_root,
+        precision=args.precision,
+        halo_km=args.halo_km,
+        workers=args.workers,
+        mode=args.distance_mode,
+    )
+    sharding = meta["sharding"]
+    print(
+        f"scored {meta['count']} POIs in {meta['seconds']} s "
+        f"({sharding['shards']} shards, {sharding['halo_rows']} halo rows)"
+    )
+
+    if args.verify:
+        differing = verify_sharding(
+            args.region,
+            args.output,
+            args.output.rstrip("/") + "-reference",
+            workers=args.workers,
+            mode=args.distance_mode,
+        )
+
+        if differing:
+            raise SystemExit(f"sharded output differs from single-process output: {differing}")
+
+        print("sharded output equals single-process output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+site_search.py
+
+Candidate-site search ("where in this district should a cafe go?").
+
+Instead of scoring a hand-made grid of targets, the search explores an
+area (bbox or polygon) coarse-to-fine:
+
+1. Lay a fine grid over the area (cell = resolution_m)
+2. Group fine cells into coarse blocks (2^L x 2^L fine cells) and score
+   one representative point per block
+3. Keep the best blocks (a beam, kept spatially diverse), split each
+   into 4 children, score those, and repeat down to the fine grid
+4. Pick the top-N scored points greedily, at least min_separation_m apart
+
+Only a small fraction of the fine cells is ever scored. This is a
+heuristic: a narrow peak inside a block whose representative scores
+poorly can be missed. Widen beam_width to trade time for recall.
+
+Objective (higher is better):
+    competition_weight * raw_competition + anchor_weight * anchor_score
+with defaults -1 and +1 (low competition, strong anchors). Both signals
+are exactly the ones phase3_analyze computes, and every returned site
+carries its full Phase 3 output.
+"""
+
+import math
+
+import numpy as np
+
+from app.metrics.anchors import ANCHOR_RADIUS_KM, anchor_weights, anchor_influence_from_weights
+from app.metrics.competition import COMPETITION_RADIUS_KM, competition_from_distances
+from app.metrics.geodesic import KM_PER_DEGREE, haversine_many, pack_coordinates
+from app.metrics.phase3_engine import build_phase3_result
+from app.metrics.poi_store import Partition, load_region, query_partitions
+
+# Refuse fine grids larger than this many cells
+MAX_SEARCH_CELLS = 4_000_000
+
+# Coarsest level is chosen so it has at most this many blocks
+MAX_COARSE_BLOCKS = 1_024
+
+# Finest allowed resolution (meters)
+MIN_RESOLUTION_M = 10
+
+DEFAULT_RESOLUTION_M = 50
+DEFAULT_TOP_N = 5
+DEFAULT_MIN_SEPARATION_M = 500
+DEFAULT_BEAM_WIDTH = 48
+
+# Widest allowed beam; a beam this wide already keeps every coarse block
+MAX_BEAM_WIDTH = MAX_COARSE_BLOCKS
+
+DEFAULT_OBJECTIVE = {"competition_weight": -1.0, "anchor_weight": 1.0}
+
+
+# -------------------------------
+# Search area
+# -------------------------------
+
+def _polygon_vertices(polygon) -> np.ndarray:
+    """
+    (n, 2) array of (lat, lon) from [{"lat", "lon"}, ...] or [[lat, lon], ...].
+    """
+    vertices = [
+        (point["lat"], point["lon"]) if isinstance(point, dict) else tuple(point)
+        for point in polygon
+    ]
+
+    if len(vertices) < 3:
+        raise ValueError("polygon needs at least 3 vertices")
+
+    return np.asarray(vertices, dtype=np.float64)
+
+
+class SearchArea:
+    """
+    Fine grid over the search area plus an inside mask.
+
+    Cell (row, col) is scored at its center; row 0 is south, col 0 west.
+    """
+
+    def __init__(self, payload, resolution_m):
+        if resolution_m < MIN_RESOLUTION_M:
+            raise ValueError(f"resolution_m must be at least {MIN_RESOLUTION_M}")
+
+        if "polygon" in payload:
+            self.vertices = _polygon_vertices(payload["polygon"])
+            min_lat, min_lon = self.vertices.min(axis=0)
+            max_lat, max_lon = self.vertices.max(axis=0)
+        elif "bbox" in payload:
+            bbox = payload["bbox"]
+            self.vertices = None
+            min_lat, min_lon = float(bbox["min_lat"]), float(bbox["min_lon"])
+            max_lat, max_lon = float(bbox["max_lat"]), float(bbox["max_lon"])
+        else:
+            raise ValueError('search needs a "bbox" or a "polygon"')
+
+        if min_lat >= max_lat or min_lon >= max_lon:
+            raise ValueError("search area must have positive extent")
+
+        if max(abs(min_lat), abs(max_lat)) > 85:
+            raise ValueError("search area must stay within ±85 degrees latitude")
+
+        mid_lat = (min_lat + max_lat) / 2
+        cell_km = resolution_m / 1000
+
+        self.lat_step = cell_km / KM_PER_DEGREE
+        self.lon_step = cell_km / (KM_PER_DEGREE * math.cos(math.radians(mid_lat)))
+        self.min_lat, self.min_lon = min_lat, min_lon
+
+        self.n_rows = max(1, math.ceil((max_lat - min_lat) / self.lat_step))
+        self.n_cols = max(1, math.ceil((max_lon - min_lon) / self.lon_step))
+
+        if self.n_rows * self.n_cols > MAX_SEARCH_CELLS:
+            raise ValueError(
+                f"search grid would have {self.n_rows * self.n_cols} cells "
+                f"(limit {MAX_SEARCH_CELLS}); use a larger resolution_m"
+            )
+
+        self.inside = self._inside_mask()
+
+        if not self.inside.any():
+            raise ValueError("search area contains no grid cell centers")
+
+    def center_lat(self, rows):
+        return self.min_lat + (np.asarray(rows) + 0.5) * self.lat_step
+
+    def center_lon(self, cols):
+        return self.min_lon + (np.asarray(cols) + 0.5) * self.lon_step
+
+    def _inside_mask(self) -> np.ndarray:
+        """
+        Even-odd rule, one row at a time: find where polygon edges cross
+        the row's latitude and fill the spans between crossing pairs.
+        """
+        mask = np.ones((self.n_rows, self.n_cols), dtype=bool)
+
+        if self.vertices is None:
+            return mask
+
+        mask[:] = False
+
+        lat_a = self.vertices[:, 0]
+        lon_a = self.vertices[:, 1]
+        lat_b = np.roll(lat_a, -1)
+        lon_b = np.roll(lon_a, -1)
+
+        col_lons = self.center_lon(np.arange(self.n_cols))
+
+        for row, lat in enumerate(self.center_lat(np.arange(self.n_rows)).tolist()):
+            crosses = (lat_a > lat) != (lat_b > lat)
+
+            if not crosses.any():
+                continue
+
+            a_lat, a_lon = lat_a[crosses], lon_a[crosses]
+            b_lat, b_lon = lat_b[crosses], lon_b[crosses]
+
+            crossing_lons = np.sort(a_lon + (lat - a_lat) * (b_lon - a_lon) / (b_lat - a_lat))
+            inside_count = np.searchsorted(crossing_lons, col_lons)
+
+            mask[row] = inside_count % 2 == 1
+
+        return mask
+
+
+# -------------------------------
+# Scoring
+# -------------------------------
+
+class _Scorer:
+    """
+    Scores points with the exact Phase 3 raw signals.
+
+    Points come as partitions (a store's, or one per payload point
+    list); anchor_weight_of maps anchor rows to their weights.
+    """
+
+    def __init__(self, competitor_partitions, anchor_partitions, anchor_weight_of, weights):
+        self.competitor_partitions = competitor_partitions
+        self.anchor_partitions = anchor_partitions
+        self.anchor_weight_of = anchor_weight_of
+        self.competitor_count = sum(len(partition) for partition in competitor_partitions)
+        self.competition_weight = float(weights["competition_weight"])
+        self.anchor_weight = float(weights["anchor_weight"])
+        self.evaluations = 0
+
+    def signals(self, lat, lon) -> tuple:
+        """
+        (raw_competition, anchor_score), rounded as in phase3_analyze.
+        """
+        _, competitor_distances = query_partitions(
+            self.competitor_partitions, lat, lon, COMPETITION_RADIUS_KM
+        )
+        anchor_rows, anchor_distances = query_partitions(
+            self.anchor_partitions, lat, lon, ANCHOR_RADIUS_KM
+        )
+
+        return (
+            competition_from_distances(competitor_distances),
+            anchor_influence_from_weights(
+                self.anchor_weight_of(anchor_rows),
+                anchor_distances,
+            ),
+        )
+
+    def objective(self, lats, lons) -> np.ndarray:
+        scores = np.empty(len(lats))
+
+        for i, (lat, lon) in enumerate(zip(lats.tolist(), lons.tolist())):
+            raw_competition, anchor_score = self.signals(lat, lon)
+            scores[i] = self.competition_weight * raw_competition + self.anchor_weight * anchor_score
+
+        self.evaluations += len(lats)
+
+        return scores
+
+
+# -------------------------------
+# Coarse-to-fine search
+# -------------------------------
+
+def _block_representatives(area, level, blocks):
+    """
+    One scored point per block: the fine cell nearest the block center
+    that lies inside the area. Blocks with no inside cell are dropped.
+
+    Returns:
+    - (blocks kept, rows, cols) of their representative fine cells
+    """
+    size = 1 << level
+    kept, rows, cols = [], [], []
+
+    for block_row, block_col in blocks:
+        row0, col0 = block_row * size, block_col * size
+        window = area.inside[row0:row0 + size, col0:col0 + size]
+
+        if not window.any():
+            continue
+
+        center = (size - 1) / 2
+        local_rows, local_cols = np.nonzero(window)
+        best = np.argmin((local_rows - center) ** 2 + (local_cols - center) ** 2)
+
+        kept.append((block_row, block_col))
+        rows.append(row0 + int(local_rows[best]))
+        cols.append(col0 + int(local_cols[best]))
+
+    return kept, np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+def _spread_pick(lats, lons, order, count, min_separation_km) -> list:
+    """
+    Greedy pick in `order`, skipping points closer than min_separation_km
+    to one already picked.
+    """
+    picked = []
+
+    for i in order:
+        if len(picked) == count:
+            break
+
+        if picked and min_separation_km > 0:
+            distances = haversine_many(lats[i], lons[i], lats[picked], lons[picked])
+            if distances.min() < min_separation_km:
+                continue
+
+        picked.append(i)
+
+    return picked
+
+
+def _beam(lats, lons, scores, width, min_separation_km) -> list:
+    """
+    Block positions to refine: spatially spread picks first (so every
+    promising area survives), then the best of the rest.
+    """
+    order = np.argsort(-scores, kind="stable").tolist()
+    chosen = _spread_pick(lats, lons, order, width, min_separation_km)
+
+    chosen_set = set(chosen)
+    for i in order:
+        if len(chosen) >= width:
+            break
+        if i not in chosen_set:
+            chosen.append(i)
+            chosen_set.add(i)
+
+    return chosen
+
+
+def _whole_partition(points) -> Partition:
+    """
+    One Partition over every point of a payload list.
+    """
+    lats, lons = pack_coordinates(points)
+
+    return Partition(np.arange(len(lats)), lats, lons)
+
+
+def _objective_weights(payload) -> dict:
+    """
+    DEFAULT_OBJECTIVE overridden by the payload's "objective".
+
+    Raises:
+    - ValueError on a non-object objective, unknown keys or
+      non-numeric / non-finite weights
+    """
+    objective = payload.get("objective", {})
+
+    if not isinstance(objective, dict):
+        raise ValueError('"objective" must be an object of weights')
+
+    unknown = sorted(set(objective) - set(DEFAULT_OBJECTIVE))
+    if unknown:
+        raise ValueError(f"unknown objective weights: {', '.join(unknown)}")
+
+    for name, weight in objective.items():
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not math.isfinite(weight):
+            raise ValueError(f"objective {name} must be a finite number")
+
+    return {**DEFAULT_OBJECTIVE, **objective}
+
+
+def _scorer_for(payload, industry) -> _Scorer:
+    objective = _objective_weights(payload)
+
+    if "region" in payload:
+        store = load_region(payload["region"])
+
+        return _Scorer(
+            store.competitor_partitions(industry),
+            store.anchor_partitions(),
+            lambda rows: store.anchor_weight_by_code[store.anchor_type[rows]],
+            objective,
+        )
+
+    anchors = payload.get("anchors", [])
+    point_weights = anchor_weights(anchors, np.arange(len(anchors)))
+
+    return _Scorer(
+        [_whole_partition(payload.get("competitors", []))],
+        [_whole_partition(anchors)],
+        lambda rows: point_weights[rows],
+        objective,
+    )
+
+
+def search_sites(payload: dict) -> dict:
+    """
+    Find the best candidate sites in an area.
+
+    Input payload structure:
+    {
+        "bbox": { "min_lat", "min_lon", "max_lat", "max_lon" }
+          or "polygon": [ { "lat", "lon" }, ... ],
+        "industry": "cafe",
+        "competitors": [...], "anchors": [...]   (or "region": "karachi"),
+        "top_n": 5,
+        "min_separation_m": 500,
+        "resolution_m": 50,
+        "beam_width": 48,                      (1 .. MAX_BEAM_WIDTH)
+        "objective": { "competition_weight": -1.0, "anchor_weight": 1.0 }
+    }
+
+    Returns:
+    - sites: best first; each has lat, lon, score and the full
+      Phase 3 output at that point
+    - search statistics (points evaluated vs fine cells in the area)
+    """
+    industry = payload.get("industry", "default")
+
+    try:
+        top_n = int(payload.get("top_n", DEFAULT_TOP_N))
+        min_separation_km = float(payload.get("min_separation_m", DEFAULT_MIN_SEPARATION_M)) / 1000
+        beam_width = int(payload.get("beam_width", DEFAULT_BEAM_WIDTH))
+    except TypeError:
+        raise ValueError("top_n, min_separation_m and beam_width must be numbers")
+
+    if top_n < 1 or beam_width < 1:
+        raise ValueError("top_n and beam_width must be positive")
+    if beam_width > MAX_BEAM_WIDTH:
+        raise ValueError(f"beam_width must be at most {MAX_BEAM_WIDTH}")
+
+    area = SearchArea(payload, float(payload.get("resolution_m", DEFAULT_RESOLUTION_M)))
+    scorer = _scorer_for(payload, industry)
+
+    # Coarsest level: at most MAX_COARSE_BLOCKS blocks
+    level = 0
+    while math.ceil(area.n_rows / (1 << level)) * math.ceil(area.n_cols / (1 << level)) > MAX_COARSE_BLOCKS:
+        level += 1
+
+    size = 1 << level
+    blocks = [
+        (block_row, block_col)
+        for block_row in range(math.ceil(area.n_rows / size))
+        for block_col in range(math.ceil(area.n_cols / size))
+    ]
+
+    # Every scored fine cell: (row, col) -> score
+    scored = {}
+
+    while True:
+        blocks, rows, cols = _block_representatives(area, level, blocks)
+
+        fresh = [i for i, cell in enumerate(zip(rows.tolist(), cols.tolist())) if cell not in scored]
+        if fresh:
+            fresh = np.array(fresh)
+            fresh_scores = scorer.objective(area.center_lat(rows[fresh]), area.center_lon(cols[fresh]))
+            for i, score in zip(fresh.tolist(), fresh_scores.tolist()):
+                scored[(int(rows[i]), int(cols[i]))] = score
+
+        if level == 0:
+            break
+
+        scores = np.array([scored[cell] for cell in zip(rows.tolist(), cols.tolist())])
+        keep = _beam(
+            area.center_lat(rows),
+            area.center_lon(cols),
+            scores,
+            beam_width,
+            min_separation_km,
+        )
+
+        level -= 1
+        blocks = [
+            (2 * blocks[i][0] + d_row, 2 * blocks[i][1] + d_col)
+            for i in keep
+            for d_row in (0, 1)
+            for d_col in (0, 1)
+        ]
+
+    # Final pick over everything scored at any level
+    cells = list(scored)
+    cell_rows = np.array([row for row, _ in cells], dtype=np.int64)
+    cell_cols = np.array([col for _, col in cells], dtype=np.int64)
+    cell_scores = np.array([scored[cell] for cell in cells])
+    lats, lons = area.center_lat(cell_rows), area.center_lon(cell_cols)
+
+    # Best first; ties go to the southern-most, then western-most cell
+    order = np.lexsort((cell_cols, cell_rows, -cell_scores)).tolist()
+    picked = _spread_pick(lats, lons, order, top_n, min_separation_km)
+
+    sites = []
+    for i in picked:
+        lat, lon = float(lats[i]), float(lons[i])
+        raw_competition, anchor_score = scorer.signals(lat, lon)
+
+        sites.append({
+            "lat": lat,
+            "lon": lon,
+            "score": round(float(cell_scores[i]), 3),
+            **build_phase3_result(
+                raw_competition,
+                anchor_score,
+                industry,
+                scorer.competitor_count,
+            ),
+        })
+
+    return {
+        "industry": industry,
+        "sites": sites,
+        "points_evaluated": scorer.evaluations,
+        "cells_in_area": int(area.inside.sum()),
+        "resolution_m": float(payload.get("resolution_m", DEFAULT_RESOLUTION_M)),
+    }
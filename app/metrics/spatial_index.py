@@ -0,0 +1,207 @@
+"""
+spatial_index.py
+
+Uniform lat/lon grid index for radius queries.
+
+Why this exists:
+- Phase 3 only cares about points within a small radius (1.5 – 2 km)
+- Computing exact distances to every point in a city is wasted work
+- Bucketing points into grid cells lets a query touch only nearby cells
+
+The index is built once per point set and can then answer any number of
+radius queries (different targets, different radii).
+
+Results are exact: cells only PRUNE candidates, final distances come from
+the shared geodesic kernel, in original point order.
+"""
+
+from math import ceil, floor, asin, sin, cos, radians, degrees
+
+import numpy as np
+
+from app.metrics.geodesic import (
+    DEFAULT_DISTANCE_MODE,
+    EARTH_RADIUS_KM,
+    KM_PER_DEGREE,
+    pack_coordinates,
+    distances_within,
+)
+from app.metrics.instrumentation import NO_TIMINGS
+
+# Default cell edge (km). Close to the Phase 3 radii, so a query
+# touches roughly a 3 x 3 block of cells.
+DEFAULT_CELL_KM = 2.0
+
+# Extra slack (degrees) when converting a radius into a cell range
+_CELL_MARGIN_DEG = 1e-9
+
+
+class GridIndex:
+    """
+    Uniform grid over packed lat/lon arrays.
+
+    Points are sorted by cell id; each occupied cell maps to a
+    contiguous slice of the sorted order.
+
+    With rows, the index covers lats[rows], lons[rows] but keeps only
+    the row ids: coordinates are gathered from lats / lons at query
+    time, so a memory-mapped column is shared instead of copied.
+    """
+
+    def __init__(self, lats, lons, cell_km=DEFAULT_CELL_KM, rows=None):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.rows = rows
+
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.n_rows = ceil(180 / self.cell_deg) + 1
+        self.n_cols = ceil(360 / self.cell_deg)
+
+        # Columns divide 360 degrees evenly so they wrap at the antimeridian
+        self.col_deg = 360 / self.n_cols
+
+        lats, lons = self.coordinates(slice(None))
+
+        rows = np.floor((lats + 90) / self.cell_deg).astype(np.int64)
+        cols = np.floor((lons + 180) / self.col_deg).astype(np.int64)
+        cell_ids = rows * self.n_cols + cols % self.n_cols
+
+        # Stable sort keeps original order inside each cell
+        self._order = np.argsort(cell_ids, kind="stable")
+
+        occupied, starts, counts = np.unique(
+            cell_ids[self._order],
+            return_index=True,
+            return_counts=True,
+        )
+
+        self._cells = {
+            cell_id: (start, start + count)
+            for cell_id, start, count in zip(
+                occupied.tolist(), starts.tolist(), counts.tolist()
+            )
+        }
+
+    @classmethod
+    def from_points(cls, points, cell_km=DEFAULT_CELL_KM):
+        """
+        Builds an index straight from a list of {"lat", "lon"} dicts.
+        """
+        lats, lons = pack_coordinates(points)
+        return cls(lats, lons, cell_km)
+
+    def __len__(self):
+        return len(self.lats) if self.rows is None else len(self.rows)
+
+    def coordinates(self, indices) -> tuple:
+        """
+        (lats, lons) of the indexed points at indices.
+        """
+        if self.rows is not None:
+            indices = self.rows[indices]
+
+        return self.lats[indices], self.lons[indices]
+
+    def buckets(self) -> list:
+        """
+        Point indices of every occupied cell, in original point order.
+
+        Cells come in cell id order, so the split is deterministic.
+        """
+        return [self._order[start:stop] for start, stop in self._cells.values()]
+
+    def _column_range(self, lat, lon, radius_km):
+        """
+        Column ids that may hold points within radius_km.
+
+        Returns None when every column must be scanned
+        (search circle reaches a pole).
+        """
+        angular = radius_km / EARTH_RADIUS_KM
+        cos_lat = cos(radians(lat))
+
+        if angular >= radians(90) or sin(angular) >= cos_lat:
+            return None
+
+        # Widest longitude offset of a circle of this radius
+        dlon = degrees(asin(sin(angular) / cos_lat)) + _CELL_MARGIN_DEG
+
+        first = floor((lon - dlon + 180) / self.col_deg)
+        last = floor((lon + dlon + 180) / self.col_deg)
+
+        if last - first + 1 >= self.n_cols:
+            return None
+
+        # Wrap across the antimeridian
+        return [col % self.n_cols for col in range(first, last + 1)]
+
+    def candidates(self, lat, lon, radius_km) -> np.ndarray:
+        """
+        Indices of points in cells overlapping the search circle.
+
+        This is a superset of the true result, in original point order.
+        """
+        dlat = radius_km / KM_PER_DEGREE + _CELL_MARGIN_DEG
+
+        first_row = max(floor((lat - dlat + 90) / self.cell_deg), 0)
+        last_row = min(floor((lat + dlat + 90) / self.cell_deg), self.n_rows - 1)
+
+        columns = self._column_range(lat, lon, radius_km)
+
+        if columns is None:
+            return np.arange(len(self))
+
+        slices = []
+
+        for row in range(first_row, last_row + 1):
+            base = row * self.n_cols
+
+            for col in columns:
+                bounds = self._cells.get(base + col)
+
+                if bounds is not None:
+                    slices.append(self._order[bounds[0]:bounds[1]])
+
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+
+        return np.sort(np.concatenate(slices))
+
+    def query(
+        self,
+        lat,
+        lon,
+        radius_km,
+        timings=NO_TIMINGS,
+        label="points",
+        mode=DEFAULT_DISTANCE_MODE,
+    ):
+        """
+        Exact radius query.
+
+        Parameters:
+        - timings: optional StageTimings; receives "index_queries" and
+          "<label>_scanned" (candidates whose distance was computed)
+        - mode: distance strategy passed to distances_within()
+
+        Returns:
+        - (indices, distances) arrays in original point order,
+          identical to distances_within() over the full arrays
+        """
+        candidates = self.candidates(lat, lon, radius_km)
+
+        timings.count("index_queries")
+        timings.count(label + "_scanned", len(candidates))
+
+        candidate_lats, candidate_lons = self.coordinates(candidates)
+
+        hits, distances = distances_within(
+            lat,
+            lon,
+            candidate_lats,
+            candidate_lons,
+            radius_km,
+            mode,
+        )
+
+        return candidates[hits], distances
@@ -0,0 +1,648 @@
+"""
+tile_pyramid.py
+
+Precomputed Phase 3 fields for interactive map panning.
+
+Why this exists:
+- Map panning needs answers in well under a millisecond
+- phase3_analyze recomputes from raw points on every call
+- For a fixed region store the two raw signals are fixed fields over
+  space, so they can be computed once and looked up
+
+An offline build evaluates, over a region's POI store:
+- the anchor-influence field (industry independent, built once)
+- one competition field per industry in INDUSTRY_DENSITY_TOLERANCE
+on a pyramid of grid resolutions (e.g. 800 / 400 / 200 / 100 m cells),
+cut into square tiles and written as .npy files:
+
+    <root>/<region>/
+        manifest.json                               geometry, tile fingerprints, error report
+        anchors/<cell_m>/<tr>_<tc>-<fp>.npy         float32, (TILE_CELLS + 1)^2
+        competition-<industry>/<cell_m>/<tr>_<tc>-<fp>.npy
+
+(<fp> is the start of the tile's fingerprint.)
+
+Tiles share one edge row / column with their neighbours, so bilinear
+interpolation never needs more than one tile.
+
+Lookups interpolate both fields at the target and derive steps 3 – 6
+with build_phase3_result. The build measures the approximation error
+against exact phase3_analyze and stores it in the manifest.
+
+Invalidation:
+- Every tile carries a fingerprint of the points that can influence it
+- A rebuild recomputes only tiles whose fingerprint changed
+- Lookups against a store that changed since the build fall back to
+  exact phase3_analyze until the pyramid is rebuilt
+
+Rebuilds never rewrite a tile in place (servers memory-map tiles):
+a changed tile gets a new file name, written aside and renamed, the
+manifest is swapped in atomically, and only then are tiles the new
+manifest no longer references deleted. load_pyramid re-opens a
+pyramid whose manifest changed.
+
+Build:
+    python -m app.metrics.tile_pyramid karachi
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from app.metrics.anchors import ANCHOR_RADIUS_KM
+from app.metrics.competition import COMPETITION_RADIUS_KM
+from app.metrics.geodesic import KM_PER_DEGREE
+from app.metrics.industry_weights import INDUSTRY_DENSITY_TOLERANCE
+from app.metrics.phase3_engine import build_phase3_result, phase3_analyze
+from app.metrics.poi_store import load_region, partition_rows, region_path
+from app.metrics.raster import RasterGrid, accumulate_field
+
+# Directory holding one pyramid per region
+TILE_ROOT = os.environ.get("LOCATORIS_TILE_DIR", "data/tiles")
+
+# 2: tile file names carry the tile fingerprint
+PYRAMID_FORMAT_VERSION = 2
+
+# Cells per tile edge (each tile stores one extra shared edge)
+TILE_CELLS = 128
+
+# Pyramid levels, coarse to fine (cell edge in meters)
+DEFAULT_LEVELS_M = (800, 400, 200, 100)
+
+# Random targets used to measure the approximation error
+DEFAULT_ERROR_SAMPLES = 200
+
+# Tiles kept open per pyramid
+_TILE_CACHE_SIZE = 256
+
+# Open pyramids, by directory
+_OPEN_PYRAMIDS = {}
+
+# Characters of the tile fingerprint kept in its file name
+_TILE_NAME_FINGERPRINT = 16
+
+
+# -------------------------------
+# Geometry
+# -------------------------------
+
+class LevelGeometry:
+    """
+    Global cell lattice of one pyramid level.
+
+    Cell (i, j) is centered at ((i + 0.5) * lat_step, (j + 0.5) * lon_step).
+    The lattice depends only on the cell size and a whole-degree
+    reference latitude, so tiles keep their identity when a store's
+    bounding box grows.
+    """
+
+    def __init__(self, cell_m, ref_lat, tile_cells=TILE_CELLS):
+        self.cell_m = cell_m
+        self.tile_cells = tile_cells
+        self.lat_step = cell_m / 1000 / KM_PER_DEGREE
+        self.lon_step = cell_m / 1000 / (KM_PER_DEGREE * math.cos(math.radians(ref_lat)))
+
+    def base_cell(self, lat, lon) -> tuple:
+        """
+        (i, j, row fraction, col fraction) of the cell whose center is
+        the south-west corner of the interpolation square around a point.
+        """
+        row = lat / self.lat_step - 0.5
+        col = lon / self.lon_step - 0.5
+        i, j = math.floor(row), math.floor(col)
+
+        return i, j, row - i, col - j
+
+    def tile_of(self, i, j) -> tuple:
+        return i // self.tile_cells, j // self.tile_cells
+
+    def tile_range(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Every tile needed to interpolate anywhere inside a box.
+        """
+        first_i, first_j, _, _ = self.base_cell(min_lat, min_lon)
+        last_i, last_j, _, _ = self.base_cell(max_lat, max_lon)
+        first_tr, first_tc = self.tile_of(first_i, first_j)
+        last_tr, last_tc = self.tile_of(last_i, last_j)
+
+        return [
+            (tr, tc)
+            for tr in range(first_tr, last_tr + 1)
+            for tc in range(first_tc, last_tc + 1)
+        ]
+
+    def tile_grid(self, tr, tc) -> RasterGrid:
+        """
+        RasterGrid of one tile, including the shared far edge.
+        """
+        size = self.tile_cells
+
+        return RasterGrid.from_steps(
+            tr * size * self.lat_step,
+            tc * size * self.lon_step,
+            self.lat_step,
+            self.lon_step,
+            size + 1,
+            size + 1,
+        )
+
+
+def _influencing(grid, lats, lons, radius_km) -> np.ndarray:
+    """
+    Mask of points close enough to a tile to change any of its cells.
+    """
+    lat_margin = radius_km / KM_PER_DEGREE
+    edge_lat = min(max(abs(grid.min_lat), abs(grid.max_lat)) + lat_margin, 89.9)
+    lon_margin = radius_km / (KM_PER_DEGREE * math.cos(math.radians(edge_lat)))
+
+    return (
+        (lats >= grid.min_lat - lat_margin) & (lats <= grid.max_lat + lat_margin)
+        & (lons >= grid.min_lon - lon_margin) & (lons <= grid.max_lon + lon_margin)
+    )
+
+
+def _tile_fingerprint(layer, grid, lats, lons, weights) -> str:
+    """
+    Content hash of everything a tile's values depend on.
+
+    Points are hashed in sorted order, so reordering a store does not
+    invalidate tiles.
+    """
+    order = np.lexsort((weights, lons, lats))
+
+    digest = hashlib.sha1()
+    digest.update(layer.encode())
+    digest.update(np.array(
+        [grid.min_lat, grid.min_lon, grid.lat_step, grid.lon_step, grid.n_rows],
+        dtype=np.float64,
+    ).tobytes())
+    digest.update(lats[order].tobytes())
+    digest.update(lons[order].tobytes())
+    digest.update(weights[order].tobytes())
+
+    return digest.hexdigest()
+
+
+def _competition_layer(industry) -> str:
+    return f"competition-{industry}"
+
+
+def _tile_path(root, layer, cell_m, name, fingerprint, version=PYRAMID_FORMAT_VERSION) -> str:
+    """
+    File of one tile; name is "<tr>_<tc>". Format 1 tiles (rewritten
+    in place) had no fingerprint in their name.
+    """
+    if version < 2:
+        return os.path.join(root, layer, str(cell_m), f"{name}.npy")
+
+    return os.path.join(root, layer, str(cell_m), f"{name}-{fingerprint[:_TILE_NAME_FINGERPRINT]}.npy")
+
+
+def _manifest_stamp(path) -> tuple:
+    """
+    (inode, mtime) of a pyramid's manifest; changes whenever the
+    manifest is replaced. Raises FileNotFoundError for a missing one.
+    """
+    stat = os.stat(os.path.join(path, "manifest.json"))
+
+    return stat.st_ino, stat.st_mtime_ns
+
+
+# -------------------------------
+# Lookup
+# -------------------------------
+
+class StalePyramid(Exception):
+    """
+    Raised when a region's store changed since its pyramid was built.
+
+    exact_payload is the phase3_analyze payload that answers the lookup
+    exactly instead (run it on the analysis pool, not inline).
+    """
+
+    def __init__(self, exact_payload):
+        super().__init__(f"tile pyramid of {exact_payload['region']!r} is stale")
+        self.exact_payload = exact_payload
+
+
+class TilePyramid:
+    """
+    Read side of a built pyramid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.stamp = _manifest_stamp(path)
+
+        with open(self.manifest_path, "r", encoding="utf-8") as handle:
+            self.manifest = json.load(handle)
+
+        if self.manifest.get("version") != PYRAMID_FORMAT_VERSION:
+            raise FileNotFoundError(f"tile pyramid {path} has an old format; rebuild it")
+
+        self.levels_m = self.manifest["levels_m"]
+        self.geometry = {
+            cell_m: LevelGeometry(cell_m, self.manifest["ref_lat"], self.manifest["tile_cells"])
+            for cell_m in self.levels_m
+        }
+        self._tiles = OrderedDict()
+
+    @property
+    def store_fingerprint(self) -> str:
+        return self.manifest["store_fingerprint"]
+
+    def _tile(self, layer, cell_m, tr, tc) -> np.ndarray:
+        key = (layer, cell_m, tr, tc)
+        tile = self._tiles.get(key)
+
+        if tile is None:
+            fingerprint = self.manifest["tiles"][layer][str(cell_m)].get(f"{tr}_{tc}")
+
+            if fingerprint is None:
+                raise ValueError("target is outside the tiled area")
+
+            tile = np.load(_tile_path(self.path, layer, cell_m, f"{tr}_{tc}", fingerprint), mmap_mode="r")
+            self._tiles[key] = tile
+
+            if len(self._tiles) > _TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+
+        return tile
+
+    def field_value(self, layer, cell_m, lat, lon) -> float:
+        """
+        Bilinear interpolation of one field at a point.
+        """
+        geometry = self.geometry[cell_m]
+        i, j, fi, fj = geometry.base_cell(lat, lon)
+        tr, tc = geometry.tile_of(i, j)
+
+        tile = self._tile(layer, cell_m, tr, tc)
+        r, c = i - tr * geometry.tile_cells, j - tc * geometry.tile_cells
+
+        south = tile[r, c] * (1 - fj) + tile[r, c + 1] * fj
+        north = tile[r + 1, c] * (1 - fj) + tile[r + 1, c + 1] * fj
+
+        return float(south * (1 - fi) + north * fi)
+
+    def level(self, cell_m=None) -> int:
+        """
+        The built level matching a requested cell size (default finest).
+
+        Raises:
+        - ValueError for a non-numeric size or one that was not built
+          (100.0 selects level 100)
+        """
+        if cell_m is None:
+            return self.levels_m[-1]
+
+        if isinstance(cell_m, bool) or not isinstance(cell_m, (int, float)) or cell_m not in self.geometry:
+            raise ValueError(f"no pyramid level with cell_size_m={cell_m!r}; built: {self.levels_m}")
+
+        return int(cell_m)
+
+    def signals(self, lat, lon, industry, cell_m=None) -> tuple:
+        """
+        Interpolated (raw_competition, anchor_score), rounded as in
+        phase3_analyze. Defaults to the finest level.
+        """
+        cell_m = self.level(cell_m)
+
+        layer = _competition_layer(industry)
+        if layer not in self.manifest["tiles"]:
+            raise ValueError(f"industry {industry!r} was not tiled")
+
+        return (
+            round(self.field_value(layer, cell_m, lat, lon), 3),
+            round(self.field_value("anchors", cell_m, lat, lon), 3),
+        )
+
+    def analyze(self, target, industry, cell_m=None) -> dict:
+        """
+        Approximate phase3_analyze output from the tiles.
+        """
+        raw_competition, anchor_score = self.signals(target["lat"], target["lon"], industry, cell_m)
+
+        return build_phase3_result(
+            raw_competition,
+            anchor_score,
+            industry,
+            self.manifest["competitor_counts"][industry],
+        )
+
+
+def load_pyramid(region, root=None) -> TilePyramid:
+    """
+    Open (or reuse) a region's pyramid; re-opened after a rebuild.
+
+    Raises FileNotFoundError if none has been built.
+    """
+    path = region_path(region, root or TILE_ROOT)
+    pyramid = _OPEN_PYRAMIDS.get(path)
+
+    if pyramid is None or _manifest_stamp(path) != pyramid.stamp:
+        pyramid = TilePyramid(path)
+        _OPEN_PYRAMIDS[path] = pyramid
+
+    return pyramid
+
+
+def phase3_tile_lookup(payload: dict) -> dict:
+    """
+    Phase 3 signals for a target, interpolated from a region's pyramid.
+
+    Input payload structure:
+    {
+        "target": { "lat": float, "lon": float },
+        "industry": "cafe",
+        "region": "karachi",
+        "cell_size_m": 100        (optional; default finest level)
+    }
+
+    Returns:
+    - result: same shape as phase3_analyze
+    - approximate: True, stale: False (see StalePyramid)
+    - cell_size_m: the level used
+    - error: the build's measured error at the level used
+
+    Raises:
+    - StalePyramid when the store changed since the build; its
+      exact_payload answers the lookup with phase3_analyze
+    - ValueError for a cell size that was not built
+    """
+    industry = payload.get("industry", "default")
+
+    # A rebuild finishing mid-lookup deletes tiles of the old manifest;
+    # the second attempt reads the new one
+    for attempt in range(2):
+        pyramid = load_pyramid(payload["region"])
+        store = load_region(payload["region"])
+
+        if pyramid.store_fingerprint != store.fingerprint:
+            raise StalePyramid({
+                "target": payload["target"],
+                "industry": industry,
+                "region": payload["region"],
+            })
+
+        cell_m = pyramid.level(payload.get("cell_size_m"))
+
+        try:
+            result = pyramid.analyze(payload["target"], industry, cell_m)
+            break
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+    return {
+        "approximate": True,
+        "stale": False,
+        "cell_size_m": cell_m,
+        "result": result,
+        "error": pyramid.manifest["error_report"].get(industry, {}).get(str(cell_m)),
+    }
+
+
+# -------------------------------
+# Build
+# -------------------------------
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def _error_report(pyramid, store, region, industries, samples, seed) -> dict:
+    """
+    Approximation error of every (industry, level) against exact
+    phase3_analyze, at random targets inside the store's bounding box.
+    """
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(float(store.lat.min()), float(store.lat.max()), samples)
+    lons = rng.uniform(float(store.lon.min()), float(store.lon.max()), samples)
+
+    report = {}
+
+    for industry in industries:
+        exact = [
+            phase3_analyze({
+                "target": {"lat": lat, "lon": lon},
+                "industry": industry,
+                "region": region,
+            })
+            for lat, lon in zip(lats.tolist(), lons.tolist())
+        ]
+        report[industry] = {}
+
+        for cell_m in pyramid.levels_m:
+            approx = [
+                pyramid.analyze({"lat": lat, "lon": lon}, industry, cell_m)
+                for lat, lon in zip(lats.tolist(), lons.tolist())
+            ]
+
+            raw_error = np.abs(np.array(
+                [a["raw_competition_score"] - e["raw_competition_score"] for a, e in zip(approx, exact)]
+            ))
+            exact_raw = np.array([e["raw_competition_score"] for e in exact])
+            relative_error = raw_error[exact_raw > 0] / exact_raw[exact_raw > 0]
+            normalized_error = np.abs(np.array(
+                [a["normalized_competition_score"] - e["normalized_competition_score"] for a, e in zip(approx, exact)]
+            ))
+
+            report[industry][str(cell_m)] = {
+                "samples": samples,
+                "raw_score_max_abs_error": round(float(raw_error.max()), 4),
+                "raw_score_p95_abs_error": round(float(np.percentile(raw_error, 95)), 4),
+                "raw_score_mean_abs_error": round(float(raw_error.mean()), 4),
+                "raw_score_p95_rel_error": (
+                    round(float(np.percentile(relative_error, 95)), 4) if len(relative_error) else 0.0
+                ),
+                "normalized_score_max_abs_error": round(float(normalized_error.max()), 4),
+                "density_label_agreement": round(
+                    sum(a["density_label"] == e["density_label"] for a, e in zip(approx, exact)) / samples,
+                    4,
+                ),
+            }
+
+    return report
+
+
+def build_tile_pyramid(
+    region,
+    store_root=None,
+    tile_root=None,
+    levels_m=DEFAULT_LEVELS_M,
+    industries=None,
+    error_samples=DEFAULT_ERROR_SAMPLES,
+    seed=0,
+) -> dict:
+    """
+    Build or refresh a region's pyramid.
+
+    Only tiles whose fingerprint changed are recomputed, each into a
+    new file; tiles that are no longer needed are deleted once the new
+    manifest is in place.
+
+    Returns:
+    - stats dict: built / reused / removed tile counts and the error report
+    """
+    store = load_region(region, store_root)
+    path = region_path(region, tile_root or TILE_ROOT)
+    previous = _read_manifest(path) or {"tiles": {}}
+    previous_version = previous.get("version", PYRAMID_FORMAT_VERSION)
+
+    industries = list(industries or INDUSTRY_DENSITY_TOLERANCE)
+    levels_m = sorted((int(cell_m) for cell_m in levels_m), reverse=True)
+
+    if len(store) == 0:
+        raise ValueError(f"region {region!r} has no POIs")
+
+    min_lat, max_lat = float(store.lat.min()), float(store.lat.max())
+    min_lon, max_lon = float(store.lon.min()), float(store.lon.max())
+    ref_lat = round((min_lat + max_lat) / 2)
+
+    anchor_rows = partition_rows(store.anchor_partitions())
+    anchor_weights = store.anchor_weight_by_code[store.anchor_type[anchor_rows]]
+    layers = [("anchors", store.lat[anchor_rows], store.lon[anchor_rows], anchor_weights, ANCHOR_RADIUS_KM)]
+    competitor_counts = {}
+
+    for industry in industries:
+        rows = partition_rows(store.competitor_partitions(industry))
+        competitor_counts[industry] = len(rows)
+        layers.append((
+            _competition_layer(industry),
+            store.lat[rows],
+            store.lon[rows],
+            np.ones(len(rows)),
+            COMPETITION_RADIUS_KM,
+        ))
+
+    tiles = {}
+    built = reused = 0
+
+    for layer, lats, lons, weights, radius_km in layers:
+        tiles[layer] = {}
+        lats, lons, weights = np.asarray(lats), np.asarray(lons), np.asarray(weights)
+
+        for cell_m in levels_m:
+            geometry = LevelGeometry(cell_m, ref_lat)
+            level_tiles = tiles[layer][str(cell_m)] = {}
+
+            for tr, tc in geometry.tile_range(min_lat, min_lon, max_lat, max_lon):
+                grid = geometry.tile_grid(tr, tc)
+                near = _influencing(grid, lats, lons, radius_km)
+                fingerprint = _tile_fingerprint(layer, grid, lats[near], lons[near], weights[near])
+
+                name = f"{tr}_{tc}"
+                level_tiles[name] = fingerprint
+                tile_path = _tile_path(path, layer, cell_m, name, fingerprint)
+
+                # Same fingerprint, same file name: the tile is unchanged
+                if os.path.exists(tile_path):
+                    reused += 1
+                    continue
+
+                field = accumulate_field(grid, lats[near], lons[near], weights[near], radius_km)
+
+                os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+                temporary = f"{tile_path}.tmp-{os.getpid()}"
+
+                with open(temporary, "wb") as handle:
+                    np.save(handle, field.astype(np.float32))
+
+                os.replace(temporary, tile_path)
+                built += 1
+
+    manifest = {
+        "version": PYRAMID_FORMAT_VERSION,
+        "region": region,
+        "store_fingerprint": store.fingerprint,
+        "ref_lat": ref_lat,
+        "tile_cells": TILE_CELLS,
+        "levels_m": levels_m,
+        "competitor_counts": competitor_counts,
+        "tiles": tiles,
+        "error_report": {},
+    }
+
+    os.makedirs(path, exist_ok=True)
+    _write_manifest(path, manifest)
+
+    # Only now drop tiles the new manifest no longer references; a
+    # process still mapping one keeps reading the unlinked file
+    removed = 0
+    for layer, levels in previous["tiles"].items():
+        for cell_m, old_tiles in levels.items():
+            current = tiles.get(layer, {}).get(cell_m, {})
+
+            for name, fingerprint in old_tiles.items():
+                if previous_version == PYRAMID_FORMAT_VERSION and current.get(name) == fingerprint:
+                    continue
+
+                stale_path = _tile_path(path, layer, cell_m, name, fingerprint, previous_version)
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+                removed += 1
+
+    if error_samples:
+        manifest["error_report"] = _error_report(
+            TilePyramid(path), store, region, industries, error_samples, seed
+        )
+        _write_manifest(path, manifest)
+
+    return {
+        "built": built,
+        "reused": reused,
+        "removed": removed,
+        "error_report": manifest["error_report"],
+    }
+
+
+def _write_manifest(path, manifest):
+    # Written aside and renamed, so readers never see half a manifest
+    temporary = os.path.join(path, "manifest.json.tmp")
+
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+
+    os.replace(temporary, os.path.join(path, "manifest.json"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build or refresh the Phase 3 tile pyramid of a region."
+    )
+    parser.add_argument("region", help="region name of a built POI store")
+    parser.add_argument("--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS_M),
+                        help="cell sizes in meters")
+    parser.add_argument("--samples", type=int, default=DEFAULT_ERROR_SAMPLES,
+                        help="random targets for the error report (0 = skip)")
+    args = parser.parse_args(argv)
+
+    stats = build_tile_pyramid(args.region, levels_m=args.levels, error_samples=args.samples)
+    print(f"tiles built {stats['built']}, reused {stats['reused']}, removed {stats['removed']}")
+
+    for industry, levels in stats["error_report"].items():
+        for cell_m, error in levels.items():
+            print(
+                f"{industry:<12}{cell_m:>6} m"
+                f"  max {error['raw_score_max_abs_error']:<10}"
+                f"p95 {error['raw_score_p95_abs_error']:<10}"
+                f"p95 rel {error['raw_score_p95_rel_error']:<8.2%}"
+                f"labels {error['density_label_agreement']:.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+tracked_site.py
+
+Incremental Phase 3 scores for saved sites ("tracked sites").
+
+Why this exists:
+- Monitoring re-scores a saved site whenever a competitor opens or
+  closes nearby
+- Re-running phase3_analyze means re-scanning every competitor and
+  anchor for a one-point change
+- Both raw signals are plain sums of per-point terms:
+    competition = sum(1 / (d + 0.1))       over competitors within 2 km
+    anchors     = sum(w / (d + 0.1))       over anchors within 1.5 km
+  so a change only needs that point's term added or subtracted
+
+A TrackedSite keeps one term per point id and the UNROUNDED running
+sums. Each event costs one haversine and O(1) bookkeeping; steps 3 – 6
+are then re-derived with build_phase3_result, exactly as
+phase3_analyze derives them.
+
+Precision:
+- Running sums are compensated (Neumaier), so long add / remove
+  histories do not drift
+- The result equals phase3_analyze over the current points except when
+  a sum sits within float rounding of a 3rd-decimal boundary;
+  resync() re-sums the stored terms in point order to remove even that
+
+Sites live in process memory (TrackedSiteRegistry); with several API
+worker processes, route a site's events to one worker.
+"""
+
+import os
+import threading
+import uuid
+
+from app.metrics.anchors import ANCHOR_RADIUS_KM, ANCHOR_WEIGHTS
+from app.metrics.competition import COMPETITION_RADIUS_KM
+from app.metrics.geodesic import haversine, sequential_sum
+from app.metrics.phase3_engine import build_phase3_result
+
+# Point kinds an event can target
+POINT_KINDS = ("competitor", "anchor")
+
+# Payload list field of each point kind
+_POINT_FIELDS = (("competitor", "competitors"), ("anchor", "anchors"))
+
+
+def _coordinates(point) -> tuple:
+    """
+    (lat, lon) of a target or tracked point.
+
+    Raises:
+    - ValueError unless point is an object with numeric "lat" and "lon"
+    """
+    if not isinstance(point, dict):
+        raise ValueError("tracked points must be objects")
+
+    lat, lon = point.get("lat"), point.get("lon")
+
+    for value in (lat, lon):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError('tracked points need numeric "lat" and "lon"')
+
+    return float(lat), float(lon)
+
+
+def validate_site_payload(payload) -> int:
+    """
+    Structural checks of a tracked-site payload, cheap enough to run
+    before dispatching build_tracked_site().
+
+    Returns:
+    - number of points (competitors + anchors)
+
+    Raises:
+    - ValueError for a missing or malformed target, non-list point
+      fields or a non-string site_id
+    """
+    if "target" not in payload:
+        raise ValueError('tracked sites need a "target"')
+
+    _coordinates(payload["target"])
+
+    site_id = payload.get("site_id")
+    if site_id is not None and not isinstance(site_id, str):
+        raise ValueError("site_id must be a string")
+
+    points = 0
+
+    for _, field in _POINT_FIELDS:
+        if not isinstance(payload.get(field, []), list):
+            raise ValueError(f'"{field}" must be a list of points')
+        points += len(payload.get(field, []))
+
+    return points
+
+
+class CompensatedSum:
+    """
+    Running float sum with Neumaier compensation.
+
+    Subtracting a value that was added earlier returns the sum to
+    (almost exactly) where it was, whatever happened in between.
+    """
+
+    __slots__ = ("total", "compensation")
+
+    def __init__(self):
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def add(self, value):
+        total = self.total + value
+
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+
+        self.total = total
+
+    @property
+    def value(self) -> float:
+        return self.total + self.compensation
+
+
+class TrackedSite:
+    """
+    One saved site with incrementally maintained Phase 3 signals.
+
+    Points are keyed by caller-supplied ids. A point outside the radius
+    is still tracked (it counts towards competitor_count) with no term.
+    """
+
+    def __init__(self, target, industry="default"):
+        lat, lon = _coordinates(target)
+        self.target = {"lat": lat, "lon": lon}
+        self.industry = industry
+
+        # id -> term (None when outside the radius), in insertion order
+        self.competitor_terms = {}
+        self.anchor_terms = {}
+
+        self.competition = CompensatedSum()
+        self.anchor_influence = CompensatedSum()
+
+    def _term(self, kind, point):
+        lat, lon = _coordinates(point)
+        distance = haversine(self.target["lat"], self.target["lon"], lat, lon)
+
+        if kind == "competitor":
+            if distance > COMPETITION_RADIUS_KM:
+                return None
+            return 1 / (distance + 0.1)
+
+        if distance > ANCHOR_RADIUS_KM:
+            return None
+
+        # Untyped anchors weigh "default", as in phase3_analyze
+        anchor_type = point.get("type")
+        if anchor_type is not None and not isinstance(anchor_type, str):
+            raise ValueError("anchor type must be a string")
+
+        weight = ANCHOR_WEIGHTS.get(anchor_type, ANCHOR_WEIGHTS["default"])
+        return weight / (distance + 0.1)
+
+    def _tables(self, kind):
+        if kind == "competitor":
+            return self.competitor_terms, self.competition
+        if kind == "anchor":
+            return self.anchor_terms, self.anchor_influence
+
+        raise ValueError(f"unknown point kind {kind!r}; expected one of {POINT_KINDS}")
+
+    def add(self, kind, point_id, point):
+        """
+        Add a point, or move it if the id is already tracked.
+        """
+        terms, running = self._tables(kind)
+
+        try:
+            hash(point_id)
+        except TypeError:
+            raise ValueError(f"point id must be a string or number, not {type(point_id).__name__}")
+
+        # Computed first so a bad point leaves the site untouched
+        term = self._term(kind, point)
+
+        if point_id in terms:
+            self.remove(kind, point_id)
+
+        terms[point_id] = term
+
+        if term is not None:
+            running.add(term)
+
+    def remove(self, kind, point_id) -> bool:
+        """
+        Remove a point. Returns False when the id was not tracked.
+        """
+        terms, running = self._tables(kind)
+
+        if point_id not in terms:
+            return False
+
+        term = terms.pop(point_id)
+
+        if term is not None:
+            running.add(-term)
+
+        return True
+
+    def apply(self, event) -> bool:
+        """
+        Apply one change event.
+
+        Event structure:
+        { "op": "add" | "remove", "kind": "competitor" | "anchor",
+          "id": ..., "lat": float, "lon": float, "type": "hospital" }
+        (lat / lon / type only for "add"; type only for anchors)
+
+        Returns:
+        - False for a "remove" of an unknown id (ignored), else True
+        """
+        op = event.get("op")
+        kind = event.get("kind", "competitor")
+
+        if "id" not in event:
+            raise ValueError("every event needs an id")
+
+        if op == "add":
+            self.add(kind, event["id"], event)
+            return True
+        if op == "remove":
+            return self.remove(kind, event["id"])
+
+        raise ValueError(f"unknown event op {op!r}; expected 'add' or 'remove'")
+
+    def resync(self):
+        """
+        Rebuild both running sums from the stored terms, in point order.
+
+        Afterwards the signals equal a fresh phase3_analyze over the
+        tracked points (listed in insertion order) bit for bit.
+        """
+        for terms, running in (
+            (self.competitor_terms, self.competition),
+            (self.anchor_terms, self.anchor_influence),
+        ):
+            running.total = sequential_sum([term for term in terms.values() if term is not None])
+            running.compensation = 0.0
+
+    def result(self) -> dict:
+        """
+        Current Phase 3 output (same shape as phase3_analyze).
+        """
+        return build_phase3_result(
+            round(self.competition.value, 3),
+            round(self.anchor_influence.value, 3),
+            self.industry,
+            len(self.competitor_terms),
+        )
+
+
+def build_tracked_site(payload) -> tuple:
+    """
+    Build a site from a phase3_analyze-style payload whose points carry
+    ids. Module-level and side-effect free, so it can run on the
+    analysis pool; register the result with TrackedSiteRegistry.
+
+    Returns:
+    - (site_id, TrackedSite)
+
+    Raises:
+    - ValueError for a malformed payload (see validate_site_payload),
+      a malformed point or an id used twice within competitors (or
+      within anchors)
+    """
+    validate_site_payload(payload)
+
+    site_id = payload.get("site_id") or uuid.uuid4().hex
+    site = TrackedSite(payload["target"], payload.get("industry", "default"))
+
+    for kind, field in _POINT_FIELDS:
+        points = payload.get(field, [])
+
+        for point in points:
+            if not isinstance(point, dict) or "id" not in point:
+                raise ValueError(f"every tracked {kind} needs an id")
+            site.add(kind, point["id"], point)
+
+        # add() moves a point whose id is already tracked, so a repeated
+        # id would silently drop the earlier point
+        terms, _ = site._tables(kind)
+        if len(terms) < len(points):
+            raise ValueError(f"tracked {kind} ids must be unique")
+
+    site.resync()
+
+    return site_id, site
+
+
+class TrackedSiteRegistry:
+    """
+    In-process store of tracked sites, bounded in size.
+    """
+
+    def __init__(self, max_sites=10_000):
+        self.max_sites = max_sites
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def create(self, payload) -> tuple:
+        """
+        Create (or replace) a site from a phase3_analyze-style payload
+        whose points carry ids.
+
+        Returns:
+        - (site_id, TrackedSite)
+        """
+        site_id, site = build_tracked_site(payload)
+        self.register(site_id, site)
+
+        return site_id, site
+
+    def register(self, site_id, site):
+        """
+        Store (or replace) a built site.
+
+        Raises:
+        - ValueError when the registry is full
+        """
+        with self._lock:
+            if site_id not in self._sites and len(self._sites) >= self.max_sites:
+                raise ValueError(f"tracked site limit reached ({self.max_sites})")
+            self._sites[site_id] = site
+
+    def get(self, site_id) -> TrackedSite:
+        """
+        Raises KeyError for unknown sites.
+        """
+        with self._lock:
+            return self._sites[site_id]
+
+    def delete(self, site_id) -> bool:
+        with self._lock:
+            return self._sites.pop(site_id, None) is not None
+
+    def __len__(self):
+        return len(self._sites)
+
+
+def registry_from_env() -> TrackedSiteRegistry:
+    """
+    Build the tracked-site registry (LOCATORIS_MAX_TRACKED_SITES, default 10000).
+    """
+    return TrackedSiteRegistry(int(os.environ.get("LOCATORIS_MAX_TRACKED_SITES", "10000")))
@@ -0,0 +1,264 @@
+"""
+payload_codec.py
+
+Request decoding and response encoding for the Phase 3 endpoints.
+
+Why this exists:
+- A `payload: dict` endpoint makes FastAPI decode the whole body with
+  the stdlib json module into one dict per point before any math runs
+- For multi-MB competitor lists that decoding costs more than scoring
+
+Endpoints that read the raw body decode it here instead, picking the
+format from Content-Type:
+
+- application/json (default)
+    decoded with orjson when installed, else stdlib json. Points may be
+    lists of objects or columns: "competitors": {"lat": [...], "lon": [...]}
+    (anchors add "type": [...]); columns decode several times faster.
+
+- application/x-locatoris-points (binary, see encode_points_binary)
+    magic b"LCP1", uint32 little-endian header length, a JSON header
+    (every non-point field, plus "blocks"), then one raw block per
+    point field: lat array, lon array, and for anchors int8 type codes
+    into the header's "anchor_types". Coordinates are little-endian
+    float64 or float32 (float32 is ~1 m precise; values are widened to
+    float64, so scores can differ slightly from float64 input).
+
+- application/msgpack (requires the optional 'msgpack' package)
+    the JSON payload structure, MessagePack-encoded.
+
+Every format produces the same ingested payload (PointSets, see
+ingest_phase3_payload), so results do not depend on the wire format.
+
+Responses are encoded with orjson when installed (numpy-aware).
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from app.metrics.anchors import ANCHOR_TYPE_CODES, ANCHOR_TYPES
+from app.metrics.phase3_engine import ingest_phase3_payload
+from app.metrics.points import PointSet
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+POINTS_MEDIA_TYPE = "application/x-locatoris-points"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+BINARY_MAGIC = b"LCP1"
+
+# Payload fields that may hold point blocks, in wire order
+POINT_FIELDS = ("targets", "competitors", "anchors")
+
+_COORDINATE_DTYPES = {
+    "float64": np.dtype("<f8"),
+    "float32": np.dtype("<f4"),
+}
+
+
+class UnsupportedPayload(Exception):
+    """
+    Raised for a Content-Type this module cannot decode (HTTP 415).
+    """
+
+
+# -------------------------------
+# JSON
+# -------------------------------
+
+def decode_json(body: bytes):
+    """
+    Decodes JSON bytes (orjson when installed).
+
+    Raises:
+    - ValueError on malformed JSON
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+
+    return json.loads(body)
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_json(value) -> bytes:
+    """
+    Encodes a response body as JSON bytes (orjson when installed).
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+
+# -------------------------------
+# Binary point blocks
+# -------------------------------
+
+def encode_points_binary(payload: dict, dtype="float64") -> bytes:
+    """
+    Encodes a Phase 3 payload in the binary points format.
+
+    Client-side helper (and the reference for the layout described in
+    the module docstring). Point fields may be dicts, columns or PointSets.
+    """
+    if dtype not in _COORDINATE_DTYPES:
+        raise ValueError(f"dtype must be one of {sorted(_COORDINATE_DTYPES)}")
+
+    wire_dtype = _COORDINATE_DTYPES[dtype]
+    header = {field: value for field, value in payload.items() if field not in POINT_FIELDS}
+    header["blocks"] = []
+    blocks = []
+
+    packed = ingest_phase3_payload(payload)
+
+    for field in POINT_FIELDS:
+        if field not in packed:
+            continue
+
+        points = packed[field]
+        header["blocks"].append({"field": field, "count": len(points), "dtype": dtype})
+
+        blocks.append(points.lats.astype(wire_dtype).tobytes())
+        blocks.append(points.lons.astype(wire_dtype).tobytes())
+
+        if field == "anchors":
+            blocks.append(points.type_codes.tobytes())
+
+    header["anchor_types"] = list(ANCHOR_TYPES)
+    header_bytes = json.dumps(header).encode()
+
+    return b"".join([BINARY_MAGIC, struct.pack("<I", len(header_bytes)), header_bytes, *blocks])
+
+
+def decode_points_binary(body: bytes) -> dict:
+    """
+    Decodes the binary points format into an ingested payload.
+
+    Raises:
+    - ValueError on a malformed or truncated body
+    """
+    if len(body) < 8 or body[:4] != BINARY_MAGIC:
+        raise ValueError("binary payload must start with b'LCP1' and a header length")
+
+    (header_length,) = struct.unpack_from("<I", body, 4)
+    offset = 8 + header_length
+
+    if offset > len(body):
+        raise ValueError("binary payload header is truncated")
+
+    header = decode_json(body[8:offset])
+
+    if not isinstance(header, dict) or not isinstance(header.get("blocks"), list):
+        raise ValueError('binary payload header must be an object with a "blocks" list')
+
+    payload = {field: value for field, value in header.items() if field not in ("blocks", "anchor_types")}
+
+    # Sender's anchor type table -> ANCHOR_TYPES codes
+    sender_types = header.get("anchor_types", list(ANCHOR_TYPES))
+    remap = np.array(
+        [ANCHOR_TYPE_CODES.get(name, ANCHOR_TYPE_CODES["default"]) for name in sender_types],
+        dtype=np.int8,
+    )
+
+    for block in header["blocks"]:
+        field = block.get("field")
+        count = block.get("count")
+        dtype = _COORDINATE_DTYPES.get(block.get("dtype", "float64"))
+
+        if field not in POINT_FIELDS or not isinstance(count, int) or count < 0 or dtype is None:
+            raise ValueError(f"invalid binary block descriptor: {block}")
+
+        size = count * dtype.itemsize
+        with_types = field == "anchors"
+        end = offset + 2 * size + (count if with_types else 0)
+
+        if end > len(body):
+            raise ValueError(f"binary block {field!r} is truncated")
+
+        lats = np.frombuffer(body, dtype=dtype, count=count, offset=offset).astype(np.float64)
+        lons = np.frombuffer(body, dtype=dtype, count=count, offset=offset + size).astype(np.float64)
+
+        if with_types:
+            codes = np.frombuffer(body, dtype=np.int8, count=count, offset=offset + 2 * size)
+
+            if count and not 0 <= codes.min() <= codes.max() < len(remap):
+                raise ValueError("anchor type codes must index anchor_types")
+
+            payload[field] = PointSet(lats, lons, remap[codes], ANCHOR_TYPES)
+        else:
+            payload[field] = PointSet(lats, lons)
+
+        offset = end
+
+    if offset != len(body):
+        raise ValueError("binary payload has trailing bytes")
+
+    return ingest_phase3_payload(payload)
+
+
+# -------------------------------
+# Request bodies
+# -------------------------------
+
+def decode_msgpack(body: bytes):
+    """
+    Decodes MessagePack bytes (requires the optional 'msgpack' package).
+    """
+    try:
+        import msgpack
+    except ImportError as exc:
+        raise UnsupportedPayload(
+            "MessagePack payloads require the optional 'msgpack' package"
+        ) from exc
+
+    try:
+        return msgpack.unpackb(body)
+    except (ValueError, msgpack.UnpackException) as exc:
+        raise ValueError(f"invalid MessagePack body: {exc}") from exc
+
+
+def decode_phase3_body(body: bytes, content_type: str) -> dict:
+    """
+    Decodes a Phase 3 request body into an ingested payload.
+
+    Parameters:
+    - body: raw request bytes
+    - content_type: the request's Content-Type header (parameters ignored)
+
+    Raises:
+    - ValueError on a malformed body (HTTP 400)
+    - UnsupportedPayload for an unknown or unavailable format (HTTP 415)
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+
+    if media_type == POINTS_MEDIA_TYPE:
+        return decode_points_binary(body)
+
+    if media_type in MSGPACK_MEDIA_TYPES:
+        payload = decode_msgpack(body)
+    elif media_type in ("", JSON_MEDIA_TYPE) or media_type.endswith("+json"):
+        try:
+            payload = decode_json(body)
+        except ValueError:
+            raise ValueError("body must be valid JSON")
+    else:
+        raise UnsupportedPayload(f"unsupported Content-Type: {media_type}")
+
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be an object")
+
+    return ingest_phase3_payload(payload)
@@ -0,0 +1,394 @@
+"""
+shadow.py
+
+Shadow (oracle) evaluation of the production engines.
+
+Faster scoring paths must not change the numbers customers see. For a
+sampled fraction of requests, the pure-Python reference
+(app/metrics/reference.py) recomputes the answer in a dedicated
+background process, after the response has been built, and its rounded
+fields are compared with what the active engine returned.
+
+Per check ("phase3", "classify") it records:
+- how many requests were compared, mismatched, failed or dropped
+- which fields mismatched, with a bounded list of sample diffs
+- the latency ratio reference / active (active latency is the
+  engine call as the endpoint saw it, pool dispatch included)
+
+Shadow runs never delay or alter a response: they are queued on one
+worker process (reference code is pure Python and would otherwise hold
+the API process's GIL; a region sample reads the whole POI store), and
+samples beyond the queue bound are dropped.
+
+Configuration (environment):
+- LOCATORIS_SHADOW_FRACTION     share of requests shadowed (default 0 = off)
+- LOCATORIS_SHADOW_MAX_PENDING  max queued shadow runs (default 8)
+- LOCATORIS_SHADOW_SAMPLES      sample diffs kept per check (default 20)
+
+Results: GET /shadow/stats (and shadow counters in GET /metrics).
+"""
+
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+
+from app.metrics.geodesic import DEFAULT_DISTANCE_MODE
+from app.metrics.reference import classify_business_reference, phase3_analyze_reference
+from app.telemetry import metric_lines
+
+# Rounded Phase 3 output fields compared against the reference
+PHASE3_FIELDS = (
+    "raw_competition_score",
+    "normalized_competition_score",
+    "density_label",
+    "competitor_count",
+    "dominant_competitor_present",
+    "competition_pattern",
+    "advantage_vectors",
+)
+
+# classify_business output fields compared against the reference
+CLASSIFY_FIELDS = ("industry", "sub_industry")
+
+
+def _phase3_comparable(payload) -> bool:
+    """
+    Whether the reference models this Phase 3 request: one target,
+    exact distances, exact anchors.
+    """
+    return (
+        "target" in payload
+        and payload.get("distance_mode", DEFAULT_DISTANCE_MODE) == DEFAULT_DISTANCE_MODE
+        and not payload.get("anchor_error")
+    )
+
+
+def _describe_phase3(payload) -> dict:
+    """
+    Small summary of a Phase 3 request for sample diffs.
+    """
+    summary = {
+        "target": payload["target"],
+        "industry": payload.get("industry", "default"),
+    }
+
+    if "region" in payload:
+        summary["region"] = payload["region"]
+    else:
+        summary["competitors"] = len(payload.get("competitors", []))
+        summary["anchors"] = len(payload.get("anchors", []))
+
+    return summary
+
+
+class ShadowCheck:
+    """
+    One engine under shadow evaluation: its reference, the fields to
+    compare and how to summarize an input for sample diffs.
+    """
+
+    def __init__(self, name, reference, fields, describe=dict, comparable=None):
+        self.name = name
+        self.reference = reference
+        self.fields = fields
+        self.describe = describe
+        self.comparable = comparable
+
+
+PHASE3_CHECK = ShadowCheck(
+    "phase3",
+    phase3_analyze_reference,
+    PHASE3_FIELDS,
+    _describe_phase3,
+    _phase3_comparable,
+)
+
+CLASSIFY_CHECK = ShadowCheck("classify", classify_business_reference, CLASSIFY_FIELDS)
+
+
+def diff_fields(active, reference, fields) -> dict:
+    """
+    {field: {"active": ..., "reference": ...}} for every differing field.
+    """
+    return {
+        field: {"active": active.get(field), "reference": reference.get(field)}
+        for field in fields
+        if active.get(field) != reference.get(field)
+    }
+
+
+def _run_reference(reference, payload) -> tuple:
+    """
+    Run one reference evaluation (inside the shadow process).
+
+    Returns:
+    - (reference result or None, error text or None, seconds)
+    """
+    started = time.perf_counter()
+
+    try:
+        result = reference(payload)
+        error = None
+    except Exception as exc:
+        result = None
+        error = f"{type(exc).__name__}: {exc}"
+
+    return result, error, time.perf_counter() - started
+
+
+class _CheckStats:
+    """
+    Counters of one ShadowCheck.
+    """
+
+    def __init__(self, max_samples):
+        self.sampled = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.compared = 0
+        self.mismatches = 0
+        self.errors = 0
+        self.field_mismatches = {}
+        self.active_seconds = 0.0
+        self.reference_seconds = 0.0
+        self.ratio_min = None
+        self.ratio_max = None
+        self.samples = deque(maxlen=max_samples)
+
+    def snapshot(self) -> dict:
+        ratio = None
+        if self.active_seconds > 0:
+            ratio = round(self.reference_seconds / self.active_seconds, 3)
+
+        return {
+            "sampled": self.sampled,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "compared": self.compared,
+            "mismatches": self.mismatches,
+            "errors": self.errors,
+            "field_mismatches": dict(self.field_mismatches),
+            "latency": {
+                "active_seconds": round(self.active_seconds, 6),
+                "reference_seconds": round(self.reference_seconds, 6),
+                # reference / active over all compared requests
+                "ratio": ratio,
+                "ratio_min": self.ratio_min,
+                "ratio_max": self.ratio_max,
+            },
+            "samples": list(self.samples),
+        }
+
+
+class ShadowEvaluator:
+    """
+    Samples requests and re-runs them through the reference engines
+    in a single background process.
+    """
+
+    def __init__(self, fraction=0.0, max_pending=8, max_samples=20, rng=None):
+        if not 0 <= fraction <= 1:
+            raise ValueError("shadow fraction must be in [0, 1]")
+
+        self.fraction = fraction
+        self.max_pending = max_pending
+        self.max_samples = max_samples
+
+        self._rng = rng or random.Random()
+        self._stats = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._closed = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.fraction > 0
+
+    def _check_stats(self, check) -> _CheckStats:
+        stats = self._stats.get(check.name)
+        if stats is None:
+            stats = self._stats[check.name] = _CheckStats(self.max_samples)
+        return stats
+
+    def submit(self, check, payload, result, active_seconds) -> bool:
+        """
+        Maybe queue a shadow run of one served request.
+
+        Parameters:
+        - check: the ShadowCheck of the engine that served it
+        - payload: the engine input (must not be mutated afterwards)
+        - result: the engine output as served
+        - active_seconds: engine wall time as the endpoint measured it
+
+        Returns:
+        - True when a shadow run was queued
+        """
+        if not self.enabled or self._rng.random() >= self.fraction:
+            return False
+
+        # The served fields are copied now; callers may add to the result later
+        active = {field: result.get(field) for field in check.fields}
+
+        with self._lock:
+            stats = self._check_stats(check)
+            stats.sampled += 1
+
+            if check.comparable is not None and not check.comparable(payload):
+                stats.skipped += 1
+                return False
+
+            if self._closed or self._pending >= self.max_pending:
+                stats.dropped += 1
+                return False
+
+            if self._executor is None:
+                # "spawn", like the analysis pool: never fork a process
+                # that already runs an event loop and threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+            try:
+                future = self._executor.submit(_run_reference, check.reference, payload)
+            except BrokenExecutor:
+                # The shadow process died; start a new one next time
+                self._executor = None
+                stats.dropped += 1
+                return False
+
+            self._pending += 1
+
+        future.add_done_callback(
+            lambda done: self._evaluate(done, check, payload, active, active_seconds)
+        )
+        return True
+
+    def _evaluate(self, future, check, payload, active, active_seconds):
+        """
+        Record one finished (or cancelled) shadow run.
+        """
+        if future.cancelled():
+            reference, error, reference_seconds = None, None, 0.0
+        elif future.exception() is not None:
+            exc = future.exception()
+            reference, error, reference_seconds = None, f"{type(exc).__name__}: {exc}", 0.0
+        else:
+            reference, error, reference_seconds = future.result()
+
+        with self._lock:
+            self._pending -= 1
+            stats = self._check_stats(check)
+
+            if future.cancelled():
+                stats.dropped += 1
+                return
+
+            if error is not None:
+                stats.errors += 1
+                stats.samples.append({"input": check.describe(payload), "error": error})
+                return
+
+            diff = diff_fields(active, reference, check.fields)
+
+            stats.compared += 1
+            stats.active_seconds += active_seconds
+            stats.reference_seconds += reference_seconds
+
+            if active_seconds > 0:
+                ratio = round(reference_seconds / active_seconds, 3)
+                stats.ratio_min = ratio if stats.ratio_min is None else min(stats.ratio_min, ratio)
+                stats.ratio_max = ratio if stats.ratio_max is None else max(stats.ratio_max, ratio)
+
+            if diff:
+                stats.mismatches += 1
+
+                for field in diff:
+                    stats.field_mismatches[field] = stats.field_mismatches.get(field, 0) + 1
+
+                stats.samples.append({
+                    "input": check.describe(payload),
+                    "diff": diff,
+                    "active_ms": round(active_seconds * 1e3, 3),
+                    "reference_ms": round(reference_seconds * 1e3, 3),
+                })
+
+    def stats(self) -> dict:
+        """
+        Settings, queue depth and per-check counters.
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "fraction": self.fraction,
+                "pending": self._pending,
+                "checks": {name: stats.snapshot() for name, stats in sorted(self._stats.items())},
+            }
+
+    def prometheus_lines(self) -> list:
+        """
+        Per-check counters as Prometheus metric families.
+        """
+        with self._lock:
+            rows = [
+                (name, stats.compared, stats.mismatches, stats.errors, stats.dropped)
+                for name, stats in sorted(self._stats.items())
+            ]
+
+        lines = []
+
+        for index, field in enumerate(("compared", "mismatches", "errors", "dropped"), start=1):
+            lines += metric_lines(
+                f"locatoris_shadow_{field}_total",
+                "counter",
+                f"Shadow evaluations {field} per engine.",
+                [((row[0],), row[index]) for row in rows],
+                ("check",),
+            )
+
+        return lines
+
+    def drain(self, timeout=None) -> bool:
+        """
+        Wait until every queued shadow run has finished.
+
+        Returns:
+        - False when the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                if self._pending == 0:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def shutdown(self):
+        """
+        Stop the shadow process; queued runs are cancelled and counted
+        as dropped.
+        """
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shadow_from_env() -> ShadowEvaluator:
+    """
+    Build the shadow evaluator from environment settings.
+    """
+    return ShadowEvaluator(
+        fraction=float(os.environ.get("LOCATORIS_SHADOW_FRACTION", "0")),
+        max_pending=int(os.environ.get("LOCATORIS_SHADOW_MAX_PENDING", "8")),
+        max_samples=int(os.environ.get("LOCATORIS_SHADOW_SAMPLES", "20")),
+    )
@@ -0,0 +1,176 @@
+"""
+synthetic_city.py
+
+Seeded synthetic-city generators for benchmarks and tests.
+
+Real POI extracts are large, licensed and change over time, so the
+benchmarks and the test suite generate their own inputs instead. The
+same (kind, count, seed) always produces the same city.
+
+City kinds:
+- uniform:   POIs spread evenly over the city disc
+- clustered: POIs packed into a handful of dense commercial clusters
+- mixed:     a dense clustered core plus a sparse uniform periphery
+             (what most real cities look like)
+
+Tags are drawn from INDUSTRY_REGISTRY with a skewed (Zipf-like)
+popularity, plus the noise keys real OSM objects carry and a share of
+tags the registry does not know.
+"""
+
+import math
+import random
+
+from app.intelligence.industry_registry import INDUSTRY_REGISTRY
+from app.metrics.anchors import ANCHOR_WEIGHTS
+from app.metrics.geodesic import KM_PER_DEGREE
+
+CITY_KINDS = ("uniform", "clustered", "mixed")
+
+# Karachi city center; any mid-latitude point behaves the same
+DEFAULT_CENTER = {"lat": 24.86, "lon": 67.01}
+
+# Radius of the synthetic city disc
+CITY_RADIUS_KM = 8.0
+
+# Anchors generated per competitor
+ANCHOR_RATIO = 0.1
+
+# Share of tag sets that match nothing in the registry
+UNKNOWN_TAG_SHARE = 0.1
+
+# Keys real OSM objects carry that never decide the classification
+NOISE_KEYS = ("name", "opening_hours", "addr:street", "phone", "website")
+
+
+def _offset(center, north_km, east_km) -> dict:
+    lat = center["lat"] + north_km / KM_PER_DEGREE
+    lon = center["lon"] + east_km / (KM_PER_DEGREE * math.cos(math.radians(center["lat"])))
+
+    return {"lat": lat, "lon": lon}
+
+
+def uniform_points(count, rng, center=DEFAULT_CENTER, radius_km=CITY_RADIUS_KM) -> list:
+    """
+    Points uniformly distributed over a disc.
+    """
+    points = []
+
+    for _ in range(count):
+        distance = radius_km * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        points.append(_offset(center, distance * math.cos(bearing), distance * math.sin(bearing)))
+
+    return points
+
+
+def clustered_points(
+    count,
+    rng,
+    center=DEFAULT_CENTER,
+    radius_km=CITY_RADIUS_KM,
+    clusters=8,
+    spread_km=0.4,
+) -> list:
+    """
+    Points in Gaussian clusters whose centers are spread over the disc.
+    """
+    hubs = uniform_points(clusters, rng, center, radius_km * 0.75)
+    points = []
+
+    for _ in range(count):
+        hub = rng.choice(hubs)
+        points.append(_offset(hub, rng.gauss(0, spread_km), rng.gauss(0, spread_km)))
+
+    return points
+
+
+def mixed_points(count, rng, center=DEFAULT_CENTER, radius_km=CITY_RADIUS_KM) -> list:
+    """
+    Two thirds in a clustered core, one third uniform over the disc.
+    """
+    core = count * 2 // 3
+
+    points = clustered_points(core, rng, center, radius_km / 3, clusters=4, spread_km=0.3)
+    points += uniform_points(count - core, rng, center, radius_km)
+
+    return points
+
+
+_GENERATORS = {
+    "uniform": uniform_points,
+    "clustered": clustered_points,
+    "mixed": mixed_points,
+}
+
+
+def make_city(kind, count, seed=42) -> dict:
+    """
+    Build a synthetic city.
+
+    Parameters:
+    - kind: one of CITY_KINDS
+    - count: number of competitors (anchors add ANCHOR_RATIO on top)
+    - seed: RNG seed
+
+    Returns:
+    - dict with "center", "competitors" and typed "anchors"
+    """
+    if kind not in _GENERATORS:
+        raise ValueError(f"unknown city kind {kind!r}; expected one of {CITY_KINDS}")
+
+    rng = random.Random(f"{kind}:{count}:{seed}")
+    generate = _GENERATORS[kind]
+
+    anchor_types = [name for name in ANCHOR_WEIGHTS if name != "default"]
+    anchors = generate(max(1, int(count * ANCHOR_RATIO)), rng)
+
+    for anchor in anchors:
+        anchor["type"] = rng.choice(anchor_types)
+
+    return {
+        "center": dict(DEFAULT_CENTER),
+        "competitors": generate(count, rng),
+        "anchors": anchors,
+    }
+
+
+def registry_tags() -> list:
+    """
+    Every (key, value) pair the registry can classify, in registry order.
+    """
+    return [
+        (key, value)
+        for families in INDUSTRY_REGISTRY.values()
+        for key, values in families.items()
+        for value in values
+    ]
+
+
+def make_tag_sets(count, seed=42) -> list:
+    """
+    OSM-style tag dictionaries with a skewed industry mix.
+
+    Popularity follows 1 / rank over a seeded shuffle of the registry,
+    so a few tags (the "restaurants") dominate and most are rare.
+    """
+    rng = random.Random(f"tags:{count}:{seed}")
+
+    pairs = registry_tags()
+    rng.shuffle(pairs)
+    weights = [1 / rank for rank in range(1, len(pairs) + 1)]
+
+    tag_sets = []
+
+    for key, value in rng.choices(pairs, weights=weights, k=count):
+        if rng.random() < UNKNOWN_TAG_SHARE:
+            tags = {"man_made": rng.choice(("tower", "mast", "water_tower"))}
+        else:
+            tags = {key: value}
+
+        for noise_key in rng.sample(NOISE_KEYS, rng.randint(0, 3)):
+            tags[noise_key] = "x"
+
+        tag_sets.append(tags)
+
+    return tag_sets
@@ -0,0 +1,214 @@
+"""
+telemetry.py
+
+Lightweight in-process measurements for the API layer.
+
+Nothing here changes behavior; it only counts and times what the
+endpoints already do, so performance changes are measurable.
+
+Everything can be rendered in the Prometheus text format (GET /metrics).
+"""
+
+import bisect
+import threading
+
+# Upper bounds (seconds) of latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Payload size buckets (number of points): (label, exclusive upper bound)
+SIZE_BUCKETS = (
+    ("lt_1k", 1_000),
+    ("1k_10k", 10_000),
+    ("10k_100k", 100_000),
+    ("gte_100k", float("inf")),
+)
+
+
+def size_bucket(points) -> str:
+    """
+    Label of the payload size bucket a point count falls into.
+    """
+    for label, upper in SIZE_BUCKETS:
+        if points < upper:
+            return label
+    return SIZE_BUCKETS[-1][0]
+
+
+class LatencyHistogram:
+    """
+    Cumulative-friendly latency histogram with a fixed bucket layout.
+
+    counts[i] holds observations <= LATENCY_BUCKETS[i] (and above the
+    previous bound); the final slot holds everything slower.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.total, 6),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+class LabeledHistograms:
+    """
+    One LatencyHistogram per label tuple, e.g. (endpoint, size bucket).
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def items(self):
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def snapshot(self) -> dict:
+        return {"/".join(labels): histogram.snapshot() for labels, histogram in self.items()}
+
+
+# Request latency per (endpoint, payload size bucket)
+REQUEST_LATENCY = LabeledHistograms()
+
+
+class StageMetrics:
+    """
+    Process-wide totals of Phase 3 stage timings and counters.
+
+    Fed with StageTimings snapshots (see app/metrics/instrumentation.py),
+    which may come back from worker processes.
+    """
+
+    def __init__(self):
+        self.analyses = 0
+        self.stage_seconds = {}
+        self.stage_counts = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, snapshot):
+        with self._lock:
+            self.analyses += 1
+
+            for stage, ms in snapshot["stages_ms"].items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + ms / 1e3
+                self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+
+            for counter, value in snapshot["counters"].items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def prometheus_lines(self) -> list:
+        """
+        Totals as Prometheus metric families.
+        """
+        with self._lock:
+            stage_seconds = sorted(self.stage_seconds.items())
+            stage_counts = sorted(self.stage_counts.items())
+            counters = sorted(self.counters.items())
+            analyses = self.analyses
+
+        lines = metric_lines(
+            "locatoris_phase3_analyses_total",
+            "counter",
+            "Instrumented Phase 3 analyses.",
+            [((), analyses)],
+        )
+        lines += metric_lines(
+            "locatoris_phase3_stage_seconds_total",
+            "counter",
+            "Wall time spent per phase3_analyze stage.",
+            [((stage,), seconds) for stage, seconds in stage_seconds],
+            ("stage",),
+        )
+        lines += metric_lines(
+            "locatoris_phase3_stage_runs_total",
+            "counter",
+            "Times each phase3_analyze stage ran.",
+            [((stage,), count) for stage, count in stage_counts],
+            ("stage",),
+        )
+        lines += metric_lines(
+            "locatoris_phase3_points_total",
+            "counter",
+            "Phase 3 point and index counters (scanned, within radius, index queries).",
+            [((counter,), value) for counter, value in counters],
+            ("counter",),
+        )
+
+        return lines
+
+
+# Phase 3 per-stage totals (only fed while instrumentation is on)
+PHASE3_STAGES = StageMetrics()
+
+
+# -------------------------------
+# Prometheus text exposition
+# -------------------------------
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+    return "{" + pairs + "}"
+
+
+def metric_lines(name, kind, help_text, samples, label_names=()) -> list:
+    """
+    One metric family in Prometheus text format.
+
+    Parameters:
+    - kind: "counter" or "gauge"
+    - samples: iterable of (label values tuple, value)
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+    for label_values, value in samples:
+        lines.append(f"{name}{_labels(label_names, label_values)} {value}")
+
+    return lines
+
+
+def histogram_lines(name, help_text, histograms, label_names) -> list:
+    """
+    A LabeledHistograms family as a Prometheus histogram
+    (cumulative "le" buckets, _sum and _count).
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+
+    for label_values, histogram in histograms.items():
+        cumulative = 0
+
+        for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+            cumulative += count
+            labels = _labels(label_names + ("le",), label_values + (bound,))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+
+        labels = _labels(label_names, label_values)
+        lines.append(f"{name}_sum{labels} {histogram.total}")
+        lines.append(f"{name}_count{labels} {histogram.count}")
+
+    return lines
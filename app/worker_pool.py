@@ -0,0 +1,209 @@
+"""
+worker_pool.py
+
+Bounded process pool for CPU-heavy analysis.
+
+Why this exists:
+- Phase 3 analysis is CPU-bound; in a thread it holds the GIL and
+  starves the health check and small requests
+- A process pool runs it in parallel, off the event loop
+- Admission control keeps a burst of huge payloads from queueing
+  forever: beyond a maximum depth new work is rejected immediately
+  (HTTP 503 + Retry-After) instead of timing out later
+
+Small payloads skip the pool entirely (fast path): pickling them to a
+worker would cost more than scoring them in a thread of this process.
+
+A worker that dies (BrokenProcessPool) breaks the whole executor; it is
+discarded and the next job starts a fresh one, as in app/shadow.py.
+
+Configuration (environment):
+- LOCATORIS_POOL_WORKERS          process count (default: CPU count)
+- LOCATORIS_POOL_MAX_QUEUE        max in-flight pooled jobs (default 4 x workers)
+- LOCATORIS_POOL_TIMEOUT_SECONDS  per-request timeout (default 30)
+- LOCATORIS_POOL_RETRY_AFTER      Retry-After seconds when saturated (default 1)
+- LOCATORIS_INLINE_MAX_POINTS     fast-path threshold in points (default 2000)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when the pool already holds its maximum number of jobs.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("analysis pool is saturated")
+        self.retry_after = retry_after
+
+
+class AnalysisPool:
+    """
+    Async front for a ProcessPoolExecutor with admission control.
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        max_queue_depth=None,
+        timeout_seconds=30.0,
+        inline_max_points=2_000,
+        retry_after_seconds=1,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth or 4 * self.workers
+        self.timeout_seconds = timeout_seconds
+        self.inline_max_points = inline_max_points
+        self.retry_after_seconds = retry_after_seconds
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.inline_runs = 0
+        self.pooled_runs = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        # Created on first use; "spawn" avoids forking a process that
+        # already runs an event loop and threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        # Called with the lock held; only the broken executor is dropped,
+        # not one another job already replaced it with
+        if self._executor is executor:
+            self._executor = None
+            self.restarts += 1
+
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, payload):
+        """
+        Submit to the current executor, replacing it once if it is broken.
+
+        Returns:
+        - (executor, future)
+        """
+        executor = self._get_executor()
+
+        try:
+            return executor, executor.submit(fn, payload)
+        except BrokenExecutor:
+            with self._lock:
+                self._discard_executor(executor)
+
+        executor = self._get_executor()
+
+        return executor, executor.submit(fn, payload)
+
+    async def run(self, fn, payload, points, always_pool=False):
+        """
+        Run fn(payload), inline or on the pool depending on size.
+
+        Parameters:
+        - fn: picklable module-level function
+        - payload: its single argument
+        - points: payload size used for the fast-path decision
+        - always_pool: skip the fast path (cost not driven by points)
+
+        Raises:
+        - PoolSaturated when the queue is full
+        - asyncio.TimeoutError when the job exceeds the timeout
+          (the worker finishes the job, but its result is dropped;
+          the job keeps its queue slot until the worker is done)
+        - BrokenExecutor when a worker died running the job (the
+          executor is replaced for later jobs)
+        """
+        if not always_pool and points <= self.inline_max_points:
+            with self._lock:
+                self.inline_runs += 1
+
+            # Default thread pool: keeps the event loop free without
+            # pickling the payload
+            return await asyncio.get_running_loop().run_in_executor(None, fn, payload)
+
+        with self._lock:
+            if self.in_flight >= self.max_queue_depth:
+                self.rejected += 1
+                raise PoolSaturated(self.retry_after_seconds)
+
+            self.in_flight += 1
+            self.pooled_runs += 1
+
+        try:
+            executor, future = self._submit(fn, payload)
+        except BaseException:
+            self._release(None, None)
+            raise
+
+        # Released when the worker is done (or the queued job is
+        # cancelled), not when the caller stops waiting
+        future.add_done_callback(lambda done: self._release(done, executor))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def _release(self, future, executor):
+        with self._lock:
+            self.in_flight -= 1
+
+            if future is None or future.cancelled():
+                return
+
+            if isinstance(future.exception(), BrokenExecutor):
+                self._discard_executor(executor)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue_depth": self.max_queue_depth,
+                "timeout_seconds": self.timeout_seconds,
+                "inline_max_points": self.inline_max_points,
+                "in_flight": self.in_flight,
+                "inline_runs": self.inline_runs,
+                "pooled_runs": self.pooled_runs,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def pool_from_env() -> AnalysisPool:
+    """
+    Build the analysis pool from environment settings.
+    """
+    workers = int(os.environ.get("LOCATORIS_POOL_WORKERS", "0")) or None
+    max_queue = int(os.environ.get("LOCATORIS_POOL_MAX_QUEUE", "0")) or None
+
+    return AnalysisPool(
+        workers=workers,
+        max_queue_depth=max_queue,
+        timeout_seconds=float(os.environ.get("LOCATORIS_POOL_TIMEOUT_SECONDS", "30")),
+        inline_max_points=int(os.environ.get("LOCATORIS_INLINE_MAX_POINTS", "2000")),
+        retry_after_seconds=int(os.environ.get("LOCATORIS_POOL_RETRY_AFTER", "1")),
+    )
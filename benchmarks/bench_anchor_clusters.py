@@ -0,0 +1,95 @@
+"""
+bench_anchor_clusters.py
+
+Error and speed of clustered anchor scoring (app/metrics/anchor_clusters.py)
+vs the exact anchor_influence_score().
+
+For each anchor count, a dense CBD (typed anchors in Gaussian clusters
+around the city center) is scored at seeded random targets in the core:
+
+1. Error: max |clustered - exact| / exact for every max_error in
+   MAX_ERRORS (tests/test_anchor_clusters.py checks the bound itself).
+2. Scan cost: anchors measured one by one per query, as a share of the
+   anchors within radius (exact scoring measures every one of them).
+3. Speed: ms per query, exact (GridIndex) vs clustered.
+
+Run from the repository root:
+    python -m benchmarks.bench_anchor_clusters
+"""
+
+import random
+import time
+
+from app.metrics.anchor_clusters import AnchorClusters
+from app.metrics.anchors import anchor_influence_score, pack_anchors
+from app.metrics.spatial_index import GridIndex
+from app.synthetic_city import DEFAULT_CENTER, clustered_points, uniform_points
+
+SIZES = (2_000, 20_000, 100_000)
+
+MAX_ERRORS = (0.01, 0.02, 0.05, 0.1)
+
+# Targets scored per anchor count
+TARGETS = 200
+
+
+def make_cbd(count, seed=42) -> list:
+    """
+    Typed anchors packed into a dense core (offices dominate).
+    """
+    rng = random.Random(seed)
+    anchors = clustered_points(count, rng, DEFAULT_CENTER, 1.5, clusters=6, spread_km=0.25)
+    types = ["office"] * 6 + ["hospital", "university", "school", "tourism"]
+
+    for anchor in anchors:
+        anchor["type"] = rng.choice(types)
+
+    return anchors
+
+
+def main():
+    print(
+        f"{'anchors':>9}{'max_error':>11}{'worst error':>13}{'in radius':>11}"
+        f"{'scanned':>9}{'scan %':>8}{'exact ms':>10}{'cluster ms':>12}{'speedup':>9}"
+    )
+
+    for count in SIZES:
+        anchors = pack_anchors(make_cbd(count))
+        index = GridIndex.from_points(anchors)
+        clusters = AnchorClusters.from_points(anchors)
+
+        targets = uniform_points(TARGETS, random.Random(count), DEFAULT_CENTER, 2.0)
+
+        start = time.perf_counter()
+        exact_scores = [anchor_influence_score(target, anchors, index=index) for target in targets]
+        exact_ms = (time.perf_counter() - start) * 1e3 / TARGETS
+
+        for max_error in MAX_ERRORS:
+            worst = 0.0
+            within = scanned = 0
+
+            start = time.perf_counter()
+            queries = [
+                clusters.influence_terms(target["lat"], target["lon"], max_error=max_error)
+                for target in targets
+            ]
+            cluster_ms = (time.perf_counter() - start) * 1e3 / TARGETS
+
+            for target, exact, (_, hits, scans) in zip(targets, exact_scores, queries):
+                score = clusters.influence(target["lat"], target["lon"], max_error=max_error)
+
+                if exact:
+                    worst = max(worst, abs(score - exact) / exact)
+
+                within += hits
+                scanned += scans
+
+            print(
+                f"{count:>9}{max_error:>11}{worst:>13.6f}{within // TARGETS:>11}"
+                f"{scanned // TARGETS:>9}{100 * scanned / max(within, 1):>7.1f}%"
+                f"{exact_ms:>10.3f}{cluster_ms:>12.3f}{exact_ms / cluster_ms:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+bench_distance_modes.py
+
+Accuracy and speed of the local_projection distance mode vs haversine.
+
+1. Error: for every radius in PROJECTION_ERROR_BOUND_M and a range of
+   latitudes, measures max |local_projection - haversine| over uniform
+   random points inside the circle and checks it against the bound
+   (latitudes beyond the auto envelope are reported, not checked).
+2. Speed: distances_within() and phase3_analyze() in both modes.
+
+Run from the repository root:
+    python -m benchmarks.bench_distance_modes
+"""
+
+
+import numpy as np
+
+from app.metrics.geodesic import (
+    AUTO_PROJECTION_MAX_ABS_LAT,
+    KM_PER_DEGREE,
+    PROJECTION_ERROR_BOUND_M,
+    distances_within,
+    haversine_many,
+    local_projection_many,
+)
+from app.metrics.phase3_engine import ingest_phase3_payload, phase3_analyze
+from benchmarks.bench_geodesic import best_of, make_points
+
+LATITUDES = (0, 30, 45, 60, 70, 80, 85, 89)
+
+ERROR_SAMPLES = 200_000
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def max_error_m(lat, radius_km, rng) -> float:
+    """
+    Max |local_projection - haversine| (meters) inside one circle.
+
+    The circle is centered on the antimeridian, so wrapping is covered.
+    """
+    lon = 179.999
+    distance = radius_km * np.sqrt(rng.random(ERROR_SAMPLES))
+    bearing = rng.random(ERROR_SAMPLES) * 2 * np.pi
+
+    lats = lat + distance * np.sin(bearing) / KM_PER_DEGREE
+    lons = lon + distance * np.cos(bearing) / (KM_PER_DEGREE * np.cos(np.radians(lat)))
+    lons = (lons + 180) % 360 - 180
+
+    exact = haversine_many(lat, lon, lats, lons)
+    inside = exact <= radius_km
+    projected = local_projection_many(lat, lon, lats[inside], lons[inside])
+
+    return float(np.abs(projected - exact[inside]).max()) * 1000
+
+
+def check_errors() -> int:
+    rng = np.random.default_rng(7)
+    failures = 0
+
+    print(f"{'radius km':<10}" + "".join(f"{f'lat {lat}':>10}" for lat in LATITUDES) + f"{'bound':>10}")
+
+    for radius_km, bound_m in PROJECTION_ERROR_BOUND_M.items():
+        cells = []
+
+        for lat in LATITUDES:
+            error_m = max_error_m(lat, radius_km, rng)
+            checked = lat <= AUTO_PROJECTION_MAX_ABS_LAT
+
+            if checked and error_m > bound_m:
+                failures += 1
+
+            cells.append(f"{error_m:>9.4f}{'!' if checked and error_m > bound_m else ' '}")
+
+        print(f"{radius_km:<10}" + "".join(cells) + f"{bound_m:>10}")
+
+    return failures
+
+
+def report_speed():
+    target = {"lat": 24.86, "lon": 67.01}
+
+    print()
+    print(f"{'case':<28}{'points':>10}{'haversine ms':>14}{'projection ms':>15}{'speedup':>10}")
+
+    for count in SIZES:
+        points = make_points(count)
+        lats = np.array([point["lat"] for point in points])
+        lons = np.array([point["lon"] for point in points])
+
+        exact_s, _ = best_of(
+            distances_within, target["lat"], target["lon"], lats, lons, 2.0, "haversine"
+        )
+        projected_s, _ = best_of(
+            distances_within, target["lat"], target["lon"], lats, lons, 2.0, "local_projection"
+        )
+        print(
+            f"{'distances_within':<28}{count:>10}{exact_s * 1e3:>14.2f}"
+            f"{projected_s * 1e3:>15.2f}{exact_s / projected_s:>9.1f}x"
+        )
+
+        payload = ingest_phase3_payload({
+            "target": target,
+            "industry": "cafe",
+            "competitors": points,
+            "anchors": points[: count // 4],
+        })
+        exact_s, exact = best_of(phase3_analyze, payload)
+        projected_s, projected = best_of(
+            phase3_analyze, dict(payload, distance_mode="local_projection")
+        )
+        print(
+            f"{'phase3_analyze':<28}{count:>10}{exact_s * 1e3:>14.2f}"
+            f"{projected_s * 1e3:>15.2f}{exact_s / projected_s:>9.1f}x"
+            f"   raw score {exact['raw_competition_score']} vs {projected['raw_competition_score']}"
+        )
+
+
+def main():
+    failures = check_errors()
+    report_speed()
+
+    # The documented bounds must hold
+    assert failures == 0, f"{failures} measured errors exceed PROJECTION_ERROR_BOUND_M"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+bench_geodesic.py
+
+Compares the scalar haversine loop against the vectorized kernel.
+
+Run from the repository root:
+    python -m benchmarks.bench_geodesic
+"""
+
+import random
+import time
+
+from app.metrics.geodesic import haversine, pack_coordinates, distances_within
+from app.metrics.competition import effective_competition
+from app.metrics.anchors import anchor_influence_score, ANCHOR_WEIGHTS
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def scalar_competition(target, competitors, radius_km=2.0) -> float:
+    """
+    The original per-point loop, kept here as the baseline.
+    """
+    score = 0.0
+
+    for comp in competitors:
+        dist = haversine(target["lat"], target["lon"], comp["lat"], comp["lon"])
+
+        if dist <= radius_km:
+            score += 1 / (dist + 0.1)
+
+    return round(score, 3)
+
+
+def scalar_anchor_influence(target, anchors, radius_km=1.5) -> float:
+    """
+    The original per-anchor loop, kept here as the baseline.
+    """
+    score = 0.0
+
+    for anchor in anchors:
+        dist = haversine(target["lat"], target["lon"], anchor["lat"], anchor["lon"])
+
+        if dist <= radius_km:
+            weight = ANCHOR_WEIGHTS.get(anchor["type"], ANCHOR_WEIGHTS["default"])
+            score += weight / (dist + 0.1)
+
+    return round(score, 3)
+
+
+def make_points(count, seed=42):
+    """
+    City-scale synthetic points scattered ~5 km around a center.
+    """
+    rng = random.Random(seed)
+    types = list(ANCHOR_WEIGHTS)
+
+    return [
+        {
+            "lat": 24.86 + rng.gauss(0, 0.04),
+            "lon": 67.01 + rng.gauss(0, 0.04),
+            "type": rng.choice(types),
+        }
+        for _ in range(count)
+    ]
+
+
+def best_of(fn, *args, repeat=3) -> tuple:
+    """
+    Returns (best wall time in seconds, result).
+    """
+    best = float("inf")
+    result = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def report(name, count, scalar_s, vector_s):
+    print(
+        f"{name:<24}{count:>10}"
+        f"{scalar_s * 1e3:>12.2f}{vector_s * 1e3:>12.2f}"
+        f"{scalar_s / vector_s:>9.1f}x"
+    )
+
+
+def main():
+    target = {"lat": 24.86, "lon": 67.01}
+
+    print(f"{'function':<24}{'points':>10}{'scalar ms':>12}{'vector ms':>12}{'speedup':>10}")
+
+    for count in SIZES:
+        points = make_points(count)
+
+        pairs = (
+            ("effective_competition", scalar_competition, effective_competition),
+            ("anchor_influence_score", scalar_anchor_influence, anchor_influence_score),
+        )
+
+        scalar_times = {}
+
+        for name, scalar_fn, vector_fn in pairs:
+            scalar_s, expected = best_of(scalar_fn, target, points)
+            vector_s, actual = best_of(vector_fn, target, points)
+
+            # Scores must be identical, not merely close
+            assert expected == actual, (name, count, expected, actual)
+
+            scalar_times[name] = scalar_s
+            report(name, count, scalar_s, vector_s)
+
+        # Kernel only: coordinates already packed (no dict parsing)
+        lats, lons = pack_coordinates(points)
+        kernel_s, _ = best_of(
+            distances_within, target["lat"], target["lon"], lats, lons, 2.0
+        )
+        report(
+            "kernel (packed input)",
+            count,
+            scalar_times["effective_competition"],
+            kernel_s,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+bench_points.py
+
+Memory and parse cost of dict points vs packed PointSets, per wire format.
+
+For each payload size and mode, a fresh interpreter decodes the body of
+a /phase3/competition payload and runs phase3_analyze() on the result:
+
+- dicts     stdlib json, point dicts kept (the original path)
+- packed    stdlib json, then ingest_phase3_payload() (dicts dropped)
+- fast      decode_phase3_body(): orjson (if installed) + ingest
+- columns   decode_phase3_body() on columnar JSON
+- binary    decode_phase3_body() on the binary points format (float64)
+
+It reports parse / ingest / analysis time, the bytes the decoded payload
+still holds afterwards (tracemalloc) and the process's peak RSS.
+
+Run from the repository root:
+    python -m benchmarks.bench_points
+"""
+
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_geodesic import make_points
+from app.metrics.phase3_engine import ingest_phase3_payload, phase3_analyze
+from app.payload_codec import POINTS_MEDIA_TYPE, decode_phase3_body, encode_points_binary
+
+SIZES = (10_000, 100_000, 500_000)
+
+# mode -> body format it reads
+MODES = {
+    "dicts": "objects",
+    "packed": "objects",
+    "fast": "objects",
+    "columns": "columns",
+    "binary": "binary",
+}
+
+
+def _peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process (MB).
+
+    On Linux VmHWM is used: ru_maxrss carries over the parent's peak
+    into subprocesses, which would hide the payload's own footprint.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def make_payload(count) -> dict:
+    """
+    Phase 3 payload with count competitors and count / 4 anchors.
+    """
+    return {
+        "target": {"lat": 24.86, "lon": 67.01},
+        "industry": "cafe",
+        "competitors": [
+            {"lat": point["lat"], "lon": point["lon"]}
+            for point in make_points(count, seed=1)
+        ],
+        "anchors": make_points(count // 4, seed=2),
+    }
+
+
+def make_bodies(count) -> dict:
+    """
+    The same payload in every body format.
+    """
+    payload = make_payload(count)
+    columns = dict(payload)
+
+    for field in ("competitors", "anchors"):
+        columns[field] = {
+            key: [point[key] for point in payload[field]]
+            for key in payload[field][0]
+        }
+
+    return {
+        "objects": json.dumps(payload).encode(),
+        "columns": json.dumps(columns).encode(),
+        "binary": encode_points_binary(payload),
+    }
+
+
+def _decode(mode, body):
+    """
+    Returns (payload, ingest seconds) for one mode.
+    """
+    if mode in ("dicts", "packed"):
+        payload = json.loads(body)
+
+        if mode == "dicts":
+            return payload, 0.0
+
+        start = time.perf_counter()
+        payload = ingest_phase3_payload(payload)
+
+        return payload, time.perf_counter() - start
+
+    content_type = POINTS_MEDIA_TYPE if mode == "binary" else "application/json"
+
+    return decode_phase3_body(body, content_type), 0.0
+
+
+def run_case(mode, body_path) -> dict:
+    """
+    One measurement; meant to run in its own process (see main), so
+    peak RSS reflects this payload alone.
+    """
+    with open(body_path, "rb") as handle:
+        body = handle.read()
+
+    gc.collect()
+    baseline_rss = _peak_rss_mb()
+
+    start = time.perf_counter()
+    payload, ingest_s = _decode(mode, body)
+    parse_s = time.perf_counter() - start - ingest_s
+
+    start = time.perf_counter()
+    result = phase3_analyze(payload)
+    analyze_s = time.perf_counter() - start
+
+    peak_rss_mb = _peak_rss_mb() - baseline_rss
+
+    # Held memory is traced on a second decode: tracing slows parsing down
+    del payload
+    gc.collect()
+    tracemalloc.start()
+    payload, _ = _decode(mode, body)
+    gc.collect()
+    retained_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "points": len(payload["competitors"]) + len(payload["anchors"]),
+        "body_mb": len(body) / 2**20,
+        "parse_ms": parse_s * 1e3,
+        "ingest_ms": ingest_s * 1e3,
+        "analyze_ms": analyze_s * 1e3,
+        "retained_mb": retained_bytes / 2**20,
+        "peak_rss_mb": peak_rss_mb,
+        "raw_competition_score": result["raw_competition_score"],
+    }
+
+
+def _run_in_subprocess(mode, body_path) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_points", "--case", mode, body_path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    return json.loads(output)
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--case":
+        print(json.dumps(run_case(sys.argv[2], sys.argv[3])))
+        return
+
+    print(
+        f"{'mode':<8}{'points':>10}{'body MB':>9}{'parse ms':>11}{'ingest ms':>11}"
+        f"{'analyze ms':>12}{'held MB':>10}{'peak RSS +MB':>14}"
+    )
+
+    for count in SIZES:
+        scores = set()
+        rows = []
+
+        with tempfile.TemporaryDirectory() as directory:
+            for body_format, body in make_bodies(count).items():
+                with open(os.path.join(directory, body_format), "wb") as handle:
+                    handle.write(body)
+
+            for mode, body_format in MODES.items():
+                rows.append(_run_in_subprocess(mode, os.path.join(directory, body_format)))
+
+        for row in rows:
+            scores.add(row["raw_competition_score"])
+
+            print(
+                f"{row['mode']:<8}{row['points']:>10}{row['body_mb']:>9.1f}"
+                f"{row['parse_ms']:>11.1f}{row['ingest_ms']:>11.1f}{row['analyze_ms']:>12.1f}"
+                f"{row['retained_mb']:>10.1f}{row['peak_rss_mb']:>14.1f}"
+            )
+
+        # Every representation must score identically
+        assert len(scores) == 1, (count, scores)
+
+
+if __name__ == "__main__":
+    main()
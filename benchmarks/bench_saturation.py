@@ -0,0 +1,130 @@
+"""
+bench_saturation.py
+
+Throughput of the city-wide saturation job (app/metrics/saturation.py).
+
+For each city size a POI store is built from a seeded synthetic city
+(mixed layout, registry-drawn tags classified with classify_business,
+typed anchors), then every POI is scored against its peers in both
+distance modes. A few POIs are re-checked against phase3_analyze.
+
+It reports POIs / s, in-radius pairs per POI and pairs / s. The job is
+linear in pairs, so pairs / s predicts larger cities: a 1M-POI city
+with P pairs per POI takes about 1M x P / (pairs / s).
+
+Run from the repository root:
+    python -m benchmarks.bench_saturation [--workers N]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.intelligence.industry_classifier import classify_business
+from app.metrics.phase3_engine import DENSITY_LABELS, phase3_analyze
+from app.metrics.points import PointSet
+from app.metrics.poi_store import build_poi_store, load_region
+from app.metrics.saturation import INDUSTRY_KEYS, load_saturation, run_saturation
+from app.synthetic_city import make_city, make_tag_sets
+
+SIZES = (10_000, 50_000)
+
+MODES = ("haversine", "local_projection")
+
+# POIs re-checked against phase3_analyze per run (haversine mode)
+CHECKED_POIS = 5
+
+
+def make_records(count, seed=42) -> list:
+    """
+    Classified POI records (the bulk classifier output format).
+    """
+    city = make_city("mixed", count, seed)
+    records = []
+
+    for point, tags in zip(city["competitors"], make_tag_sets(count, seed)):
+        classification = classify_business(tags)
+        records.append({**point, **classification})
+
+    for anchor in city["anchors"]:
+        records.append({"lat": anchor["lat"], "lon": anchor["lon"], "anchor_type": anchor["type"]})
+
+    return records
+
+
+def check_against_phase3(region, root, output, seed=0) -> int:
+    """
+    Re-scores a few POIs with phase3_analyze; returns mismatches.
+    """
+    store = load_region(region, root)
+    _, columns = load_saturation(output)
+
+    anchor_rows = np.flatnonzero(store.anchor_type >= 0)
+    anchor_types = store.meta["anchor_types"]
+    anchors = [
+        {"lat": float(store.lat[row]), "lon": float(store.lon[row]), "type": anchor_types[store.anchor_type[row]]}
+        for row in anchor_rows
+    ]
+
+    mismatches = 0
+
+    for row in random.Random(seed).sample(range(len(store)), CHECKED_POIS):
+        industry = INDUSTRY_KEYS[columns["industry_key"][row]]
+        codes = store.competitor_codes(industry)
+        peers = np.flatnonzero(np.isin(store.sub_industry, codes))
+        peers = peers[peers != row]
+
+        expected = phase3_analyze({
+            "target": {"lat": float(store.lat[row]), "lon": float(store.lon[row])},
+            "industry": industry,
+            "competitors": PointSet(store.lat[peers], store.lon[peers]),
+            "anchors": anchors,
+        })
+
+        mismatches += (
+            expected["raw_competition_score"] != columns["raw_competition_score"][row]
+            or expected["competitor_count"] != columns["competitor_count"][row]
+            or expected["density_label"] != DENSITY_LABELS[columns["density_label"][row]]
+        )
+
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the saturation self-join.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    print(f"{'POIs':>9}  {'mode':<17}{'seconds':>9}{'POIs/s':>10}{'pairs/POI':>11}{'pairs/s':>13}")
+
+    for count in SIZES:
+        with tempfile.TemporaryDirectory() as directory:
+            root = os.path.join(directory, "stores")
+            build_poi_store(make_records(count), os.path.join(root, "bench"))
+            pois = len(load_region("bench", root))
+
+            for mode in MODES:
+                output = os.path.join(directory, f"saturation-{mode}")
+
+                start = time.perf_counter()
+                run_saturation("bench", output, store_root=root, workers=args.workers, mode=mode)
+                seconds = time.perf_counter() - start
+
+                _, columns = load_saturation(output)
+                hits = int(columns["competitors_within_radius"].sum()) + int(columns["anchors_within_radius"].sum())
+
+                print(
+                    f"{pois:>9}  {mode:<17}{seconds:>9.2f}{pois / seconds:>10.0f}"
+                    f"{hits / pois:>11.0f}{hits / seconds:>13.0f}"
+                )
+
+                if mode == "haversine":
+                    assert check_against_phase3("bench", root, output) == 0
+
+
+if __name__ == "__main__":
+    main()
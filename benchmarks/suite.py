@@ -0,0 +1,356 @@
+"""
+suite.py
+
+Benchmark suite for the Phase 2 and Phase 3 hot paths.
+
+What is measured (per case):
+- ops/s and p50 / p99 latency of single calls
+- peak traced memory of one call (tracemalloc; numpy buffers included)
+
+Cases:
+- haversine, effective_competition, anchor_influence_score,
+  phase3_analyze on every synthetic city kind and size
+- classify_business on registry-drawn tag sets
+- POST /phase3/competition and POST /classify through an in-process
+  TestClient (result cache off, so every request is computed)
+
+Inputs come from app/synthetic_city.py and are fully seeded.
+
+Run from the repository root:
+    python -m benchmarks.suite run --output bench.json
+    python -m benchmarks.suite run --quick --baseline bench.json
+    python -m benchmarks.suite compare bench.json new.json
+
+Compare mode flags a case as a regression when ops/s drops, or p99 or
+peak memory grows, by more than --threshold (relative). The exit code
+is 1 when any regression is found, so it can gate CI.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from itertools import cycle
+
+import numpy as np
+
+from app.intelligence.industry_classifier import classify_business
+from app.metrics.anchors import anchor_influence_score
+from app.metrics.competition import effective_competition
+from app.metrics.geodesic import haversine
+from app.metrics.phase3_engine import phase3_analyze
+from app.payload_codec import POINTS_MEDIA_TYPE, encode_points_binary
+from app.synthetic_city import CITY_KINDS, make_city, make_tag_sets
+
+FULL_SIZES = (1_000, 10_000, 100_000)
+QUICK_SIZES = (1_000, 10_000)
+
+# Tag sets per classify_business op (one call is far below timer resolution)
+CLASSIFY_BATCH = 1_000
+
+# Points per haversine op, for the same reason
+HAVERSINE_BATCH = 1_000
+
+# Relative change beyond which compare mode reports a regression
+DEFAULT_THRESHOLD = 0.2
+
+
+# -------------------------------
+# Measurement
+# -------------------------------
+
+def measure(fn, min_time=0.5, min_iterations=5, max_iterations=10_000) -> dict:
+    """
+    Time repeated calls of fn() and trace the peak memory of one call.
+
+    Runs at least min_iterations calls and keeps going until min_time
+    seconds have been spent (or max_iterations is reached).
+    """
+    fn()  # warm-up: imports, lazy indexes, worker spawn
+
+    latencies = []
+    started = time.perf_counter()
+
+    while len(latencies) < max_iterations:
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+
+        if len(latencies) >= min_iterations and time.perf_counter() - started >= min_time:
+            break
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+
+    return {
+        "iterations": len(latencies),
+        "ops_per_sec": round(len(latencies) / latencies.sum(), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1e3, 4),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+# -------------------------------
+# Cases
+# -------------------------------
+
+def function_cases(sizes, seed):
+    """
+    Yield (name, callable) for the pure-function cases.
+    """
+    for kind in CITY_KINDS:
+        for count in sizes:
+            city = make_city(kind, count, seed)
+            target = city["center"]
+            competitors = city["competitors"]
+            anchors = city["anchors"]
+            payload = {
+                "target": target,
+                "industry": "cafe",
+                "competitors": competitors,
+                "anchors": anchors,
+            }
+            label = f"{kind}/{count}"
+
+            yield f"effective_competition/{label}", lambda t=target, c=competitors: (
+                effective_competition(t, c)
+            )
+            yield f"anchor_influence_score/{label}", lambda t=target, a=anchors: (
+                anchor_influence_score(t, a)
+            )
+            yield f"phase3_analyze/{label}", lambda p=payload: phase3_analyze(p)
+
+    sample = make_city("mixed", HAVERSINE_BATCH, seed)
+    center = sample["center"]
+    coords = [(point["lat"], point["lon"]) for point in sample["competitors"]]
+
+    def haversine_batch():
+        for lat, lon in coords:
+            haversine(center["lat"], center["lon"], lat, lon)
+
+    yield f"haversine/x{HAVERSINE_BATCH}", haversine_batch
+
+    tag_sets = make_tag_sets(CLASSIFY_BATCH, seed)
+
+    def classify_batch():
+        for tags in tag_sets:
+            classify_business(tags)
+
+    yield f"classify_business/x{CLASSIFY_BATCH}", classify_batch
+
+
+def endpoint_cases(client, sizes, seed):
+    """
+    Yield (name, callable) for the HTTP cases, one request per op.
+    """
+    for kind in CITY_KINDS:
+        for count in sizes:
+            city = make_city(kind, count, seed)
+            body = json.dumps({
+                "target": city["center"],
+                "industry": "cafe",
+                "competitors": city["competitors"],
+                "anchors": city["anchors"],
+            })
+
+            def post_competition(body=body):
+                response = client.post(
+                    "/phase3/competition",
+                    content=body,
+                    headers={"content-type": "application/json"},
+                )
+                response.raise_for_status()
+
+            yield f"POST /phase3/competition/{kind}/{count}", post_competition
+
+            binary_body = encode_points_binary(json.loads(body))
+
+            def post_competition_binary(body=binary_body):
+                response = client.post(
+                    "/phase3/competition",
+                    content=body,
+                    headers={"content-type": POINTS_MEDIA_TYPE},
+                )
+                response.raise_for_status()
+
+            yield f"POST /phase3/competition[binary]/{kind}/{count}", post_competition_binary
+
+    tag_bodies = cycle(json.dumps(tags) for tags in make_tag_sets(CLASSIFY_BATCH, seed))
+
+    def post_classify():
+        response = client.post(
+            "/classify",
+            content=next(tag_bodies),
+            headers={"content-type": "application/json"},
+        )
+        response.raise_for_status()
+
+    yield "POST /classify", post_classify
+
+
+def run_suite(sizes, seed=42, only=None, min_time=0.5, endpoints=True) -> dict:
+    """
+    Run every case and return the JSON-ready report.
+    """
+    results = {}
+
+    def run(cases):
+        for name, fn in cases:
+            if only and only not in name:
+                continue
+
+            results[name] = measure(fn, min_time=min_time)
+            stats = results[name]
+            print(
+                f"{name:<52}{stats['ops_per_sec']:>12.1f} ops/s"
+                f"{stats['p50_ms']:>11.3f} p50 ms{stats['p99_ms']:>11.3f} p99 ms"
+                f"{stats['peak_memory_kib']:>12.1f} KiB",
+                file=sys.stderr,
+            )
+
+    run(function_cases(sizes, seed))
+
+    if endpoints:
+        # Measure computation, not cache hits
+        os.environ["LOCATORIS_CACHE_BACKEND"] = "off"
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        with TestClient(app) as client:
+            run(endpoint_cases(client, sizes, seed))
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": seed,
+            "sizes": list(sizes),
+        },
+        "results": results,
+    }
+
+
+# -------------------------------
+# Baseline comparison
+# -------------------------------
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD) -> list:
+    """
+    Compare two reports case by case.
+
+    Returns:
+    - list of regression dicts (case, metric, baseline, current, change);
+      cases missing from either report are ignored
+    """
+    regressions = []
+
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+
+        # (metric, True when larger is worse)
+        for metric, larger_is_worse in (
+            ("ops_per_sec", False),
+            ("p99_ms", True),
+            ("peak_memory_kib", True),
+        ):
+            old, new = before[metric], now[metric]
+            if not old:
+                continue
+
+            change = (new - old) / old
+            worse = change > threshold if larger_is_worse else change < -threshold
+
+            if worse:
+                regressions.append({
+                    "case": name,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(change, 4),
+                })
+
+    return regressions
+
+
+def report_regressions(regressions, threshold) -> int:
+    if not regressions:
+        print(f"no regressions beyond {threshold:.0%}", file=sys.stderr)
+        return 0
+
+    for item in regressions:
+        print(
+            f"REGRESSION {item['case']}: {item['metric']} "
+            f"{item['baseline']} -> {item['current']} ({item['change']:+.1%})",
+            file=sys.stderr,
+        )
+
+    return 1
+
+
+def _load(path) -> dict:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Phase 2 / Phase 3 hot paths on synthetic cities."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite")
+    run_parser.add_argument("--output", help="write the JSON report here")
+    run_parser.add_argument("--baseline", help="compare against this stored report")
+    run_parser.add_argument("--quick", action="store_true", help="skip the 100k-point cases")
+    run_parser.add_argument("--only", help="run only cases whose name contains this")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--min-time", type=float, default=0.5, help="seconds per case")
+    run_parser.add_argument("--no-endpoints", action="store_true", help="skip the HTTP cases")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = commands.add_parser("compare", help="compare two stored reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        regressions = compare(_load(args.baseline), _load(args.current), args.threshold)
+        return report_regressions(regressions, args.threshold)
+
+    report = run_suite(
+        QUICK_SIZES if args.quick else FULL_SIZES,
+        seed=args.seed,
+        only=args.only,
+        min_time=args.min_time,
+        endpoints=not args.no_endpoints,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        regressions = compare(_load(args.baseline), report, args.threshold)
+        return report_regressions(regressions, args.threshold)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+conftest.py
+
+Shared fixtures: one seeded synthetic city, as payload points and as a
+region POI store, so engine paths can be compared on the same data.
+"""
+
+import pytest
+
+from app.intelligence.industry_classifier import classify_business
+from app.metrics import poi_store
+from app.metrics.poi_store import build_poi_store, load_region
+from app.synthetic_city import make_city, make_tag_sets
+
+CITY_POIS = 1_200
+CITY_SEED = 11
+
+
+@pytest.fixture(scope="session")
+def city():
+    """
+    make_city() output whose competitors carry seeded OSM "tags".
+    """
+    city = make_city("mixed", CITY_POIS, seed=CITY_SEED)
+
+    for point, tags in zip(city["competitors"], make_tag_sets(CITY_POIS, seed=CITY_SEED)):
+        point["tags"] = tags
+
+    return city
+
+
+@pytest.fixture(scope="session")
+def city_region(tmp_path_factory, city):
+    """
+    Name of a region store built from the city (competitors classified
+    from their tags, anchors typed); the default store root points at
+    it for the whole session.
+    """
+    root = tmp_path_factory.mktemp("poi_store")
+
+    records = [
+        {"lat": point["lat"], "lon": point["lon"], **classify_business(point["tags"])}
+        for point in city["competitors"]
+    ]
+    records += [
+        {"lat": anchor["lat"], "lon": anchor["lon"], "anchor_type": anchor["type"]}
+        for anchor in city["anchors"]
+    ]
+    build_poi_store(records, str(root / "city"))
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(poi_store, "POI_STORE_ROOT", str(root))
+        yield "city"
+
+
+@pytest.fixture(scope="session")
+def region_points(city_region):
+    """
+    Function industry -> (competitors, anchors): the region's points as
+    payload dicts, in store row order (the order region scoring sums in).
+    """
+    def points(industry):
+        store = load_region(city_region)
+        competing = set(store.competitor_codes(industry))
+        anchor_types = store.meta["anchor_types"]
+
+        competitors = []
+        anchors = []
+
+        for lat, lon, sub_industry, anchor_type in zip(
+            store.lat.tolist(),
+            store.lon.tolist(),
+            store.sub_industry.tolist(),
+            store.anchor_type.tolist(),
+        ):
+            if sub_industry in competing:
+                competitors.append({"lat": lat, "lon": lon})
+            if anchor_type >= 0:
+                anchors.append({"lat": lat, "lon": lon, "type": anchor_types[anchor_type]})
+
+        return competitors, anchors
+
+    return points
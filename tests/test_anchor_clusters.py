@@ -0,0 +1,86 @@
+"""
+test_anchor_clusters.py
+
+Clustered anchor scoring (AnchorClusters) against the exact
+anchor_influence_score(): the documented error bound, the exact
+max_error=0 case and exact in-range counts.
+"""
+
+import random
+
+import pytest
+
+from app.metrics.anchor_clusters import AnchorClusters
+from app.metrics.anchors import ANCHOR_RADIUS_KM, anchor_influence_score, pack_anchors
+from app.metrics.spatial_index import GridIndex
+from app.synthetic_city import DEFAULT_CENTER, clustered_points, uniform_points
+
+ANCHORS = 8_000
+
+TARGETS = 150
+
+# Rounding slack of the 3-decimal anchor score
+ROUNDING = 0.001
+
+
+@pytest.fixture(scope="module")
+def cbd():
+    """
+    Dense typed anchors, their exact index and clusters, and targets
+    spread over (and around) the dense core.
+    """
+    rng = random.Random(11)
+    points = clustered_points(ANCHORS, rng, DEFAULT_CENTER, 1.5, clusters=6, spread_km=0.25)
+    types = ["office"] * 6 + ["hospital", "university", "school", "tourism"]
+
+    for point in points:
+        point["type"] = rng.choice(types)
+
+    anchors = pack_anchors(points)
+    targets = uniform_points(TARGETS, rng, DEFAULT_CENTER, 3.0)
+
+    return anchors, GridIndex.from_points(anchors), AnchorClusters.from_points(anchors), targets
+
+
+@pytest.mark.parametrize("max_error", [0.01, 0.05, 0.2])
+def test_error_bound(cbd, max_error):
+    anchors, index, clusters, targets = cbd
+    merged = 0
+
+    for target in targets:
+        exact = anchor_influence_score(target, anchors, index=index)
+        score = clusters.influence(target["lat"], target["lon"], max_error=max_error)
+
+        assert abs(score - exact) <= max_error * exact + ROUNDING
+
+        _, within, scanned = clusters.influence_terms(target["lat"], target["lon"], max_error=max_error)
+        merged += within - scanned
+
+    # The bound is only meaningful if clusters were actually merged
+    assert merged > 0
+
+
+def test_zero_error_is_exact(cbd):
+    anchors, index, clusters, targets = cbd
+
+    for target in targets:
+        exact = anchor_influence_score(target, anchors, index=index)
+
+        assert clusters.influence(target["lat"], target["lon"], max_error=0) == exact
+
+
+@pytest.mark.parametrize("max_error", [0, 0.05, 0.2])
+def test_in_range_counts_are_exact(cbd, max_error):
+    anchors, index, clusters, targets = cbd
+
+    for target in targets:
+        indices, _ = index.query(target["lat"], target["lon"], ANCHOR_RADIUS_KM)
+        _, within, _ = clusters.influence_terms(target["lat"], target["lon"], max_error=max_error)
+
+        assert within == len(indices)
+
+
+def test_empty_anchor_set():
+    clusters = AnchorClusters.from_points([])
+
+    assert clusters.influence(DEFAULT_CENTER["lat"], DEFAULT_CENTER["lon"]) == 0.0
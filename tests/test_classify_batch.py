@@ -0,0 +1,94 @@
+"""
+test_classify_batch.py
+
+/classify/batch must answer in input order and framing, with an error
+object in the slot of every record it cannot classify, and refuse
+oversized bodies before parsing them.
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.intelligence.industry_classifier import classify_business
+
+RECORDS = [
+    {"amenity": "cafe"},
+    {"shop": "books", "name": "Corner"},
+    {},
+    {"shop": ["books"]},
+    {"amenity": {"nested": "cafe"}},
+    {"man_made": "tower"},
+]
+
+SLOT_ERROR = {"error": "tag values must not be lists or objects"}
+
+
+def _expected(tags):
+    if any(isinstance(value, (list, dict)) for value in tags.values()):
+        return SLOT_ERROR
+    return classify_business(tags)
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+def test_json_array_keeps_order_and_error_slots(client):
+    response = client.post("/classify/batch", json=RECORDS)
+
+    assert response.status_code == 200
+    assert response.json() == [_expected(tags) for tags in RECORDS]
+
+
+def test_json_array_spanning_flushes(client):
+    records = RECORDS * (main.CLASSIFY_BATCH_FLUSH // len(RECORDS) + 3)
+
+    response = client.post("/classify/batch", json=records)
+
+    assert response.json() == [_expected(tags) for tags in records]
+
+
+def test_ndjson_error_slots(client):
+    lines = [json.dumps(tags) for tags in RECORDS] + ["not json", "[1, 2]", "", "  "]
+    body = "\n".join(lines).encode()
+
+    response = client.post("/classify/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        *(_expected(tags) for tags in RECORDS),
+        {"error": "invalid JSON"},
+        {"error": "expected a JSON object of tags"},
+    ]
+
+
+def test_ndjson_without_trailing_newline_spanning_flushes(client):
+    records = RECORDS * (main.CLASSIFY_BATCH_FLUSH // len(RECORDS) + 3)
+    body = "\n".join(json.dumps(tags) for tags in records).encode()
+
+    response = client.post("/classify/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert [json.loads(line) for line in response.text.splitlines()] == [_expected(tags) for tags in records]
+
+
+@pytest.mark.parametrize("body, status", [(b"[{]", 400), (b'{"amenity": "cafe"}', 422), (b"[1]", 422)])
+def test_malformed_arrays(client, body, status):
+    response = client.post("/classify/batch", content=body, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == status
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_oversized_body_is_refused(client, monkeypatch, content_type):
+    monkeypatch.setattr(main, "CLASSIFY_MAX_BODY_BYTES", 64)
+
+    body = json.dumps(RECORDS[:1] * 10).encode()
+
+    response = client.post("/classify/batch", content=body, headers={"Content-Type": content_type})
+
+    assert response.status_code == 413
@@ -0,0 +1,93 @@
+"""
+test_distance_modes.py
+
+The local_projection distance mode against haversine: the documented
+error bounds (geodesic.PROJECTION_ERROR_BOUND_M) everywhere "auto"
+projects, and the "auto" switch-over itself.
+"""
+
+import numpy as np
+import pytest
+
+from app.metrics.geodesic import (
+    AUTO_PROJECTION_MAX_ABS_LAT,
+    AUTO_PROJECTION_MAX_RADIUS_KM,
+    KM_PER_DEGREE,
+    PROJECTION_ERROR_BOUND_M,
+    distances_within,
+    haversine_many,
+    local_projection_many,
+    resolve_distance_mode,
+)
+
+# Latitudes inside the auto envelope, both hemispheres and its edge
+LATITUDES = (0, 30, -45, 60, 70, 80, -85, AUTO_PROJECTION_MAX_ABS_LAT)
+
+# Ordinary longitudes and circles centered on the antimeridian
+LONGITUDES = (67.01, 179.999)
+
+SAMPLES = 50_000
+
+
+def _disc(lat, lon, radius_km, rng):
+    """
+    Uniform random points over a disc (slightly larger than the radius).
+    """
+    distance = 1.01 * radius_km * np.sqrt(rng.random(SAMPLES))
+    bearing = rng.random(SAMPLES) * 2 * np.pi
+
+    lats = lat + distance * np.sin(bearing) / KM_PER_DEGREE
+    lons = lon + distance * np.cos(bearing) / (KM_PER_DEGREE * np.cos(np.radians(lat)))
+
+    return lats, (lons + 180) % 360 - 180
+
+
+@pytest.mark.parametrize("radius_km, bound_m", sorted(PROJECTION_ERROR_BOUND_M.items()))
+@pytest.mark.parametrize("lat", LATITUDES)
+@pytest.mark.parametrize("lon", LONGITUDES)
+def test_projection_error_bound(lat, lon, radius_km, bound_m):
+    assert resolve_distance_mode("auto", lat, radius_km) == "local_projection"
+
+    rng = np.random.default_rng(abs(int(lat * 100)) + int(radius_km * 10))
+    lats, lons = _disc(lat, lon, radius_km, rng)
+
+    exact = haversine_many(lat, lon, lats, lons)
+    inside = exact <= radius_km
+    projected = local_projection_many(lat, lon, lats[inside], lons[inside])
+
+    assert np.abs(projected - exact[inside]).max() * 1000 <= bound_m
+
+    # Radius queries only disagree within the bound of the radius
+    indices, distances = distances_within(lat, lon, lats, lons, radius_km, "local_projection")
+
+    assert np.abs(distances - exact[indices]).max() * 1000 <= bound_m
+    assert exact[indices].max() <= radius_km + bound_m / 1000
+
+
+@pytest.mark.parametrize(
+    "lat, radius_km, expected",
+    [
+        (AUTO_PROJECTION_MAX_ABS_LAT, 1.5, "local_projection"),
+        (-AUTO_PROJECTION_MAX_ABS_LAT, 1.5, "local_projection"),
+        (AUTO_PROJECTION_MAX_ABS_LAT + 1e-9, 1.5, "haversine"),
+        (-89.0, 1.5, "haversine"),
+        (45.0, AUTO_PROJECTION_MAX_RADIUS_KM, "local_projection"),
+        (45.0, AUTO_PROJECTION_MAX_RADIUS_KM + 1e-9, "haversine"),
+    ],
+)
+def test_auto_switch_over(lat, radius_km, expected):
+    assert resolve_distance_mode("auto", lat, radius_km) == expected
+
+    rng = np.random.default_rng(3)
+    lats, lons = _disc(lat, 10.0, radius_km, rng)
+
+    auto = distances_within(lat, 10.0, lats, lons, radius_km, "auto")
+    explicit = distances_within(lat, 10.0, lats, lons, radius_km, expected)
+
+    assert np.array_equal(auto[0], explicit[0])
+    assert np.array_equal(auto[1], explicit[1])
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        resolve_distance_mode("planar", 0.0, 1.0)
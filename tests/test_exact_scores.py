@@ -0,0 +1,210 @@
+"""
+test_exact_scores.py
+
+The haversine radius queries against the scalar reference: distances
+must be bit-for-bit haversine(), and rounded competition / anchor
+scores must equal the plain one-point-at-a-time loop, including scores
+that sit on a 3rd-decimal rounding boundary and points on the radius.
+"""
+
+import numpy as np
+import pytest
+
+from app.metrics.anchors import ANCHOR_RADIUS_KM, anchor_influence_score, pack_anchors
+from app.metrics.competition import COMPETITION_RADIUS_KM, effective_competition
+from app.metrics.geodesic import (
+    KM_PER_DEGREE,
+    distance_matrix_within,
+    distances_within,
+    haversine,
+)
+from app.metrics.reference import anchor_influence_reference, competition_reference
+from app.metrics.spatial_index import GridIndex
+
+TARGET = {"lat": 24.8607, "lon": 67.0011}
+
+ANCHOR_TYPE_NAMES = ("hospital", "office", "university", "school", "recreation", "tourism", "mall")
+
+
+def _scatter(count, spread_km, seed):
+    """
+    Random points around TARGET, as {"lat", "lon"} dicts.
+    """
+    rng = np.random.default_rng(seed)
+    degrees = spread_km / KM_PER_DEGREE
+
+    lats = TARGET["lat"] + rng.uniform(-degrees, degrees, count)
+    lons = TARGET["lon"] + rng.uniform(-degrees, degrees, count)
+
+    return [{"lat": lat, "lon": lon} for lat, lon in zip(lats.tolist(), lons.tolist())]
+
+
+def _unrounded_competition(target, competitors, radius_km=COMPETITION_RADIUS_KM):
+    score = 0.0
+
+    for competitor in competitors:
+        distance = haversine(target["lat"], target["lon"], competitor["lat"], competitor["lon"])
+
+        if distance <= radius_km:
+            score += 1 / (distance + 0.1)
+
+    return score
+
+
+def _straddle(predicate, near, far):
+    """
+    Adjacent float64 latitudes (inside, outside) where predicate flips,
+    found by bisection between a latitude where it holds and one where
+    it does not.
+    """
+    assert predicate(near) and not predicate(far)
+
+    while True:
+        middle = near + (far - near) / 2
+
+        if middle in (near, far):
+            return near, far
+
+        if predicate(middle):
+            near = middle
+        else:
+            far = middle
+
+
+def _north(distance_km):
+    return TARGET["lat"] + distance_km / KM_PER_DEGREE
+
+
+def test_distances_within_is_scalar_haversine():
+    points = _scatter(20_000, 3.0, seed=1)
+    lats = np.array([p["lat"] for p in points])
+    lons = np.array([p["lon"] for p in points])
+
+    indices, distances = distances_within(TARGET["lat"], TARGET["lon"], lats, lons, COMPETITION_RADIUS_KM)
+
+    expected = [
+        (i, d)
+        for i, d in enumerate(
+            haversine(TARGET["lat"], TARGET["lon"], p["lat"], p["lon"]) for p in points
+        )
+        if d <= COMPETITION_RADIUS_KM
+    ]
+
+    assert indices.tolist() == [i for i, _ in expected]
+    assert distances.tolist() == [d for _, d in expected]
+
+
+def test_distance_matrix_within_is_scalar_haversine():
+    points = _scatter(3_000, 3.0, seed=2)
+    targets = _scatter(40, 1.0, seed=3)
+
+    lats = np.array([p["lat"] for p in points])
+    lons = np.array([p["lon"] for p in points])
+
+    rows, cols, distances = distance_matrix_within(
+        np.array([t["lat"] for t in targets]),
+        np.array([t["lon"] for t in targets]),
+        lats,
+        lons,
+        COMPETITION_RADIUS_KM,
+    )
+
+    expected = [
+        (row, col, d)
+        for row, target in enumerate(targets)
+        for col, point in enumerate(points)
+        for d in (haversine(target["lat"], target["lon"], point["lat"], point["lon"]),)
+        if d <= COMPETITION_RADIUS_KM
+    ]
+
+    assert list(zip(rows.tolist(), cols.tolist(), distances.tolist())) == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_scores_match_reference_loop(seed):
+    competitors = _scatter(4_000, 2.5, seed=seed)
+    anchors = [
+        {**point, "type": ANCHOR_TYPE_NAMES[i % len(ANCHOR_TYPE_NAMES)]}
+        for i, point in enumerate(_scatter(600, 2.0, seed=seed + 100))
+    ]
+    packed = pack_anchors(anchors)
+
+    competitor_index = GridIndex(
+        np.array([p["lat"] for p in competitors]),
+        np.array([p["lon"] for p in competitors]),
+    )
+
+    for target in _scatter(25, 0.5, seed=seed + 200):
+        expected = competition_reference(target, competitors)
+        assert effective_competition(target, competitors) == expected
+        assert effective_competition(target, competitors, index=competitor_index) == expected
+
+        expected = anchor_influence_reference(target, anchors)
+        assert anchor_influence_score(target, anchors) == expected
+        assert anchor_influence_score(target, packed) == expected
+
+
+@pytest.mark.parametrize("boundary", [2.0005, 3.1415, 7.0005])
+def test_rounding_boundary_scores_match_reference_loop(boundary):
+    # One competitor whose term 1 / (d + 0.1) straddles x.xxx5: the two
+    # adjacent latitudes round to different scores in the scalar loop
+    def above(lat):
+        return _unrounded_competition(TARGET, [{"lat": lat, "lon": TARGET["lon"]}]) >= boundary
+
+    inside, outside = _straddle(above, _north(1 / boundary - 0.1 - 1e-3), _north(1 / boundary - 0.1 + 1e-3))
+
+    for lat in (inside, outside):
+        competitors = [{"lat": lat, "lon": TARGET["lon"]}]
+        assert effective_competition(TARGET, competitors) == competition_reference(TARGET, competitors)
+
+    # The same boundary reached as a sum over many competitors: the last
+    # competitor is nudged until the running total straddles x.xxx5
+    crowd = _scatter(200, 1.5, seed=7)
+    base = _unrounded_competition(TARGET, crowd)
+    shift = int(base) + 1 + boundary % 1
+    term = shift - base
+
+    if term < 0.6:
+        # Keep the last competitor well inside the radius
+        shift += 1
+        term += 1
+
+    def total_above(lat):
+        return _unrounded_competition(TARGET, crowd + [{"lat": lat, "lon": TARGET["lon"]}]) >= shift
+
+    inside, outside = _straddle(total_above, _north(1 / term - 0.1 - 1e-3), _north(1 / term - 0.1 + 1e-3))
+
+    assert round(_unrounded_competition(TARGET, crowd + [{"lat": inside, "lon": TARGET["lon"]}]), 3) != round(
+        _unrounded_competition(TARGET, crowd + [{"lat": outside, "lon": TARGET["lon"]}]), 3
+    )
+
+    for lat in (inside, outside):
+        competitors = crowd + [{"lat": lat, "lon": TARGET["lon"]}]
+        assert effective_competition(TARGET, competitors) == competition_reference(TARGET, competitors)
+
+
+@pytest.mark.parametrize("radius_km", [COMPETITION_RADIUS_KM, ANCHOR_RADIUS_KM])
+def test_points_on_the_radius_match_reference_loop(radius_km):
+    def within(lat):
+        return haversine(TARGET["lat"], TARGET["lon"], lat, TARGET["lon"]) <= radius_km
+
+    inside, outside = _straddle(within, _north(radius_km - 1e-3), _north(radius_km + 1e-3))
+
+    competitors = [{"lat": inside, "lon": TARGET["lon"]}, {"lat": outside, "lon": TARGET["lon"]}]
+    anchors = [{**point, "type": "hospital"} for point in competitors]
+
+    indices, _ = distances_within(
+        TARGET["lat"],
+        TARGET["lon"],
+        np.array([inside, outside]),
+        np.array([TARGET["lon"]] * 2),
+        radius_km,
+    )
+    assert indices.tolist() == [0]
+
+    assert effective_competition(TARGET, competitors, radius_km) == competition_reference(
+        TARGET, competitors, radius_km
+    )
+    assert anchor_influence_score(TARGET, anchors, radius_km) == anchor_influence_reference(
+        TARGET, anchors, radius_km
+    )
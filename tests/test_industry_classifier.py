@@ -0,0 +1,72 @@
+"""
+test_industry_classifier.py
+
+The compiled tag index (classify_business) must agree with the
+registry walk (classify_business_reference) on every input.
+"""
+
+import json
+import random
+
+import pytest
+
+from app.intelligence.industry_classifier import (
+    INDEXED_TAG_KEYS,
+    classify_business,
+    classify_business_json,
+    classify_business_reference,
+)
+from app.intelligence.industry_registry import INDUSTRY_REGISTRY
+
+# Every (tag_key, tag_value) pair the registry knows, in registry order
+REGISTRY_TAGS = [
+    (tag_key, tag_value)
+    for tag_groups in INDUSTRY_REGISTRY.values()
+    for tag_key, value_map in tag_groups.items()
+    for tag_value in value_map
+]
+
+# Keys real OSM objects carry that never decide the classification
+NOISE_KEYS = ("name", "opening_hours", "addr:street", "brand")
+
+RANDOM_CASES = 5_000
+
+
+def _assert_agrees(tags):
+    expected = classify_business_reference(tags)
+
+    assert classify_business(tags) == expected
+    assert json.loads(classify_business_json(tags)) == expected
+
+
+@pytest.mark.parametrize("tag_key, tag_value", REGISTRY_TAGS)
+def test_every_registry_tag(tag_key, tag_value):
+    _assert_agrees({tag_key: tag_value})
+
+
+def test_empty_and_unknown_tags():
+    for tags in ({}, None, {"name": "Corner Shop"}, {"amenity": "no_such_value"}):
+        _assert_agrees(tags)
+
+
+def test_randomized_tag_dicts():
+    rng = random.Random(5)
+    values_by_key = {}
+
+    for tag_key, tag_value in REGISTRY_TAGS:
+        values_by_key.setdefault(tag_key, []).append(tag_value)
+
+    for _ in range(RANDOM_CASES):
+        tags = {}
+
+        # Several registry keys at once, so precedence decides the winner
+        for tag_key in rng.sample(INDEXED_TAG_KEYS, rng.randint(1, min(4, len(INDEXED_TAG_KEYS)))):
+            if rng.random() < 0.8:
+                tags[tag_key] = rng.choice(values_by_key[tag_key])
+            else:
+                tags[tag_key] = f"unknown_{rng.randint(0, 9)}"
+
+        for noise_key in rng.sample(NOISE_KEYS, rng.randint(0, 2)):
+            tags[noise_key] = rng.choice(REGISTRY_TAGS)[1]
+
+        _assert_agrees(tags)
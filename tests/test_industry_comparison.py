@@ -0,0 +1,123 @@
+"""
+test_industry_comparison.py
+
+phase3_analyze_all_industries must give, for every industry, exactly
+what phase3_analyze gives over that industry's competitors, and refuse
+malformed tagging with a ValueError (HTTP 400).
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.intelligence.industry_classifier import classify_business
+from app.main import app
+from app.metrics.industry_comparison import (
+    COMPARED_INDUSTRIES,
+    competitor_industries,
+    phase3_analyze_all_industries,
+)
+from app.metrics.phase3_engine import phase3_analyze
+from app.synthetic_city import uniform_points
+
+
+@pytest.fixture(scope="module")
+def targets(city):
+    return uniform_points(8, random.Random(21), city["center"], radius_km=5.0)
+
+
+@pytest.fixture(scope="module")
+def competitors(city):
+    """
+    The city's competitors, tagged every accepted way: raw tags, classifier
+    labels and plain industry keys (plus some that match no industry).
+    """
+    tagged = []
+
+    for i, point in enumerate(city["competitors"]):
+        location = {"lat": point["lat"], "lon": point["lon"]}
+
+        if i % 3 == 0:
+            tagged.append({**location, "tags": point["tags"]})
+        elif i % 3 == 1:
+            tagged.append({**location, **classify_business(point["tags"])})
+        else:
+            tagged.append({**location, "industry": COMPARED_INDUSTRIES[i % len(COMPARED_INDUSTRIES)]})
+
+    tagged.append({"lat": city["center"]["lat"], "lon": city["center"]["lon"], "industry": "bakery"})
+    tagged.append({"lat": city["center"]["lat"], "lon": city["center"]["lon"], "tags": None})
+
+    return tagged
+
+
+def test_payload_matches_per_industry_phase3_analyze(city, competitors, targets):
+    for target in targets:
+        results = phase3_analyze_all_industries({
+            "target": target,
+            "competitors": competitors,
+            "anchors": city["anchors"],
+        })
+
+        assert list(results) == list(COMPARED_INDUSTRIES)
+
+        for industry, result in results.items():
+            assert result == phase3_analyze({
+                "target": target,
+                "industry": industry,
+                "competitors": [p for p in competitors if industry in competitor_industries(p)],
+                "anchors": city["anchors"],
+            })
+
+
+def test_region_matches_per_industry_phase3_analyze(city_region, region_points, targets):
+    for target in targets:
+        results = phase3_analyze_all_industries({"target": target, "region": city_region})
+
+        for industry, result in results.items():
+            competitors, anchors = region_points(industry)
+
+            assert result == phase3_analyze({"target": target, "industry": industry, "region": city_region})
+            assert result == phase3_analyze({
+                "target": target,
+                "industry": industry,
+                "competitors": competitors,
+                "anchors": anchors,
+            })
+
+
+def test_grocery_store_counts_towards_both_keys():
+    labels = {"industry": "Retail", "sub_industry": "Grocery Store"}
+
+    assert competitor_industries(labels) == ("retail", "grocery")
+
+
+@pytest.mark.parametrize(
+    "point",
+    [
+        "cafe",
+        {"lat": 0, "lon": 0, "tags": ["amenity", "cafe"]},
+        {"lat": 0, "lon": 0, "tags": {"amenity": ["cafe"]}},
+        {"lat": 0, "lon": 0, "tags": {"amenity": {"name": "cafe"}}},
+        {"lat": 0, "lon": 0, "industry": 3},
+        {"lat": 0, "lon": 0, "industry": "Retail", "sub_industry": ["Florist"]},
+    ],
+)
+def test_malformed_tagging_is_rejected(point):
+    payload = {"target": {"lat": 0, "lon": 0}, "competitors": [point]}
+
+    with pytest.raises(ValueError):
+        phase3_analyze_all_industries(payload)
+
+    response = TestClient(app).post("/phase3/competition/industries", json=payload)
+
+    assert response.status_code == 400
+
+
+def test_endpoint_serves_every_industry(city, competitors):
+    payload = {"target": city["center"], "competitors": competitors[:300], "anchors": city["anchors"][:50]}
+
+    response = TestClient(app).post("/phase3/competition/industries", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"industries": phase3_analyze_all_industries(payload)}
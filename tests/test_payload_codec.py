@@ -0,0 +1,188 @@
+"""
+test_payload_codec.py
+
+Every wire format must decode to the same ingested payload, so
+/phase3/competition answers the same whichever format the client sent.
+"""
+
+import json
+import sys
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import payload_codec
+from app.main import app
+from app.metrics.phase3_engine import ingest_phase3_payload, phase3_analyze
+from app.payload_codec import (
+    POINTS_MEDIA_TYPE,
+    UnsupportedPayload,
+    decode_json,
+    decode_phase3_body,
+    decode_points_binary,
+    encode_json,
+    encode_points_binary,
+)
+
+
+@pytest.fixture(scope="module")
+def payload(city):
+    return {
+        "target": city["center"],
+        "industry": "cafe",
+        "breakdown": {"top_k": 3},
+        "competitors": [{"lat": p["lat"], "lon": p["lon"]} for p in city["competitors"][:400]],
+        "anchors": city["anchors"][:150],
+    }
+
+
+def _assert_same_points(decoded, expected):
+    for field in ("competitors", "anchors"):
+        assert np.array_equal(decoded[field].lats, expected[field].lats)
+        assert np.array_equal(decoded[field].lons, expected[field].lons)
+
+    assert np.array_equal(decoded["anchors"].type_codes, expected["anchors"].type_codes)
+
+
+def test_binary_round_trip(payload):
+    decoded = decode_points_binary(encode_points_binary(payload))
+
+    _assert_same_points(decoded, ingest_phase3_payload(payload))
+    assert {key: decoded[key] for key in ("target", "industry", "breakdown")} == {
+        key: payload[key] for key in ("target", "industry", "breakdown")
+    }
+    assert phase3_analyze(decoded) == phase3_analyze(payload)
+
+
+def test_float32_blocks_are_about_a_meter_close(payload):
+    decoded = decode_points_binary(encode_points_binary(payload, dtype="float32"))
+    expected = ingest_phase3_payload(payload)
+
+    assert decoded["competitors"].lats.dtype == np.float64
+    assert np.abs(decoded["competitors"].lats - expected["competitors"].lats).max() < 1e-5
+
+
+def test_binary_remaps_sender_anchor_types(payload):
+    body = bytearray(encode_points_binary(payload))
+    header_length = int.from_bytes(body[4:8], "little")
+    header = json.loads(body[8:8 + header_length])
+
+    # A sender with its type table reversed sends reversed codes
+    sender_types = header["anchor_types"][::-1]
+    codes = ingest_phase3_payload(payload)["anchors"].type_codes
+    header["anchor_types"] = sender_types
+    new_header = json.dumps(header).encode()
+    assert len(new_header) == header_length
+
+    body[8:8 + header_length] = new_header
+    body[-len(codes):] = (len(sender_types) - 1 - codes).astype(np.int8).tobytes()
+
+    _assert_same_points(decode_points_binary(bytes(body)), ingest_phase3_payload(payload))
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"",
+        b"LCP2\x00\x00\x00\x00",
+        b"LCP1\xff\x00\x00\x00{}",
+        b'LCP1\x02\x00\x00\x00[]',
+        b'LCP1\x39\x00\x00\x00{"blocks": [{"field": "competitors", "count": 4}]}   ',
+    ],
+)
+def test_malformed_binary_is_rejected(body):
+    with pytest.raises(ValueError):
+        decode_points_binary(body)
+
+
+def test_truncated_and_trailing_bytes_are_rejected(payload):
+    body = encode_points_binary(payload)
+
+    with pytest.raises(ValueError, match="truncated"):
+        decode_points_binary(body[:-1])
+
+    with pytest.raises(ValueError, match="trailing"):
+        decode_points_binary(body + b"\x00")
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/json; charset=utf-8", ""])
+def test_json_objects_and_columns_decode_the_same(payload, content_type):
+    columns = {
+        **payload,
+        "competitors": {
+            "lat": [p["lat"] for p in payload["competitors"]],
+            "lon": [p["lon"] for p in payload["competitors"]],
+        },
+        "anchors": {
+            "lat": [a["lat"] for a in payload["anchors"]],
+            "lon": [a["lon"] for a in payload["anchors"]],
+            "type": [a["type"] for a in payload["anchors"]],
+        },
+    }
+    expected = ingest_phase3_payload(payload)
+
+    for body in (json.dumps(payload).encode(), json.dumps(columns).encode()):
+        _assert_same_points(decode_phase3_body(body, content_type), expected)
+
+
+def test_msgpack_round_trip(payload):
+    msgpack = pytest.importorskip("msgpack")
+
+    decoded = decode_phase3_body(msgpack.packb(payload), "application/msgpack")
+
+    _assert_same_points(decoded, ingest_phase3_payload(payload))
+
+
+def test_msgpack_without_the_package_is_unsupported(monkeypatch):
+    monkeypatch.setitem(sys.modules, "msgpack", None)
+
+    with pytest.raises(UnsupportedPayload):
+        decode_phase3_body(b"\x80", "application/msgpack")
+
+
+@pytest.mark.parametrize(
+    "body, content_type, error",
+    [
+        (b"{", "application/json", ValueError),
+        (b"[]", "application/json", ValueError),
+        (b'{"competitors": [{"lat": 1}]}', "application/json", ValueError),
+        (b"lat,lon", "text/csv", UnsupportedPayload),
+    ],
+)
+def test_bad_bodies_are_rejected(body, content_type, error):
+    with pytest.raises(error):
+        decode_phase3_body(body, content_type)
+
+
+@pytest.mark.parametrize("fast", [True, False], ids=["orjson", "stdlib"])
+def test_encode_json_handles_numpy(monkeypatch, fast):
+    if fast:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(payload_codec, "orjson", None)
+
+    value = {"score": np.float64(1.5), "count": np.int64(3), "cells": np.arange(3), "label": "low"}
+
+    assert decode_json(encode_json(value)) == {"score": 1.5, "count": 3, "cells": [0, 1, 2], "label": "low"}
+
+    with pytest.raises(TypeError):
+        encode_json({"value": object()})
+
+
+def test_endpoint_answers_the_same_for_every_format(payload):
+    client = TestClient(app)
+    expected = phase3_analyze(payload)
+
+    as_json = client.post("/phase3/competition", json=payload)
+    as_binary = client.post(
+        "/phase3/competition",
+        content=encode_points_binary(payload),
+        headers={"Content-Type": POINTS_MEDIA_TYPE},
+    )
+
+    assert as_json.status_code == as_binary.status_code == 200
+    assert as_json.json() == as_binary.json() == json.loads(encode_json(expected))
+
+    assert client.post("/phase3/competition", content=b"{", headers={"Content-Type": "application/json"}).status_code == 400
+    assert client.post("/phase3/competition", content=b"x", headers={"Content-Type": "text/csv"}).status_code == 415
@@ -0,0 +1,74 @@
+"""
+test_phase3_batch.py
+
+Batch Phase 3 (many targets, one POI set) must give every target
+exactly the output phase3_analyze gives it alone, however the targets
+are split into distance blocks, and /phase3/competition/batch must
+serve the same results.
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics.phase3_engine import phase3_analyze, phase3_analyze_many
+from app.synthetic_city import uniform_points
+
+TARGETS = 60
+
+
+@pytest.fixture(scope="module")
+def payload(city):
+    targets = uniform_points(TARGETS, random.Random(4), city["center"], radius_km=6.0)
+
+    # One target right on top of a competitor (distance 0)
+    targets.append(dict(city["competitors"][0]))
+
+    return {
+        "targets": targets,
+        "industry": "cafe",
+        "competitors": [{"lat": p["lat"], "lon": p["lon"]} for p in city["competitors"]],
+        "anchors": city["anchors"],
+    }
+
+
+def _single(payload, target):
+    single = {key: value for key, value in payload.items() if key not in ("targets", "chunk_size")}
+
+    return phase3_analyze({**single, "target": target})
+
+
+@pytest.mark.parametrize("chunk_size", [None, 5_000, 1])
+def test_batch_matches_single_target_analysis(payload, chunk_size):
+    batch = dict(payload)
+    if chunk_size is not None:
+        batch["chunk_size"] = chunk_size
+
+    results = phase3_analyze_many(batch)
+
+    assert results == [_single(payload, target) for target in payload["targets"]]
+
+
+def test_batch_endpoint(payload):
+    small = {
+        **payload,
+        "targets": payload["targets"][:5],
+        "competitors": payload["competitors"][:200],
+        "anchors": payload["anchors"][:20],
+    }
+
+    response = TestClient(app).post("/phase3/competition/batch", json=small)
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [_single(small, target) for target in small["targets"]]
+
+
+def test_batch_endpoint_rejects_bad_chunk_size(payload):
+    response = TestClient(app).post(
+        "/phase3/competition/batch",
+        json={**payload, "targets": payload["targets"][:2], "chunk_size": 0},
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+"""
+test_points.py
+
+PointSet must hold exactly what the point dicts held, whichever way it
+was built, and every Phase 3 function must give the same output for a
+packed payload as for the dict payload.
+"""
+
+import numpy as np
+import pytest
+
+from app.metrics.anchors import ANCHOR_TYPES, pack_anchors
+from app.metrics.phase3_engine import ingest_phase3_payload, phase3_analyze, phase3_analyze_many
+from app.metrics.points import PointSet
+
+
+@pytest.fixture(scope="module")
+def points(city):
+    competitors = [{"lat": p["lat"], "lon": p["lon"]} for p in city["competitors"]]
+    anchors = [dict(anchor) for anchor in city["anchors"]]
+
+    # Untyped and unknown types weigh "default"
+    anchors[0] = {"lat": anchors[0]["lat"], "lon": anchors[0]["lon"]}
+    anchors[1] = {**anchors[1], "type": "stadium"}
+
+    return competitors, anchors
+
+
+def _columns(points, with_types=False):
+    columns = {"lat": [p["lat"] for p in points], "lon": [p["lon"] for p in points]}
+
+    if with_types:
+        columns["type"] = [p.get("type") for p in points]
+
+    return columns
+
+
+def test_dicts_and_columns_pack_the_same(points):
+    competitors, anchors = points
+
+    for packed in (PointSet.from_dicts(competitors), PointSet.from_columns(_columns(competitors))):
+        assert packed.lats.dtype == np.float64
+        assert list(packed) == competitors
+
+    from_dicts = pack_anchors(anchors)
+    from_columns = pack_anchors(_columns(anchors, with_types=True))
+
+    assert np.array_equal(from_dicts.type_codes, from_columns.type_codes)
+    assert from_dicts.types() == [
+        anchor.get("type") if anchor.get("type") in ANCHOR_TYPES else "default"
+        for anchor in anchors
+    ]
+    assert from_dicts.nbytes == 17 * len(anchors)
+
+
+def test_point_set_is_returned_as_is(points):
+    packed = PointSet.from_dicts(points[0])
+
+    assert PointSet.parse(packed) is packed
+
+
+@pytest.mark.parametrize(
+    "bad",
+    [
+        [{"lat": 1.0}],
+        [{"lat": "north", "lon": 1.0}],
+        {"lat": [1.0, 2.0]},
+        {"lat": [1.0, 2.0], "lon": [1.0]},
+        {"lat": [1.0], "lon": ["east"]},
+    ],
+)
+def test_malformed_points_are_rejected(bad):
+    with pytest.raises(ValueError):
+        PointSet.parse(bad)
+
+
+def test_type_codes_are_checked():
+    with pytest.raises(ValueError):
+        PointSet([0.0], [0.0], [len(ANCHOR_TYPES)], ANCHOR_TYPES)
+
+    with pytest.raises(ValueError):
+        pack_anchors({"lat": [0.0, 1.0], "lon": [0.0, 1.0], "type": ["school"]})
+
+
+def test_packed_payload_scores_the_same(city, points):
+    competitors, anchors = points
+    targets = [city["center"], *city["competitors"][:20]]
+    options = {"industry": "retail", "breakdown": True}
+
+    dict_payload = {**options, "competitors": competitors, "anchors": anchors}
+    column_payload = {
+        **options,
+        "competitors": _columns(competitors),
+        "anchors": _columns(anchors, with_types=True),
+    }
+
+    for payload in (ingest_phase3_payload(dict_payload), ingest_phase3_payload(column_payload)):
+        assert isinstance(payload["competitors"], PointSet)
+
+        for target in targets:
+            target = {"lat": target["lat"], "lon": target["lon"]}
+            assert phase3_analyze({**payload, "target": target}) == phase3_analyze({**dict_payload, "target": target})
+
+    batch = {**dict_payload, "targets": targets}
+    assert phase3_analyze_many(ingest_phase3_payload(batch)) == phase3_analyze_many(batch)
@@ -0,0 +1,114 @@
+"""
+test_raster.py
+
+Raster mode must score every cell center as phase3_analyze does, and
+/phase3/raster must validate its inputs (400 / 404, never 500).
+"""
+
+import io
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics.phase3_engine import DENSITY_LABELS, phase3_analyze
+from app.metrics.raster import phase3_raster, raster_to_npz
+
+
+@pytest.fixture(scope="module")
+def payload(city):
+    center = city["center"]
+
+    return {
+        "bbox": {
+            "min_lat": center["lat"] - 0.03,
+            "min_lon": center["lon"] - 0.03,
+            "max_lat": center["lat"] + 0.03,
+            "max_lon": center["lon"] + 0.03,
+        },
+        "cell_size_m": 250,
+        "industry": "cafe",
+        "competitors": [{"lat": p["lat"], "lon": p["lon"]} for p in city["competitors"]],
+        "anchors": city["anchors"],
+    }
+
+
+def test_cells_match_phase3_analyze(payload):
+    raster = phase3_raster(payload)
+    rows, cols = raster["shape"]
+
+    assert raster["raw_competition_score"].dtype == np.float64
+    assert raster["raw_competition_score"].max() > 0
+
+    for row in range(rows):
+        for col in range(cols):
+            center = {
+                "lat": raster["bbox"]["min_lat"] + (row + 0.5) * raster["lat_step"],
+                "lon": raster["bbox"]["min_lon"] + (col + 0.5) * raster["lon_step"],
+            }
+            expected = phase3_analyze({
+                "target": center,
+                "industry": payload["industry"],
+                "competitors": payload["competitors"],
+                "anchors": payload["anchors"],
+            })
+
+            raw = raster["raw_competition_score"][row, col]
+
+            # Summation order may move the last bit, so at most one unit
+            # of the 3rd decimal
+            assert abs(raw - expected["raw_competition_score"]) <= 0.001 + 1e-9
+
+            if raw == expected["raw_competition_score"]:
+                assert raster["normalized_competition_score"][row, col] == expected["normalized_competition_score"]
+                assert DENSITY_LABELS[raster["density_label"][row, col]] == expected["density_label"]
+
+
+def test_npz_round_trip(payload):
+    raster = phase3_raster(payload)
+    archive = np.load(io.BytesIO(raster_to_npz(raster)))
+
+    for name in ("raw_competition_score", "normalized_competition_score", "density_label"):
+        assert np.array_equal(archive[name], raster[name])
+
+    metadata = json.loads(str(archive["metadata"]))
+    assert metadata["shape"] == list(raster["shape"])
+
+
+def test_endpoint_serves_the_raster(payload):
+    small = {**payload, "competitors": payload["competitors"][:100], "anchors": payload["anchors"][:10]}
+
+    response = TestClient(app).post("/phase3/raster", json=small)
+
+    assert response.status_code == 200
+
+    archive = np.load(io.BytesIO(response.content))
+    assert np.array_equal(archive["raw_competition_score"], phase3_raster(small)["raw_competition_score"])
+    assert response.headers["X-Raster-Shape"] == ",".join(map(str, archive["raw_competition_score"].shape))
+
+
+@pytest.mark.parametrize(
+    "change, status",
+    [
+        ({"cell_size_m": "100"}, 400),
+        ({"cell_size_m": -5}, 400),
+        ({"bbox": None}, 400),
+        ({"bbox": {"min_lat": 1, "min_lon": 1, "max_lat": 0, "max_lon": 2}}, 400),
+        ({"region": "no_such_region"}, 404),
+    ],
+)
+def test_endpoint_rejects_bad_input(payload, change, status):
+    response = TestClient(app).post("/phase3/raster", json={**payload, **change})
+
+    assert response.status_code == status
+
+
+def test_known_region_is_rejected(payload, city_region):
+    with pytest.raises(ValueError):
+        phase3_raster({**payload, "region": city_region})
+
+    response = TestClient(app).post("/phase3/raster", json={"bbox": payload["bbox"], "region": city_region})
+
+    assert response.status_code == 400
@@ -0,0 +1,71 @@
+"""
+test_region_payload.py
+
+Region payloads (points read from a POI store) must produce exactly
+what phase3_analyze gives for the same points listed in the payload,
+breakdowns included (minus the payload-only "index").
+"""
+
+import random
+
+import pytest
+
+from app.metrics.phase3_engine import phase3_analyze
+from app.metrics.reference import phase3_analyze_reference
+from app.synthetic_city import uniform_points
+
+INDUSTRIES = ("cafe", "restaurant", "retail", "pharmacy", "default")
+
+
+@pytest.fixture(scope="module")
+def targets(city):
+    return uniform_points(15, random.Random(8), city["center"], radius_km=5.0)
+
+
+def _without_index(breakdown):
+    for signal in breakdown.values():
+        for entry in signal["nearest"]:
+            del entry["index"]
+
+    return breakdown
+
+
+@pytest.mark.parametrize("industry", INDUSTRIES)
+def test_region_matches_payload(city_region, region_points, targets, industry):
+    competitors, anchors = region_points(industry)
+
+    for target in targets:
+        region = phase3_analyze({"target": target, "industry": industry, "region": city_region})
+        listed = phase3_analyze({"target": target, "industry": industry, "competitors": competitors, "anchors": anchors})
+
+        assert region == listed
+        assert region == phase3_analyze_reference({"target": target, "industry": industry, "region": city_region})
+
+
+@pytest.mark.parametrize("industry", ("cafe", "retail"))
+def test_region_breakdown_matches_payload(city_region, region_points, targets, industry):
+    competitors, anchors = region_points(industry)
+    options = {"top_k": 8, "bands_km": [0.25, 0.5, 1.0, 1.5, 2.0]}
+
+    for target in targets:
+        region = phase3_analyze({
+            "target": target,
+            "industry": industry,
+            "region": city_region,
+            "breakdown": options,
+        })
+        listed = phase3_analyze({
+            "target": target,
+            "industry": industry,
+            "competitors": competitors,
+            "anchors": anchors,
+            "breakdown": options,
+        })
+
+        assert region["breakdown"] == _without_index(listed["breakdown"])
+        assert all("type" in entry for entry in region["breakdown"]["anchors"]["nearest"])
+
+
+def test_unknown_region_is_not_found():
+    with pytest.raises(FileNotFoundError):
+        phase3_analyze({"target": {"lat": 0, "lon": 0}, "region": "no_such_region"})
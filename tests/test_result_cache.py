@@ -0,0 +1,155 @@
+"""
+test_result_cache.py
+
+Result cache keys (geohash snapping, options, POI content) and the
+LRU / TTL behavior of both backends.
+"""
+
+import pytest
+
+from app.metrics import geohash, poi_store
+from app.metrics.anchors import pack_anchors
+from app.metrics.phase3_engine import phase3_analyze
+from app.metrics.points import PointSet
+from app.metrics.poi_store import build_poi_store
+from app.metrics.result_cache import (
+    DEFAULT_GEOHASH_PRECISION,
+    DiskCacheBackend,
+    MemoryCacheBackend,
+    ResultCache,
+    poi_fingerprint,
+)
+
+TARGET = {"lat": 24.8607, "lon": 67.0011}
+
+COMPETITORS = [{"lat": 24.861, "lon": 67.002}, {"lat": 24.859, "lon": 67.004}]
+ANCHORS = [{"lat": 24.862, "lon": 67.0, "type": "hospital"}]
+
+
+def _payload(**changes):
+    return {"target": TARGET, "industry": "cafe", "competitors": COMPETITORS, "anchors": ANCHORS, **changes}
+
+
+def _jittered(meters):
+    # ~1 m of latitude is 9e-6 degrees
+    return {"lat": TARGET["lat"] + meters * 9e-6, "lon": TARGET["lon"]}
+
+
+def test_default_precision_snaps_gps_jitter():
+    cache = ResultCache(MemoryCacheBackend())
+
+    assert cache.precision == DEFAULT_GEOHASH_PRECISION == 8
+
+    # A target a few meters away in the same geohash cell shares the key
+    near = next(
+        target
+        for target in (_jittered(m) for m in (1, -1, 2, -2, 3, -3))
+        if geohash.encode(target["lat"], target["lon"], 8) == geohash.encode(TARGET["lat"], TARGET["lon"], 8)
+    )
+    assert cache.key_for(_payload(target=near)) == cache.key_for(_payload())
+
+    # ... and one a few cells away does not
+    assert cache.key_for(_payload(target=_jittered(200))) != cache.key_for(_payload())
+
+
+def test_precision_zero_keys_exact_coordinates():
+    cache = ResultCache(MemoryCacheBackend(), precision=0)
+
+    assert cache.key_for(_payload(target=_jittered(0.5))) != cache.key_for(_payload())
+    assert cache.key_for(_payload(target=dict(TARGET))) == cache.key_for(_payload())
+
+
+def test_key_covers_options_and_poi_content():
+    cache = ResultCache(MemoryCacheBackend())
+    key = cache.key_for(_payload())
+
+    assert cache.key_for(_payload(industry="pharmacy")) != key
+    assert cache.key_for(_payload(breakdown=True)) != key
+    assert cache.key_for(_payload(competitors=COMPETITORS[:1])) != key
+    assert cache.key_for(_payload(competitors=COMPETITORS[::-1])) != key
+    assert cache.key_for(_payload(anchors=[{**ANCHORS[0], "type": "office"}])) != key
+
+
+def test_packed_points_share_the_fingerprint():
+    packed = _payload(
+        competitors=PointSet.from_dicts(COMPETITORS),
+        anchors=pack_anchors(ANCHORS),
+    )
+
+    assert poi_fingerprint(packed) == poi_fingerprint(_payload())
+
+
+def test_store_rebuild_changes_region_fingerprint(city_region):
+    path = f"{poi_store.POI_STORE_ROOT}/cache_test"
+    records = [{"lat": 24.86, "lon": 67.0, "industry": "Food & Beverage", "sub_industry": "Cafe"}]
+
+    build_poi_store(records, path)
+    before = poi_fingerprint({"target": TARGET, "region": "cache_test"})
+
+    build_poi_store(records * 2, path)
+    after = poi_fingerprint({"target": TARGET, "region": "cache_test"})
+
+    assert before != after
+
+
+def _backends(tmp_path, **settings):
+    return [
+        MemoryCacheBackend(**settings),
+        DiskCacheBackend(str(tmp_path / "cache.sqlite3"), **settings),
+    ]
+
+
+@pytest.mark.parametrize("kind", [0, 1], ids=["memory", "disk"])
+def test_get_or_compute_hits_and_misses(tmp_path, kind):
+    cache = ResultCache(_backends(tmp_path)[kind])
+    calls = []
+
+    def compute(payload):
+        calls.append(payload)
+        return phase3_analyze(payload)
+
+    first = cache.get_or_compute(_payload(), compute)
+    second = cache.get_or_compute(_payload(), compute)
+
+    assert first == second == phase3_analyze(_payload())
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # Returned results are copies: callers may add fields
+    second["debug"] = True
+    assert "debug" not in cache.get_or_compute(_payload(), compute)
+
+
+@pytest.mark.parametrize("kind", [0, 1], ids=["memory", "disk"])
+def test_ttl_expiry(tmp_path, kind):
+    backend = _backends(tmp_path, ttl_seconds=0)[kind]
+
+    backend.put("key", {"value": 1})
+
+    assert backend.get("key") is None
+    assert backend.expirations == 1
+    assert len(backend) == 0
+
+
+@pytest.mark.parametrize("kind", [0, 1], ids=["memory", "disk"])
+def test_lru_eviction(tmp_path, kind):
+    backend = _backends(tmp_path, max_entries=2)[kind]
+
+    backend.put("a", {"value": "a"})
+    backend.put("b", {"value": "b"})
+    assert backend.get("a") == {"value": "a"}
+
+    backend.put("c", {"value": "c"})
+
+    assert backend.get("b") is None
+    assert backend.get("a") == {"value": "a"}
+    assert backend.get("c") == {"value": "c"}
+    assert backend.evictions == 1
+
+
+def test_disk_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    DiskCacheBackend(path).put("key", {"value": 1})
+
+    assert DiskCacheBackend(path).get("key") == {"value": 1}
@@ -0,0 +1,106 @@
+"""
+test_saturation.py
+
+Every row of a saturation output must equal phase3_analyze with that
+POI as target against its peers (its industry key's competitors minus
+itself, and every anchor), whatever the bucketing or worker count.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.metrics import poi_store
+from app.metrics.phase3_engine import DENSITY_LABELS, phase3_analyze
+from app.metrics.poi_store import load_region
+from app.metrics.saturation import (
+    COMPETITION_PATTERNS,
+    INDUSTRY_KEYS,
+    SATURATION_COLUMNS,
+    load_saturation,
+    run_saturation,
+)
+
+SAMPLED_ROWS = 150
+
+
+@pytest.fixture(scope="module")
+def saturation(tmp_path_factory, city_region):
+    output = str(tmp_path_factory.mktemp("saturation") / "city")
+    meta = run_saturation(city_region, output, workers=1)
+
+    return meta, load_saturation(output)[1]
+
+
+def _expected(store, row, industry):
+    anchor_types = store.meta["anchor_types"]
+    competing = np.isin(store.sub_industry, store.competitor_codes(industry))
+    competing[row] = False
+
+    return phase3_analyze({
+        "target": {"lat": float(store.lat[row]), "lon": float(store.lon[row])},
+        "industry": industry,
+        "competitors": [
+            {"lat": float(store.lat[i]), "lon": float(store.lon[i])}
+            for i in np.flatnonzero(competing).tolist()
+        ],
+        "anchors": [
+            {"lat": float(store.lat[i]), "lon": float(store.lon[i]), "type": anchor_types[store.anchor_type[i]]}
+            for i in np.flatnonzero(store.anchor_type >= 0).tolist()
+        ],
+    })
+
+
+def test_rows_match_phase3_analyze(saturation, city_region):
+    meta, columns = saturation
+    store = load_region(city_region)
+
+    assert meta["count"] == len(store)
+    assert meta["store_fingerprint"] == store.fingerprint
+
+    rows = random.Random(5).sample(range(len(store)), SAMPLED_ROWS)
+
+    for row in rows:
+        industry = INDUSTRY_KEYS[columns["industry_key"][row]]
+        expected = _expected(store, row, industry)
+
+        assert columns["raw_competition_score"][row] == expected["raw_competition_score"]
+        assert columns["normalized_competition_score"][row] == expected["normalized_competition_score"]
+        assert DENSITY_LABELS[columns["density_label"][row]] == expected["density_label"]
+        assert columns["competitor_count"][row] == expected["competitor_count"]
+        assert bool(columns["dominant_competitor_present"][row]) == expected["dominant_competitor_present"]
+        assert COMPETITION_PATTERNS[columns["competition_pattern"][row]] == expected["competition_pattern"]
+
+
+def test_scored_industries_cover_the_store(saturation):
+    _, columns = saturation
+    keys = {INDUSTRY_KEYS[code] for code in np.unique(columns["industry_key"]).tolist()}
+
+    # The seeded city has classified competitors and unclassified anchors
+    assert {"cafe", "retail", "default"} <= keys
+    assert columns["raw_competition"].max() > 0
+
+
+def test_bucketing_and_workers_do_not_change_the_output(saturation, tmp_path, city_region):
+    _, expected = saturation
+
+    for options in ({"workers": 1, "bucket_km": 0.2, "unit_pois": 50}, {"workers": 2, "unit_pois": 300}):
+        output = str(tmp_path / f"workers-{options['workers']}")
+
+        # Spawned workers do not see the patched default store root
+        run_saturation(city_region, output, store_root=poi_store.POI_STORE_ROOT, **options)
+        _, columns = load_saturation(output)
+
+        for name in SATURATION_COLUMNS:
+            assert np.array_equal(columns[name], expected[name]), name
+
+
+def test_unfinished_output_is_not_loaded(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_saturation(str(tmp_path))
+
+
+def test_unknown_distance_mode_is_rejected(tmp_path, city_region):
+    with pytest.raises(ValueError):
+        run_saturation(city_region, str(tmp_path / "out"), workers=1, mode="euclid")
@@ -0,0 +1,160 @@
+"""
+test_shadow.py
+
+Shadow evaluation must record every sampled request as compared,
+mismatched (with the differing fields), failed, skipped or dropped,
+and never touch the served result.
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.intelligence.industry_classifier import classify_business
+from app.metrics.phase3_engine import phase3_analyze
+from app.shadow import CLASSIFY_CHECK, PHASE3_CHECK, ShadowEvaluator
+
+DRAIN_SECONDS = 60
+
+
+@pytest.fixture
+def evaluator():
+    evaluator = ShadowEvaluator(fraction=1.0, rng=random.Random(0))
+    yield evaluator
+    evaluator.shutdown()
+
+
+@pytest.fixture(scope="module")
+def payload(city):
+    return {
+        "target": city["center"],
+        "industry": "cafe",
+        "competitors": [{"lat": p["lat"], "lon": p["lon"]} for p in city["competitors"][:200]],
+        "anchors": city["anchors"][:40],
+    }
+
+
+def _check(evaluator, name):
+    assert evaluator.drain(timeout=DRAIN_SECONDS)
+    return evaluator.stats()["checks"][name]
+
+
+def test_matching_result_is_compared(evaluator, payload):
+    assert evaluator.submit(PHASE3_CHECK, payload, phase3_analyze(payload), 0.01)
+
+    stats = _check(evaluator, "phase3")
+
+    assert stats["compared"] == 1 and stats["mismatches"] == 0
+    assert stats["samples"] == []
+    assert stats["latency"]["ratio"] is not None
+
+
+def test_mismatch_records_the_diff(evaluator, payload):
+    served = phase3_analyze(payload)
+    wrong = {**served, "raw_competition_score": served["raw_competition_score"] + 1, "density_label": "none"}
+
+    assert evaluator.submit(PHASE3_CHECK, payload, wrong, 0.01)
+
+    # Fields are copied at submit time; later changes are not compared
+    wrong["competitor_count"] = -1
+
+    stats = _check(evaluator, "phase3")
+
+    assert stats["compared"] == 1 and stats["mismatches"] == 1
+    assert stats["field_mismatches"] == {"raw_competition_score": 1, "density_label": 1}
+
+    (sample,) = stats["samples"]
+    assert sample["input"] == {
+        "target": payload["target"],
+        "industry": "cafe",
+        "competitors": len(payload["competitors"]),
+        "anchors": len(payload["anchors"]),
+    }
+    assert sample["diff"] == {
+        "raw_competition_score": {
+            "active": served["raw_competition_score"] + 1,
+            "reference": served["raw_competition_score"],
+        },
+        "density_label": {"active": "none", "reference": served["density_label"]},
+    }
+
+
+def test_classify_check(evaluator):
+    tags = {"amenity": "cafe"}
+    served = classify_business(tags)
+
+    evaluator.submit(CLASSIFY_CHECK, tags, served, 0.001)
+    evaluator.submit(CLASSIFY_CHECK, tags, {**served, "sub_industry": "Bakery"}, 0.001)
+
+    stats = _check(evaluator, "classify")
+
+    assert stats["compared"] == 2 and stats["mismatches"] == 1
+    assert stats["field_mismatches"] == {"sub_industry": 1}
+
+
+def test_reference_errors_are_recorded(evaluator):
+    payload = {"target": {"lat": 0, "lon": 0}, "region": "no_such_region"}
+
+    assert evaluator.submit(PHASE3_CHECK, payload, {}, 0.01)
+
+    stats = _check(evaluator, "phase3")
+
+    assert stats["errors"] == 1 and stats["compared"] == 0
+    assert stats["samples"][0]["input"]["region"] == "no_such_region"
+    assert stats["samples"][0]["error"].startswith("FileNotFoundError")
+
+
+def test_unmodelled_requests_are_skipped(evaluator, payload):
+    for change in ({"distance_mode": "local_projection"}, {"anchor_error": 0.05}, {"target": None}):
+        request = {key: value for key, value in {**payload, **change}.items() if value is not None}
+        assert not evaluator.submit(PHASE3_CHECK, request, {}, 0.01)
+
+    stats = evaluator.stats()["checks"]["phase3"]
+
+    assert stats["sampled"] == stats["skipped"] == 3
+    assert evaluator.stats()["pending"] == 0
+
+
+def test_full_queue_and_shutdown_drop_runs(payload):
+    evaluator = ShadowEvaluator(fraction=1.0, max_pending=0)
+
+    assert not evaluator.submit(PHASE3_CHECK, payload, {}, 0.01)
+
+    evaluator.max_pending = 8
+    evaluator.shutdown()
+
+    assert not evaluator.submit(PHASE3_CHECK, payload, {}, 0.01)
+    assert evaluator.stats()["checks"]["phase3"]["dropped"] == 2
+
+
+def test_sampling_fraction():
+    assert not ShadowEvaluator(fraction=0).submit(PHASE3_CHECK, {"target": {}}, {}, 0.01)
+
+    sampled = ShadowEvaluator(fraction=0.25, max_pending=0, rng=random.Random(3))
+    for _ in range(400):
+        sampled.submit(PHASE3_CHECK, {"target": {}}, {}, 0.01)
+
+    assert 60 <= sampled.stats()["checks"]["phase3"]["sampled"] <= 140
+
+    with pytest.raises(ValueError):
+        ShadowEvaluator(fraction=1.5)
+
+
+def test_api_requests_are_shadowed(monkeypatch, evaluator, payload):
+    monkeypatch.setattr(main, "shadow", evaluator)
+    monkeypatch.setattr(main, "phase3_cache", None)
+    client = TestClient(main.app)
+
+    response = client.post("/phase3/competition", json=payload)
+    assert response.json() == phase3_analyze(payload)
+
+    assert evaluator.drain(timeout=DRAIN_SECONDS)
+
+    stats = client.get("/shadow/stats").json()
+    assert stats["enabled"] is True
+    assert stats["checks"]["phase3"]["compared"] == 1
+    assert stats["checks"]["phase3"]["mismatches"] == 0
+
+    assert 'locatoris_shadow_compared_total{check="phase3"} 1' in client.get("/metrics").text
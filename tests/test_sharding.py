@@ -0,0 +1,75 @@
+"""
+test_sharding.py
+
+Geohash-sharded saturation runs must equal the single-process run
+column by column, whichever executor scores the shards.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.intelligence.industry_classifier import classify_business
+from app.metrics.poi_store import build_poi_store
+from app.metrics.saturation import SATURATION_COLUMNS, load_saturation, run_saturation
+from app.metrics.sharding import InlineExecutor, run_sharded_saturation
+from app.synthetic_city import make_city, make_tag_sets
+
+POIS = 1_500
+
+# Geohash precision 5 tiles are ~5 x 5 km: the 8 km city spans many
+PRECISION = 5
+
+
+@pytest.fixture(scope="module")
+def region(tmp_path_factory):
+    """
+    (region, store_root, single-process output) for a synthetic city.
+    """
+    root = tmp_path_factory.mktemp("stores")
+    city = make_city("mixed", POIS, seed=3)
+
+    records = [
+        {**point, **classify_business(tags)}
+        for point, tags in zip(city["competitors"], make_tag_sets(POIS, seed=3))
+    ]
+    records += [
+        {"lat": anchor["lat"], "lon": anchor["lon"], "anchor_type": anchor["type"]}
+        for anchor in city["anchors"]
+    ]
+    build_poi_store(records, str(root / "city"))
+
+    output = str(tmp_path_factory.mktemp("saturation") / "single")
+    run_saturation("city", output, store_root=str(root), workers=1)
+
+    return "city", str(root), output
+
+
+def _process_pool():
+    return ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+
+
+@pytest.mark.parametrize("make_executor", [InlineExecutor, _process_pool], ids=["inline", "process"])
+def test_sharded_equals_single_process(region, tmp_path, make_executor):
+    name, store_root, single_output = region
+    sharded_output = str(tmp_path / "sharded")
+
+    with make_executor() as executor:
+        meta = run_sharded_saturation(
+            name,
+            sharded_output,
+            str(tmp_path / "shards"),
+            store_root=store_root,
+            precision=PRECISION,
+            executor=executor,
+        )
+
+    assert meta["sharding"]["shards"] > 1
+
+    _, sharded = load_saturation(sharded_output)
+    _, single = load_saturation(single_output)
+
+    for column in SATURATION_COLUMNS:
+        assert np.array_equal(sharded[column], single[column]), column
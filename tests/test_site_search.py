@@ -0,0 +1,132 @@
+"""
+test_site_search.py
+
+Every site the search returns must carry exactly the Phase 3 output
+phase3_analyze gives at its coordinates, respect min_separation_m,
+and (when the area is small enough to be scored exhaustively) the best
+site must be the best cell.
+"""
+
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics.geodesic import haversine
+from app.metrics.phase3_engine import phase3_analyze
+from app.metrics.reference import anchor_influence_reference, competition_reference
+from app.metrics.site_search import MAX_COARSE_BLOCKS, SearchArea, search_sites
+
+
+def _bbox(center, half_deg):
+    return {
+        "min_lat": center["lat"] - half_deg,
+        "min_lon": center["lon"] - half_deg,
+        "max_lat": center["lat"] + half_deg,
+        "max_lon": center["lon"] + half_deg,
+    }
+
+
+@pytest.fixture(scope="module")
+def payload(city):
+    return {
+        "bbox": _bbox(city["center"], 0.04),
+        "industry": "retail",
+        "competitors": [{"lat": p["lat"], "lon": p["lon"]} for p in city["competitors"]],
+        "anchors": city["anchors"],
+        "top_n": 5,
+        "min_separation_m": 800,
+        "resolution_m": 100,
+    }
+
+
+def _phase3_fields(site):
+    return {key: value for key, value in site.items() if key not in ("lat", "lon", "score")}
+
+
+def _assert_sites_match(found, analyze_payload, min_separation_m):
+    sites = found["sites"]
+
+    assert sites
+    assert [site["score"] for site in sites] == sorted((site["score"] for site in sites), reverse=True)
+
+    for site in sites:
+        expected = phase3_analyze({**analyze_payload, "target": {"lat": site["lat"], "lon": site["lon"]}})
+        assert _phase3_fields(site) == expected
+
+    for i, first in enumerate(sites):
+        for second in sites[i + 1:]:
+            distance = haversine(first["lat"], first["lon"], second["lat"], second["lon"])
+            assert distance * 1000 >= min_separation_m
+
+
+def test_payload_sites_match_phase3_analyze(payload):
+    found = search_sites(payload)
+
+    _assert_sites_match(
+        found,
+        {"industry": payload["industry"], "competitors": payload["competitors"], "anchors": payload["anchors"]},
+        payload["min_separation_m"],
+    )
+    assert found["points_evaluated"] < found["cells_in_area"]
+
+
+def test_region_sites_match_phase3_analyze(payload, city_region):
+    region_payload = {key: value for key, value in payload.items() if key not in ("competitors", "anchors")}
+    region_payload["region"] = city_region
+
+    _assert_sites_match(
+        search_sites(region_payload),
+        {"industry": payload["industry"], "region": city_region},
+        payload["min_separation_m"],
+    )
+
+
+def test_exhaustive_search_finds_the_best_cell(city, payload):
+    small = {**payload, "bbox": _bbox(city["center"], 0.01), "resolution_m": 150, "top_n": 1}
+    area = SearchArea(small, small["resolution_m"])
+
+    # Few enough cells for a single level: every cell is scored
+    assert area.n_rows * area.n_cols <= MAX_COARSE_BLOCKS
+
+    best = -math.inf
+    for row in range(area.n_rows):
+        for col in range(area.n_cols):
+            target = {"lat": float(area.center_lat(row)), "lon": float(area.center_lon(col))}
+            score = (
+                anchor_influence_reference(target, small["anchors"])
+                - competition_reference(target, small["competitors"])
+            )
+            best = max(best, round(score, 3))
+
+    found = search_sites(small)
+
+    assert found["points_evaluated"] == found["cells_in_area"]
+    assert found["sites"][0]["score"] == best
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"bbox": None, "polygon": [{"lat": 0, "lon": 0}]},
+        {"resolution_m": 1},
+        {"top_n": 0},
+        {"objective": {"distance_weight": 1}},
+        {"objective": {"anchor_weight": "1"}},
+    ],
+)
+def test_bad_input_is_rejected(payload, change):
+    bad = {key: value for key, value in {**payload, **change}.items() if value is not None}
+
+    with pytest.raises(ValueError):
+        search_sites(bad)
+
+
+def test_endpoint_matches_search_sites(payload):
+    small = {**payload, "competitors": payload["competitors"][:200], "anchors": payload["anchors"][:50]}
+
+    response = TestClient(app).post("/phase3/search", json=small)
+
+    assert response.status_code == 200
+    assert response.json() == search_sites(small)
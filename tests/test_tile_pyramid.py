@@ -0,0 +1,162 @@
+"""
+test_tile_pyramid.py
+
+Tile lookups must stay within the error the build measured against
+exact phase3_analyze, be exact at lattice nodes, and fall back to the
+exact engine once the store changed under the pyramid.
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import poi_store, tile_pyramid
+from app.metrics.phase3_engine import phase3_analyze
+from app.metrics.poi_store import build_poi_store
+from app.metrics.tile_pyramid import (
+    LevelGeometry,
+    StalePyramid,
+    build_tile_pyramid,
+    load_pyramid,
+    phase3_tile_lookup,
+)
+
+INDUSTRIES = ("cafe", "retail")
+LEVELS_M = (400, 100)
+ERROR_SAMPLES = 40
+ERROR_SEED = 3
+
+
+@pytest.fixture(scope="module")
+def tile_root(tmp_path_factory):
+    root = tmp_path_factory.mktemp("tiles")
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(tile_pyramid, "TILE_ROOT", str(root))
+        yield str(root)
+
+
+@pytest.fixture(scope="module")
+def built(tile_root, city_region):
+    return build_tile_pyramid(
+        city_region,
+        levels_m=LEVELS_M,
+        industries=INDUSTRIES,
+        error_samples=ERROR_SAMPLES,
+        seed=ERROR_SEED,
+    )
+
+
+def _exact(region, target, industry):
+    return phase3_analyze({"target": target, "industry": industry, "region": region})
+
+
+@pytest.mark.parametrize("industry", INDUSTRIES)
+def test_lookups_stay_within_the_reported_error(built, city_region, industry):
+    # The build's own sample targets (same seed, same bounding box)
+    store = poi_store.load_region(city_region)
+    rng = np.random.default_rng(ERROR_SEED)
+    lats = rng.uniform(float(store.lat.min()), float(store.lat.max()), ERROR_SAMPLES)
+    lons = rng.uniform(float(store.lon.min()), float(store.lon.max()), ERROR_SAMPLES)
+
+    for cell_m in LEVELS_M:
+        report = built["error_report"][industry][str(cell_m)]
+        errors = []
+
+        for lat, lon in zip(lats.tolist(), lons.tolist()):
+            target = {"lat": lat, "lon": lon}
+            lookup = phase3_tile_lookup({
+                "target": target,
+                "industry": industry,
+                "region": city_region,
+                "cell_size_m": cell_m,
+            })
+
+            assert lookup["approximate"] is True and lookup["stale"] is False
+            assert lookup["error"] == report
+
+            errors.append(abs(
+                lookup["result"]["raw_competition_score"]
+                - _exact(city_region, target, industry)["raw_competition_score"]
+            ))
+
+        assert max(errors) <= report["raw_score_max_abs_error"] + 1e-4
+        assert round(max(errors), 4) == report["raw_score_max_abs_error"]
+
+
+@pytest.mark.parametrize("industry", INDUSTRIES)
+def test_lattice_nodes_are_exact(built, city, city_region, industry):
+    pyramid = load_pyramid(city_region)
+    geometry = LevelGeometry(100, pyramid.manifest["ref_lat"])
+    i, j, _, _ = geometry.base_cell(city["center"]["lat"], city["center"]["lon"])
+
+    for di, dj in [(0, 0), (3, -7), (-12, 5), (20, 20)]:
+        target = {
+            "lat": (i + di + 0.5) * geometry.lat_step,
+            "lon": (j + dj + 0.5) * geometry.lon_step,
+        }
+        approx = pyramid.analyze(target, industry, 100)["raw_competition_score"]
+        exact = _exact(city_region, target, industry)["raw_competition_score"]
+
+        # Tiles hold float32 values; rounding to 3 decimals adds one unit
+        assert abs(approx - exact) <= 0.001 + 1e-6 * exact + 1e-9
+
+
+def test_unchanged_store_reuses_every_tile(built, city_region):
+    rebuilt = build_tile_pyramid(
+        city_region,
+        levels_m=LEVELS_M,
+        industries=INDUSTRIES,
+        error_samples=ERROR_SAMPLES,
+        seed=ERROR_SEED,
+    )
+
+    assert rebuilt["built"] == 0 and rebuilt["removed"] == 0
+    assert rebuilt["reused"] == built["built"] + built["reused"]
+    assert rebuilt["error_report"] == built["error_report"]
+
+
+def test_stale_pyramid_answers_exactly(tile_root, city_region):
+    records = [
+        {"lat": 24.86, "lon": 67.0, "industry": "Food & Beverage", "sub_industry": "Cafe"},
+        {"lat": 24.861, "lon": 67.003, "anchor_type": "hospital"},
+    ]
+    store_path = f"{poi_store.POI_STORE_ROOT}/tiles_stale"
+    payload = {"target": {"lat": 24.8605, "lon": 67.001}, "industry": "cafe", "region": "tiles_stale"}
+
+    build_poi_store(records, store_path)
+    build_tile_pyramid("tiles_stale", levels_m=(100,), industries=["cafe"], error_samples=0)
+    assert phase3_tile_lookup(payload)["stale"] is False
+
+    # A store rebuild changes its fingerprint: the pyramid is bypassed
+    records.append({"lat": 24.8606, "lon": 67.0012, "industry": "Food & Beverage", "sub_industry": "Cafe"})
+    build_poi_store(records, store_path)
+
+    with pytest.raises(StalePyramid) as stale:
+        phase3_tile_lookup(payload)
+    assert stale.value.exact_payload == payload
+
+    response = TestClient(app).post("/phase3/tiles/lookup", json=payload)
+    assert response.status_code == 200
+    assert response.json() == {"approximate": False, "stale": True, "result": phase3_analyze(payload)}
+
+    # Rebuilding replaces only the tiles the new point reaches
+    rebuilt = build_tile_pyramid("tiles_stale", levels_m=(100,), industries=["cafe"], error_samples=0)
+    assert rebuilt["built"] == rebuilt["removed"] > 0
+    assert phase3_tile_lookup(payload)["stale"] is False
+
+
+def test_endpoint_serves_lookups(built, city, city_region):
+    client = TestClient(app)
+    payload = {"target": city["center"], "industry": "retail", "region": city_region}
+
+    response = client.post("/phase3/tiles/lookup", json=payload)
+    assert response.status_code == 200
+    assert response.json() == phase3_tile_lookup(payload)
+
+    assert client.post("/phase3/tiles/lookup", json={**payload, "cell_size_m": 250}).status_code == 400
+    assert client.post("/phase3/tiles/lookup", json={**payload, "region": "no_such_region"}).status_code == 404
+
+    report = client.get(f"/phase3/tiles/{city_region}/report")
+    assert report.json()["error_report"] == built["error_report"]
@@ -0,0 +1,177 @@
+"""
+test_tracked_site.py
+
+A tracked site, after any sequence of add / move / remove events, must
+give what a fresh phase3_analyze gives over its current points.
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics.phase3_engine import phase3_analyze
+from app.metrics.tracked_site import TrackedSite, build_tracked_site
+from app.synthetic_city import uniform_points
+
+INDUSTRY = "cafe"
+
+
+@pytest.fixture(scope="module")
+def site_payload(city):
+    return {
+        "target": city["center"],
+        "industry": INDUSTRY,
+        "competitors": [
+            {"id": f"c{i}", "lat": point["lat"], "lon": point["lon"]}
+            for i, point in enumerate(city["competitors"][:300])
+        ],
+        "anchors": [{"id": f"a{i}", **anchor} for i, anchor in enumerate(city["anchors"][:100])],
+    }
+
+
+def _events(city, payload, count, seed):
+    """
+    Seeded add / move / remove events, applied to plain dicts alongside
+    so the expected points (in insertion order) are known.
+    """
+    rng = random.Random(seed)
+    current = {
+        "competitor": {point["id"]: point for point in payload["competitors"]},
+        "anchor": {point["id"]: point for point in payload["anchors"]},
+    }
+    events = []
+
+    for step in range(count):
+        kind = rng.choice(("competitor", "anchor"))
+        points = current[kind]
+        op = rng.choice(("add", "move", "remove"))
+
+        if op == "remove" and points:
+            point_id = rng.choice(list(points))
+            del points[point_id]
+            events.append({"op": "remove", "kind": kind, "id": point_id})
+            continue
+
+        point_id = rng.choice(list(points)) if op == "move" and points else f"{kind}-new-{step}"
+        location = uniform_points(1, rng, city["center"], radius_km=2.5)[0]
+        event = {"op": "add", "kind": kind, "id": point_id, **location}
+        if kind == "anchor":
+            event["type"] = rng.choice(("hospital", "school", "office", "mall", "transit", "unknown"))
+
+        # A move re-adds the point, so it goes to the end of the order
+        points.pop(point_id, None)
+        points[point_id] = event
+        events.append(event)
+
+    return events, current
+
+
+def _fresh(payload, current):
+    return phase3_analyze({
+        "target": payload["target"],
+        "industry": payload["industry"],
+        "competitors": [{"lat": p["lat"], "lon": p["lon"]} for p in current["competitor"].values()],
+        "anchors": [
+            {"lat": p["lat"], "lon": p["lon"], "type": p.get("type")}
+            for p in current["anchor"].values()
+        ],
+    })
+
+
+def _assert_close(result, expected):
+    # Before resync() only a sum within rounding of a 3rd-decimal
+    # boundary may differ, by at most one unit
+    assert abs(result["raw_competition_score"] - expected["raw_competition_score"]) <= 0.001 + 1e-9
+    assert result["competitor_count"] == expected["competitor_count"]
+
+    if result["raw_competition_score"] == expected["raw_competition_score"]:
+        assert result["density_label"] == expected["density_label"]
+
+
+def test_built_site_matches_phase3_analyze(site_payload):
+    _, site = build_tracked_site(site_payload)
+
+    assert site.result() == phase3_analyze(site_payload)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_events_match_fresh_phase3_analyze(city, site_payload, seed):
+    _, site = build_tracked_site(site_payload)
+    events, current = _events(city, site_payload, 400, seed)
+
+    for event in events:
+        site.apply(event)
+
+    _assert_close(site.result(), _fresh(site_payload, current))
+
+    site.resync()
+
+    assert site.result() == _fresh(site_payload, current)
+
+
+def test_unknown_remove_is_ignored(site_payload):
+    _, site = build_tracked_site(site_payload)
+    before = site.result()
+
+    assert site.apply({"op": "remove", "kind": "competitor", "id": "missing"}) is False
+    assert site.result() == before
+
+
+@pytest.mark.parametrize("field", ["competitors", "anchors"])
+def test_duplicate_ids_are_rejected(site_payload, field):
+    points = site_payload[field]
+    payload = {**site_payload, field: [*points, {**points[1], "id": points[0]["id"]}]}
+
+    with pytest.raises(ValueError, match="unique"):
+        build_tracked_site(payload)
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        {"op": "add", "kind": "competitor", "lat": 0, "lon": 0},
+        {"op": "move", "kind": "competitor", "id": "c0"},
+        {"op": "add", "kind": "shop", "id": "s1", "lat": 0, "lon": 0},
+        {"op": "add", "kind": "competitor", "id": ["c0"], "lat": 0, "lon": 0},
+    ],
+)
+def test_bad_events_leave_the_site_untouched(site_payload, event):
+    site = TrackedSite(site_payload["target"], INDUSTRY)
+    site.add("competitor", "c0", site_payload["competitors"][0])
+    before = site.result()
+
+    with pytest.raises(ValueError):
+        site.apply(event)
+
+    assert site.result() == before
+
+
+def test_api_flow(city, site_payload):
+    client = TestClient(app)
+
+    created = client.post("/phase3/sites", json=site_payload)
+    assert created.status_code == 200
+
+    site_id = created.json()["site_id"]
+    assert created.json()["result"] == phase3_analyze(site_payload)
+
+    events, current = _events(city, site_payload, 50, seed=7)
+    pushed = client.post(f"/phase3/sites/{site_id}/events", json={"events": events})
+
+    assert pushed.status_code == 200
+    assert pushed.json()["applied"] == len(events)
+    _assert_close(pushed.json()["result"], _fresh(site_payload, current))
+
+    assert client.get(f"/phase3/sites/{site_id}").json()["result"] == pushed.json()["result"]
+
+    assert client.delete(f"/phase3/sites/{site_id}").status_code == 200
+    assert client.get(f"/phase3/sites/{site_id}").status_code == 404
+
+
+def test_api_rejects_duplicate_ids(site_payload):
+    competitors = site_payload["competitors"]
+    payload = {**site_payload, "competitors": [competitors[0], competitors[0]]}
+
+    assert TestClient(app).post("/phase3/sites", json=payload).status_code == 400
@@ -0,0 +1,125 @@
+"""
+test_worker_pool.py
+
+Admission control (503 + Retry-After), the off-loop fast path,
+timeouts and recovery from a crashed worker in the analysis pool.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.worker_pool import AnalysisPool, PoolSaturated
+
+
+@pytest.fixture
+def pool():
+    pool = AnalysisPool(workers=1, max_queue_depth=1, timeout_seconds=30, retry_after_seconds=7)
+    yield pool
+    pool.shutdown()
+
+
+def _thread_name(payload):
+    return threading.current_thread().name
+
+
+def _worker_pid(payload):
+    return os.getpid()
+
+
+def test_inline_jobs_run_off_the_event_loop(pool):
+    async def run():
+        return await pool.run(_thread_name, None, points=1), threading.current_thread().name
+
+    worker_thread, loop_thread = asyncio.run(run())
+
+    assert worker_thread != loop_thread
+    assert pool.stats()["inline_runs"] == 1
+    assert pool.stats()["pooled_runs"] == 0
+
+
+def test_full_queue_is_rejected_and_slot_released(pool):
+    async def run():
+        slow = asyncio.ensure_future(pool.run(time.sleep, 1.0, points=1, always_pool=True))
+
+        # Wait until the slow job holds the only slot
+        while pool.stats()["in_flight"] == 0:
+            await asyncio.sleep(0.01)
+
+        with pytest.raises(PoolSaturated) as rejected:
+            await pool.run(time.sleep, 0, points=1, always_pool=True)
+
+        await slow
+
+        # The slot is free again once the worker is done
+        await pool.run(time.sleep, 0, points=1, always_pool=True)
+
+        return rejected.value
+
+    rejected = asyncio.run(run())
+
+    assert rejected.retry_after == 7
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_timeout_keeps_the_slot_until_the_worker_finishes(pool):
+    pool.timeout_seconds = 0.2
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(time.sleep, 1.0, points=1, always_pool=True)
+
+        held = pool.stats()["in_flight"]
+
+        while pool.stats()["in_flight"]:
+            await asyncio.sleep(0.05)
+
+        return held
+
+    assert asyncio.run(run()) == 1
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_crashed_worker_is_replaced(pool):
+    async def run():
+        before = await pool.run(_worker_pid, None, points=1, always_pool=True)
+
+        with pytest.raises(BrokenExecutor):
+            await pool.run(os._exit, 1, points=1, always_pool=True)
+
+        after = await pool.run(_worker_pid, None, points=1, always_pool=True)
+
+        return before, after
+
+    before, after = asyncio.run(run())
+
+    assert before != after
+    assert pool.stats()["restarts"] == 1
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_saturated_pool_answers_503_with_retry_after(monkeypatch, pool, city):
+    # One job already holds the only slot
+    pool.in_flight = pool.max_queue_depth
+    monkeypatch.setattr(main, "phase3_pool", pool)
+
+    center = city["center"]
+    response = TestClient(main.app).post("/phase3/raster", json={
+        "bbox": {
+            "min_lat": center["lat"] - 0.01,
+            "min_lon": center["lon"] - 0.01,
+            "max_lat": center["lat"] + 0.01,
+            "max_lon": center["lon"] + 0.01,
+        },
+        "competitors": city["competitors"][:10],
+    })
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"